@@ -0,0 +1,5 @@
+import os
+
+# utils/test_mf_converter.py is a command-line script for checking the converter
+# against a real statement, not a pytest module
+collect_ignore = [os.path.join('utils', 'test_mf_converter.py')]
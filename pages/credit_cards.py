@@ -2,7 +2,7 @@ import dash
 from dash import html, dash_table, dcc, Input, Output, State, callback
 import dash_bootstrap_components as dbc
 import pandas as pd
-import os
+from utils.holdings_store import load_holdings
 from datetime import datetime
 
 # Register the page - but not in the nav since it's a sub-tab
@@ -16,36 +16,23 @@ dash.register_page(
     nav=False
 )
 
-# Load data - create empty table if file doesn't exist
+# Load data
 def load_credit_card_data():
-    # Check if file exists
-    csv_path = 'assets/PersonalFiles/myCreditCards.csv'
-    os.makedirs('assets/PersonalFiles', exist_ok=True)
+    # Holdings live in the holdings store (mirrored to myCreditCards.csv)
+    df = load_holdings('credit_cards')
     
-    if os.path.exists(csv_path):
-        # Read the data if file exists
-        df = pd.read_csv(csv_path)
+    # Calculate additional metrics if data exists
+    if not df.empty and 'CreditLimit' in df.columns and 'OutstandingBalance' in df.columns:
+        # Calculate available credit
+        df['AvailableCredit'] = df['CreditLimit'] - df['OutstandingBalance']
+        
+        # Calculate days to payment if DueDate exists
+        if 'DueDate' in df.columns:
+            today = datetime.today().strftime('%Y-%m-%d')
+            df['DaysToPayment'] = pd.to_datetime(df['DueDate']).apply(lambda x: (x - pd.to_datetime(today)).days)
         
-        # Calculate additional metrics if data exists
-        if not df.empty and 'CreditLimit' in df.columns and 'OutstandingBalance' in df.columns:
-            # Calculate available credit
-            df['AvailableCredit'] = df['CreditLimit'] - df['OutstandingBalance']
-            
-            # Calculate days to payment if DueDate exists
-            if 'DueDate' in df.columns:
-                today = datetime.today().strftime('%Y-%m-%d')
-                df['DaysToPayment'] = pd.to_datetime(df['DueDate']).apply(lambda x: (x - pd.to_datetime(today)).days)
-            
-            # Calculate utilization percentage
-            df['Utilization'] = ((df['OutstandingBalance'] / df['CreditLimit']) * 100).round(2)
-    else:
-        # Create empty DataFrame with correct columns
-        df = pd.DataFrame(columns=[
-            'Bank', 'CardType', 'CardNumber', 'CreditLimit', 'OutstandingBalance', 
-            'MinimumDue', 'DueDate', 'APR'
-        ])
-        # Save the empty file
-        df.to_csv(csv_path, index=False)
+        # Calculate utilization percentage
+        df['Utilization'] = ((df['OutstandingBalance'] / df['CreditLimit']) * 100).round(2)
     
     return df
 
@@ -2,7 +2,7 @@ import dash
 from dash import html, dash_table, dcc
 import dash_bootstrap_components as dbc
 import pandas as pd
-import os
+from utils.holdings_store import load_holdings
 from datetime import datetime
 
 # Register the page - but not in the nav since it's a sub-tab
@@ -16,44 +16,31 @@ dash.register_page(
     nav=False
 )
 
-# Load data - create empty table if file doesn't exist
+# Load data
 def load_loans_data():
-    # Check if file exists
-    csv_path = 'assets/PersonalFiles/myLoans.csv'
-    os.makedirs('assets/PersonalFiles', exist_ok=True)
+    # Holdings live in the holdings store (mirrored to myLoans.csv)
+    df = load_holdings('loans')
     
-    if os.path.exists(csv_path):
-        # Read the data if file exists
-        df = pd.read_csv(csv_path)
+    # Calculate additional metrics if data exists
+    if not df.empty and all(col in df.columns for col in ['Principal', 'OutstandingAmount', 'EndDate']):
+        today = datetime.today().strftime('%Y-%m-%d')
+        
+        # Calculate remaining months (simple approximation)
+        if 'EndDate' in df.columns:
+            df['EndDateObj'] = pd.to_datetime(df['EndDate'])
+            df['TodayObj'] = pd.to_datetime(today)
+            df['RemainingMonths'] = ((df['EndDateObj'].dt.year - df['TodayObj'].dt.year) * 12 + 
+                                  (df['EndDateObj'].dt.month - df['TodayObj'].dt.month))
+        
+        # Calculate amount paid so far
+        df['AmountPaid'] = df['Principal'] - df['OutstandingAmount']
+        
+        # Calculate progress percentage
+        df['Progress'] = ((df['AmountPaid'] / df['Principal']) * 100).round(2)
         
-        # Calculate additional metrics if data exists
-        if not df.empty and all(col in df.columns for col in ['Principal', 'OutstandingAmount', 'EndDate']):
-            today = datetime.today().strftime('%Y-%m-%d')
-            
-            # Calculate remaining months (simple approximation)
-            if 'EndDate' in df.columns:
-                df['EndDateObj'] = pd.to_datetime(df['EndDate'])
-                df['TodayObj'] = pd.to_datetime(today)
-                df['RemainingMonths'] = ((df['EndDateObj'].dt.year - df['TodayObj'].dt.year) * 12 + 
-                                      (df['EndDateObj'].dt.month - df['TodayObj'].dt.month))
-            
-            # Calculate amount paid so far
-            df['AmountPaid'] = df['Principal'] - df['OutstandingAmount']
-            
-            # Calculate progress percentage
-            df['Progress'] = ((df['AmountPaid'] / df['Principal']) * 100).round(2)
-            
-            # Clean up temporary columns if they exist
-            if 'EndDateObj' in df.columns and 'TodayObj' in df.columns:
-                df = df.drop(['EndDateObj', 'TodayObj'], axis=1)
-    else:
-        # Create empty DataFrame with correct columns
-        df = pd.DataFrame(columns=[
-            'LoanType', 'Lender', 'Principal', 'OutstandingAmount', 'InterestRate', 
-            'EMI', 'Tenure', 'StartDate', 'EndDate'
-        ])
-        # Save the empty file
-        df.to_csv(csv_path, index=False)
+        # Clean up temporary columns if they exist
+        if 'EndDateObj' in df.columns and 'TodayObj' in df.columns:
+            df = df.drop(['EndDateObj', 'TodayObj'], axis=1)
     
     return df
 
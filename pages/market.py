@@ -1,9 +1,15 @@
 import dash
-from dash import html, dcc, dash_table
+from datetime import date
+from dash import html, dcc, dash_table, Input, Output, callback
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from utils.stock_data import calculate_portfolio_metrics
+from utils.data_layer import get_data, get_error, invalidate
+from utils.holdings_store import load_holdings
+from utils.market_performance import CHART_RANGES, get_performance_figure
+from utils.portfolio_utils import get_price_changes
+from utils.quote_cache import STOCK_QUOTE_TTL
 
 # Register the page
 dash.register_page(
@@ -15,30 +21,35 @@ dash.register_page(
     order=1  # Make it the second tab
 )
 
-# Read the portfolio data
-df = pd.read_csv('assets/PersonalFiles/myPortfolio.csv')
-portfolio_metrics = calculate_portfolio_metrics(df)
+# Range shown when the page opens
+DEFAULT_CHART_RANGE = '1Y'
 
-# Create market performance chart
-def create_market_chart():
-    # This is a placeholder. In a real app, you would fetch real market data
-    return go.Figure(
+# Rows in each of the gainers/losers tables
+TOP_MOVERS = 10
+
+# How often (ms) the gainers/losers tables refresh; quotes still valid in the
+# quote cache are not fetched again, so a closed market costs no requests
+MOVERS_REFRESH_INTERVAL = STOCK_QUOTE_TTL * 1000
+
+# Create market performance chart from rebased portfolio/NIFTY series (see utils/market_performance.py)
+def create_market_chart(series):
+    figure = go.Figure(
         data=[
             go.Scatter(
-                x=['Jan', 'Feb', 'Mar', 'Apr', 'May'],
-                y=[100, 105, 103, 107, 110],
+                x=series['dates'],
+                y=series['portfolio'],
                 name='Portfolio',
                 line=dict(color='#4B0082')
             ),
             go.Scatter(
-                x=['Jan', 'Feb', 'Mar', 'Apr', 'May'],
-                y=[100, 102, 101, 103, 104],
+                x=series['dates'],
+                y=series['nifty'],
                 name='NIFTY 50',
                 line=dict(color='#98FB98')
             )
         ]
     ).update_layout(
-        title="Portfolio vs Market Performance",
+        title="Portfolio vs Market Performance (rebased to 100)",
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)',
         font=dict(color='white'),
@@ -55,161 +66,251 @@ def create_market_chart():
         height=400,
         margin=dict(t=50, b=0, l=0, r=0)
     )
+    if len(series['dates']) == 0:
+        figure.add_annotation(text="Loading price history...", showarrow=False, font=dict(color='white'))
+    return figure
+
+def get_market_history():
+    """Status of today's price history update, starting (or restarting) it as needed."""
+    status = get_data('market_history', retry_failed=True)
+    if status is not None and status['date'] != date.today().isoformat():
+        invalidate('market_history')
+        status = get_data('market_history')
+    return status
+
+# Create sector distribution chart from the portfolio metrics
+def create_sector_chart(sector_distribution):
+    return go.Figure(
+        data=[
+            go.Pie(
+                labels=list(sector_distribution.keys()),
+                values=list(sector_distribution.values()),
+                hole=0.4,
+                textinfo='label+percent'
+            )
+        ]
+    ).update_layout(
+        title="Sector Distribution",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white'),
+        showlegend=False,
+        height=400,
+        margin=dict(t=50, b=0, l=0, r=0)
+    )
 
-# For demo purposes, create top gainers and losers
-def get_top_gainers_losers():
-    # Create sample data for top gainers
-    gainers = pd.DataFrame({
-        'Stock': ['NTPC', 'GAIL', 'ITC', 'SBIN', 'BEL', 'TATAPOWER', 'TATAMOTORS', 'DLF', 'ADANIGREEN', 'APOLLOTYRE'],
-        'Price': [354.55, 189.09, 420.30, 750.40, 290.25, 385.45, 700.90, 695.75, 900.70, 440.25],
-        'Change': ['+5.2%', '+4.8%', '+3.9%', '+3.5%', '+3.2%', '+2.9%', '+2.7%', '+2.5%', '+2.3%', '+2.1%']
-    })
+def create_sector_content(portfolio_metrics=None, error=None):
+    """Sector chart once metrics are available, otherwise a loading or error state."""
+    if portfolio_metrics is not None:
+        return dcc.Graph(
+            figure=create_sector_chart(portfolio_metrics['sector_distribution']),
+            config={'displayModeBar': False}
+        )
+    if error:
+        return dbc.Alert(f"Could not load sector data: {error}", color="danger", className="m-2")
+    return dbc.Spinner(
+        html.Div("Loading sector data...", className="text-muted text-center p-4"),
+        color="success"
+    )
+
+def _top(scores, k):
+    """Indices of the k largest positive scores, largest first.
+
+    argpartition picks them without sorting everything; only the k picked are sorted.
+    """
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+# Top gainers and losers among held stocks, by change from the previous close
+def get_top_gainers_losers(k=TOP_MOVERS, fetch=True):
+    symbols = load_holdings('stocks')['NSE_Symbol']
+    quotes = get_price_changes(sorted(set(symbols[symbols != ''])), fetch=fetch)
+    stocks = sorted(quotes)
+    prices = np.array([quotes[symbol][0] for symbol in stocks], dtype=np.float64)
+    previous_closes = np.array([quotes[symbol][1] for symbol in stocks], dtype=np.float64)
+    changes = (prices / previous_closes - 1) * 100 if stocks else np.array([])
     
-    # Create sample data for top losers
-    losers = pd.DataFrame({
-        'Stock': ['RPOWER', 'SUZLON', 'JYOTISTRUC', 'VIKASECO', 'BANDHANBNK', 'PNB', 'IDBI', 'L&TFH', 'NHPC', 'BANKINDIA'],
-        'Price': [39.99, 56.40, 25.30, 2.75, 160.45, 100.25, 82.30, 155.25, 80.40, 110.25],
-        'Change': ['-4.1%', '-3.8%', '-3.5%', '-3.3%', '-3.0%', '-2.8%', '-2.5%', '-2.3%', '-2.0%', '-1.8%']
-    })
+    def movers(rows):
+        return pd.DataFrame({
+            'Stock': [stocks[row] for row in rows],
+            'Price': prices[rows],
+            'Change': changes[rows]
+        })
     
-    return gainers, losers
-
-gainers_df, losers_df = get_top_gainers_losers()
-
-# Create tables for top gainers and losers
-gainers_table = dash_table.DataTable(
-    id='gainers-table',
-    columns=[
-        {'name': 'Stock', 'id': 'Stock', 'type': 'text'},
-        {'name': 'Price', 'id': 'Price', 'type': 'numeric', 'format': {'specifier': ',.2f'}},
-        {'name': 'Change', 'id': 'Change', 'type': 'text'}
-    ],
-    data=gainers_df.to_dict('records'),
-    style_table={
-        'overflowX': 'auto',
-        'overflowY': 'auto',
-        'maxHeight': '300px',
-    },
-    style_header={
-        'backgroundColor': '#2C3034',
-        'color': 'white',
-        'fontWeight': 'bold',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040'
-    },
-    style_cell={
-        'backgroundColor': '#1e2124',
-        'color': 'white',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040',
-        'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
-        'minWidth': '100px',
-        'maxWidth': '180px',
-        'overflow': 'hidden',
-        'textOverflow': 'ellipsis'
-    },
-    style_data_conditional=[
-        {
-            'if': {'row_index': 'odd'},
-            'backgroundColor': '#212529'
-        }
-    ]
+    return movers(_top(changes, k)), movers(_top(-changes, k))
+
+# Create a gainers or losers table
+def create_movers_table(table_id, df):
+    return dash_table.DataTable(
+        id=table_id,
+        columns=[
+            {'name': 'Stock', 'id': 'Stock', 'type': 'text'},
+            {'name': 'Price', 'id': 'Price', 'type': 'numeric', 'format': {'specifier': ',.2f'}},
+            {'name': 'Change %', 'id': 'Change', 'type': 'numeric', 'format': {'specifier': '+.2f'}}
+        ],
+        data=df.to_dict('records'),
+        style_table={
+            'overflowX': 'auto',
+            'overflowY': 'auto',
+            'maxHeight': '300px',
+        },
+        style_header={
+            'backgroundColor': '#2C3034',
+            'color': 'white',
+            'fontWeight': 'bold',
+            'textAlign': 'left',
+            'padding': '10px',
+            'border': '1px solid #404040'
+        },
+        style_cell={
+            'backgroundColor': '#1e2124',
+            'color': 'white',
+            'textAlign': 'left',
+            'padding': '10px',
+            'border': '1px solid #404040',
+            'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
+            'minWidth': '100px',
+            'maxWidth': '180px',
+            'overflow': 'hidden',
+            'textOverflow': 'ellipsis'
+        },
+        style_data_conditional=[
+            {
+                'if': {'row_index': 'odd'},
+                'backgroundColor': '#212529'
+            },
+            {
+                'if': {'filter_query': '{Change} > 0', 'column_id': 'Change'},
+                'color': '#00ff00'
+            },
+            {
+                'if': {'filter_query': '{Change} < 0', 'column_id': 'Change'},
+                'color': '#ff0000'
+            }
+        ]
+    )
+
+# Page layout - sector metrics come from the shared data layer and load in the background
+def layout(**kwargs):
+    portfolio_metrics = get_data('market_metrics', retry_failed=True)
+    market_history = get_market_history()
+    # Cached quotes only; the movers poll fetches the rest once the page is up
+    gainers_df, losers_df = get_top_gainers_losers(fetch=False)
+    
+    return html.Div([
+        dbc.Card([
+            dbc.CardHeader([
+                html.H3([
+                    html.I(className="fas fa-chart-line me-2"),
+                    "Market Analysis"
+                ], className="text-center text-primary m-2")
+            ], className="bg-dark"),
+            dbc.CardBody([
+                # Market Performance Chart
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader([
+                                html.H5("Market Performance", className="card-title text-muted d-inline"),
+                                dbc.RadioItems(
+                                    id="market-range",
+                                    options=[{"label": label, "value": label} for label in CHART_RANGES],
+                                    value=DEFAULT_CHART_RANGE,
+                                    inline=True,
+                                    className="float-end text-light"
+                                )
+                            ], className="bg-dark border-secondary"),
+                            dbc.CardBody([
+                                dcc.Graph(
+                                    id="market-chart",
+                                    figure=get_performance_figure(DEFAULT_CHART_RANGE, create_market_chart),
+                                    config={'displayModeBar': False}
+                                ),
+                                dcc.Interval(id="market-history-poll", interval=1000,
+                                             disabled=market_history is not None)
+                            ], className="p-0")
+                        ], className="bg-dark border-secondary mb-3")
+                    ], width=12)
+                ], className="mb-3"),
+                
+                # Sector Distribution
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader([
+                                html.H5("Sector Distribution", className="card-title text-muted")
+                            ], className="bg-dark border-secondary"),
+                            dbc.CardBody([
+                                html.Div(create_sector_content(portfolio_metrics), id="market-sector-content"),
+                                dcc.Interval(id="market-data-poll", interval=1000,
+                                             disabled=portfolio_metrics is not None)
+                            ], className="p-0")
+                        ], className="bg-dark border-secondary mb-3")
+                    ], width=12)
+                ], className="mb-3"),
+                
+                # Gainers and Losers
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader([
+                                html.H5(f"Top {TOP_MOVERS} Gainers", className="card-title text-success")
+                            ], className="bg-dark border-secondary"),
+                            dbc.CardBody([
+                                create_movers_table('gainers-table', gainers_df)
+                            ], className="p-2")
+                        ], className="bg-dark border-secondary mb-3")
+                    ], width=6),
+                    
+                    dbc.Col([
+                        dbc.Card([
+                            dbc.CardHeader([
+                                html.H5(f"Top {TOP_MOVERS} Losers", className="card-title text-danger")
+                            ], className="bg-dark border-secondary"),
+                            dbc.CardBody([
+                                create_movers_table('losers-table', losers_df)
+                            ], className="p-2")
+                        ], className="bg-dark border-secondary mb-3")
+                    ], width=6)
+                ], className="mb-3"),
+                dcc.Interval(id="movers-poll", interval=MOVERS_REFRESH_INTERVAL)
+            ], className="bg-dark p-3")
+        ], className="shadow")
+    ], className="p-4")
+
+# Callback to show the sector chart once the data layer has loaded the metrics
+@callback(
+    [Output("market-sector-content", "children"), Output("market-data-poll", "disabled")],
+    Input("market-data-poll", "n_intervals"),
+    prevent_initial_call=True
 )
+def poll_market_metrics(n_intervals):
+    portfolio_metrics = get_data('market_metrics')
+    if portfolio_metrics is None:
+        error = get_error('market_metrics')
+        if error:
+            return create_sector_content(error=error), True
+        return dash.no_update, False
+    
+    return create_sector_content(portfolio_metrics), True
 
-losers_table = dash_table.DataTable(
-    id='losers-table',
-    columns=[
-        {'name': 'Stock', 'id': 'Stock', 'type': 'text'},
-        {'name': 'Price', 'id': 'Price', 'type': 'numeric', 'format': {'specifier': ',.2f'}},
-        {'name': 'Change', 'id': 'Change', 'type': 'text'}
-    ],
-    data=losers_df.to_dict('records'),
-    style_table={
-        'overflowX': 'auto',
-        'overflowY': 'auto',
-        'maxHeight': '300px',
-    },
-    style_header={
-        'backgroundColor': '#2C3034',
-        'color': 'white',
-        'fontWeight': 'bold',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040'
-    },
-    style_cell={
-        'backgroundColor': '#1e2124',
-        'color': 'white',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040',
-        'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
-        'minWidth': '100px',
-        'maxWidth': '180px',
-        'overflow': 'hidden',
-        'textOverflow': 'ellipsis'
-    },
-    style_data_conditional=[
-        {
-            'if': {'row_index': 'odd'},
-            'backgroundColor': '#212529'
-        }
-    ]
+# Callback to redraw the performance chart for the selected range, and once the price history has loaded
+@callback(
+    [Output("market-chart", "figure"), Output("market-history-poll", "disabled")],
+    [Input("market-range", "value"), Input("market-history-poll", "n_intervals")],
+    prevent_initial_call=True
 )
+def update_market_chart(range_key, n_intervals):
+    loaded = get_data('market_history') is not None or get_error('market_history') is not None
+    return get_performance_figure(range_key or DEFAULT_CHART_RANGE, create_market_chart), loaded
 
-# Page layout
-layout = html.Div([
-    dbc.Card([
-        dbc.CardHeader([
-            html.H3([
-                html.I(className="fas fa-chart-line me-2"),
-                "Market Analysis"
-            ], className="text-center text-primary m-2")
-        ], className="bg-dark"),
-        dbc.CardBody([
-            # Market Performance Chart
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader([
-                            html.H5("Market Performance", className="card-title text-muted")
-                        ], className="bg-dark border-secondary"),
-                        dbc.CardBody([
-                            dcc.Graph(
-                                figure=create_market_chart(),
-                                config={'displayModeBar': False}
-                            )
-                        ], className="p-0")
-                    ], className="bg-dark border-secondary mb-3")
-                ], width=12)
-            ], className="mb-3"),
-            
-            # Gainers and Losers
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader([
-                            html.H5("Top 10 Gainers", className="card-title text-success")
-                        ], className="bg-dark border-secondary"),
-                        dbc.CardBody([
-                            gainers_table
-                        ], className="p-2")
-                    ], className="bg-dark border-secondary mb-3")
-                ], width=6),
-                
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardHeader([
-                            html.H5("Top 10 Losers", className="card-title text-danger")
-                        ], className="bg-dark border-secondary"),
-                        dbc.CardBody([
-                            losers_table
-                        ], className="p-2")
-                    ], className="bg-dark border-secondary mb-3")
-                ], width=6)
-            ], className="mb-3")
-        ], className="bg-dark p-3")
-    ], className="shadow")
-], className="p-4") 
\ No newline at end of file
+# Callback to refresh the gainers/losers tables, right after the page loads and then on every poll
+@callback(
+    [Output("gainers-table", "data"), Output("losers-table", "data")],
+    Input("movers-poll", "n_intervals")
+)
+def update_movers(n_intervals):
+    gainers_df, losers_df = get_top_gainers_losers()
+    return gainers_df.to_dict('records'), losers_df.to_dict('records')
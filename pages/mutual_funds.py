@@ -1,9 +1,9 @@
 import dash
 from dash import html, dash_table, dcc, Input, Output, State, callback
 import dash_bootstrap_components as dbc
-from utils.mutual_fund_utils import load_mf_portfolio_data, get_mf_portfolio_summary, get_scheme_name_from_code
-import pandas as pd
-import os
+from utils.mutual_fund_utils import get_mf_portfolio_summary, get_scheme_name_from_code
+from utils.price_refresher import get_snapshot, request_refresh
+from utils.ledger import record_event
 
 # Register the page - but not in the nav since it's now a sub-tab
 dash.register_page(
@@ -16,109 +16,136 @@ dash.register_page(
     nav=False
 )
 
-# Load mutual fund portfolio data
-df = load_mf_portfolio_data()
-summary = get_mf_portfolio_summary(df)
-
 # Create the DataTable with filters
-table = dash_table.DataTable(
-    id='mf-portfolio-table',
-    columns=[
-        {'name': 'Scheme', 'id': 'Scheme', 'type': 'text'},
-        {'name': 'Units Owned', 'id': 'UnitsOwned', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Average NAV', 'id': 'AverageNAV', 'type': 'numeric', 
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Current NAV', 'id': 'Current NAV', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Total Investment', 'id': 'TotalInvestment', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Current Value', 'id': 'Current Value', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Profit/Loss', 'id': 'Profit/Loss', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Returns %', 'id': 'Returns %', 'type': 'numeric',
-         'format': {'specifier': '.2f'}}
-    ],
-    data=df.to_dict('records'),
-    filter_action='native',
-    sort_action='native',
-    sort_mode='multi',
-    page_size=10,
-    style_table={
-        'overflowX': 'auto',
-        'overflowY': 'auto',
-        'maxHeight': '60vh',
-    },
-    style_header={
-        'backgroundColor': '#2C3034',
-        'color': 'white',
-        'fontWeight': 'bold',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040'
-    },
-    style_cell={
-        'backgroundColor': '#1e2124',
-        'color': 'white',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040',
-        'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
-        'minWidth': '100px',
-        'maxWidth': '180px',
-        'overflow': 'hidden',
-        'textOverflow': 'ellipsis'
-    },
-    style_data_conditional=[
-        {
-            'if': {'row_index': 'odd'},
-            'backgroundColor': '#212529'
+def create_table(records):
+    """Build the mutual fund portfolio table for the given rows."""
+    return dash_table.DataTable(
+        id='mf-portfolio-table',
+        columns=[
+            {'name': 'Scheme', 'id': 'Scheme', 'type': 'text'},
+            {'name': 'Units Owned', 'id': 'UnitsOwned', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Average NAV', 'id': 'AverageNAV', 'type': 'numeric', 
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Current NAV', 'id': 'Current NAV', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Total Investment', 'id': 'TotalInvestment', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Current Value', 'id': 'Current Value', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Profit/Loss', 'id': 'Profit/Loss', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Returns %', 'id': 'Returns %', 'type': 'numeric',
+             'format': {'specifier': '.2f'}},
+            {'name': 'XIRR %', 'id': 'XIRR %', 'type': 'numeric',
+             'format': {'specifier': '.2f'}},
+            {'name': 'TWR %', 'id': 'TWR %', 'type': 'numeric',
+             'format': {'specifier': '.2f'}},
+            {'name': 'Realized P&L', 'id': 'Realized P&L', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'NAV Source', 'id': 'NAV Source', 'type': 'text'},
+            {'name': 'NAV Age', 'id': 'NAV Age', 'type': 'text'}
+        ],
+        data=records,
+        filter_action='native',
+        sort_action='native',
+        sort_mode='multi',
+        page_size=10,
+        style_table={
+            'overflowX': 'auto',
+            'overflowY': 'auto',
+            'maxHeight': '60vh',
         },
-        {
-            'if': {
-                'filter_query': '{Returns %} > 0',
-                'column_id': 'Returns %'
-            },
-            'color': '#00ff00'
+        style_header={
+            'backgroundColor': '#2C3034',
+            'color': 'white',
+            'fontWeight': 'bold',
+            'textAlign': 'left',
+            'padding': '10px',
+            'border': '1px solid #404040'
         },
-        {
-            'if': {
-                'filter_query': '{Returns %} < 0',
-                'column_id': 'Returns %'
-            },
-            'color': '#ff0000'
+        style_cell={
+            'backgroundColor': '#1e2124',
+            'color': 'white',
+            'textAlign': 'left',
+            'padding': '10px',
+            'border': '1px solid #404040',
+            'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
+            'minWidth': '100px',
+            'maxWidth': '180px',
+            'overflow': 'hidden',
+            'textOverflow': 'ellipsis'
         },
-        {
-            'if': {
-                'filter_query': '{Profit/Loss} > 0',
-                'column_id': 'Profit/Loss'
+        style_data_conditional=[
+            {
+                'if': {'row_index': 'odd'},
+                'backgroundColor': '#212529'
             },
-            'color': '#00ff00'
-        },
-        {
-            'if': {
-                'filter_query': '{Profit/Loss} < 0',
-                'column_id': 'Profit/Loss'
+            {
+                'if': {
+                    'filter_query': '{Returns %} > 0',
+                    'column_id': 'Returns %'
+                },
+                'color': '#00ff00'
+            },
+            {
+                'if': {
+                    'filter_query': '{Returns %} < 0',
+                    'column_id': 'Returns %'
+                },
+                'color': '#ff0000'
+            },
+            {
+                'if': {
+                    'filter_query': '{Profit/Loss} > 0',
+                    'column_id': 'Profit/Loss'
+                },
+                'color': '#00ff00'
+            },
+            {
+                'if': {
+                    'filter_query': '{Profit/Loss} < 0',
+                    'column_id': 'Profit/Loss'
+                },
+                'color': '#ff0000'
+            },
+            {
+                'if': {
+                    'filter_query': '{Realized P&L} > 0',
+                    'column_id': 'Realized P&L'
+                },
+                'color': '#00ff00'
             },
-            'color': '#ff0000'
+            {
+                'if': {
+                    'filter_query': '{Realized P&L} < 0',
+                    'column_id': 'Realized P&L'
+                },
+                'color': '#ff0000'
+            },
+            {
+                'if': {
+                    'filter_query': '{NAV Source} != "Live"',
+                    'column_id': ['NAV Source', 'NAV Age']
+                },
+                'color': '#ffc107'
+            }
+        ],
+        style_filter={
+            'backgroundColor': '#2C3034',
+            'color': 'white',
+            'padding': '5px'
+        },
+        filter_options={
+            'case': 'insensitive',
+            'placeholder_text': 'Filter...'
         }
-    ],
-    style_filter={
-        'backgroundColor': '#2C3034',
-        'color': 'white',
-        'padding': '5px'
-    },
-    filter_options={
-        'case': 'insensitive',
-        'placeholder_text': 'Filter...'
-    }
-)
+    )
 
-# Add Mutual Fund Modal
+# Record Mutual Fund Transaction Modal
 add_mf_modal = dbc.Modal(
     [
-        dbc.ModalHeader(dbc.ModalTitle("Add New Mutual Fund"), close_button=True),
+        dbc.ModalHeader(dbc.ModalTitle("Record Mutual Fund Transaction"), close_button=True),
         dbc.ModalBody([
             dbc.Form([
                 dbc.Row([
@@ -134,12 +161,26 @@ add_mf_modal = dbc.Modal(
                 ], className="mb-3"),
                 dbc.Row([
                     dbc.Col([
-                        dbc.Label("Units Owned", html_for="units-owned"),
-                        dbc.Input(type="number", id="units-owned", placeholder="Number of units", min=0.01, step=0.01, required=True),
+                        dbc.Label("Transaction", html_for="mf-event"),
+                        dbc.Select(id="mf-event", value="buy",
+                                   options=[{"label": "Lump-sum Purchase", "value": "buy"},
+                                            {"label": "SIP Instalment", "value": "sip"},
+                                            {"label": "Redemption", "value": "redemption"}]),
                     ], width=6),
                     dbc.Col([
-                        dbc.Label("Average NAV", html_for="avg-nav"),
-                        dbc.Input(type="number", id="avg-nav", placeholder="Average NAV per unit", min=0.01, step=0.01, required=True),
+                        dbc.Label("Date", html_for="mf-event-date"),
+                        dbc.Input(type="date", id="mf-event-date"),
+                        dbc.FormText("Defaults to today", color="secondary"),
+                    ], width=6),
+                ], className="mb-3"),
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Label("Units", html_for="units-owned"),
+                        dbc.Input(type="number", id="units-owned", placeholder="Number of units", min=0.001, step=0.001, required=True),
+                    ], width=6),
+                    dbc.Col([
+                        dbc.Label("NAV", html_for="avg-nav"),
+                        dbc.Input(type="number", id="avg-nav", placeholder="NAV per unit", min=0.01, step=0.0001, required=True),
                     ], width=6),
                 ], className="mb-3"),
                 dbc.Alert(
@@ -154,7 +195,7 @@ add_mf_modal = dbc.Modal(
         ]),
         dbc.ModalFooter([
             dbc.Button("Close", id="close-add-mf", className="me-2", color="secondary"),
-            dbc.Button("Add Fund", id="save-mf", color="success"),
+            dbc.Button("Save", id="save-mf", color="success"),
         ]),
     ],
     id="add-mf-modal",
@@ -162,83 +203,160 @@ add_mf_modal = dbc.Modal(
     is_open=False,
 )
 
-# Page layout - now simpler, without the card wrapper since it's in a tab
-layout = html.Div([
-    # Add Mutual Fund Button
-    dbc.Row([
-        dbc.Col([
-            dbc.Button([
-                html.I(className="fas fa-plus me-2"),
-                "Add Mutual Fund"
-            ], id="open-add-mf", color="success", className="mb-3 float-end")
-        ], width=12),
-    ]),
-    # Summary Row
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Investment", className="card-title text-muted"),
-                    html.H4(f"₹{summary['total_investment']:,.2f}", className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Current Value", className="card-title text-muted"),
-                    html.H4(f"₹{summary['current_value']:,.2f}", className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Returns", className="card-title text-muted"),
-                    html.H4([
-                        f"{summary['total_returns']}%"
-                    ], className=f"mb-2 {'text-success' if summary['total_returns'] > 0 else 'text-danger'}")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4)
-    ], className="mb-3"),
-    # New Metrics Row
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Number of Schemes", className="card-title text-muted"),
-                    html.H4(f"{summary['num_schemes']}", className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Profitable Schemes", className="card-title text-muted"),
-                    html.H4(f"{summary['profitable_schemes']} / {summary['num_schemes']}", 
-                           className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Balance in Performing", className="card-title text-muted"),
-                    html.H4([
-                        f"{summary['percent_in_performing']}%"
-                    ], className=f"mb-2 {'text-success' if summary['percent_in_performing'] > 0 else 'text-danger'}")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4)
-    ], className="mb-3"),
-    # Table Container
-    html.Div([
-        table
-    ], className="border border-secondary"),
-    # Add the modal to the layout
-    add_mf_modal
-])
+def format_rate(rate):
+    """A percentage for a summary card, or a dash when it could not be computed."""
+    return f"{rate}%" if rate is not None else "—"
+
+# Summary cards for the top of the page
+def create_summary(summary):
+    """Build the summary card rows for the given mutual fund summary."""
+    return [
+        # Summary Row
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Total Investment", className="card-title text-muted"),
+                        html.H4(f"₹{summary['total_investment']:,.2f}", className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Current Value", className="card-title text-muted"),
+                        html.H4(f"₹{summary['current_value']:,.2f}", className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Total Returns", className="card-title text-muted"),
+                        html.H4([
+                            f"{summary['total_returns']}%"
+                        ], className=f"mb-2 {'text-success' if summary['total_returns'] > 0 else 'text-danger'}")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Realized P&L", className="card-title text-muted"),
+                        html.H4(f"₹{summary['realized_pnl']:,.2f}",
+                                className=f"mb-2 {'text-success' if summary['realized_pnl'] >= 0 else 'text-danger'}")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3)
+        ], className="mb-3"),
+        # New Metrics Row
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Number of Schemes", className="card-title text-muted"),
+                        html.H4(f"{summary['num_schemes']}", className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Profitable Schemes", className="card-title text-muted"),
+                        html.H4(f"{summary['profitable_schemes']} / {summary['num_schemes']}", 
+                               className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Balance in Performing", className="card-title text-muted"),
+                        html.H4([
+                            f"{summary['percent_in_performing']}%"
+                        ], className=f"mb-2 {'text-success' if summary['percent_in_performing'] > 0 else 'text-danger'}")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("XIRR / TWR", className="card-title text-muted"),
+                        html.H4(f"{format_rate(summary['xirr'])} / {format_rate(summary['twr'])}",
+                                className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3)
+        ], className="mb-3")
+    ]
+
+def create_loading_summary(error=None):
+    """Placeholder shown in place of the summary cards while NAVs load."""
+    if error:
+        return dbc.Alert(f"Could not load mutual fund portfolio: {error}", color="danger")
+    return dbc.Spinner(
+        html.Div("Loading latest NAVs...", className="text-muted text-center p-4"),
+        color="success"
+    )
+
+# How often the page checks for a newer snapshot (ms) - fast while waiting for data
+LOADING_POLL_INTERVAL = 1000
+SNAPSHOT_POLL_INTERVAL = 15000
+
+# Page layout - rendered per request from the latest snapshot, or a loading state while it arrives
+def layout(**kwargs):
+    snapshot = get_snapshot()
+    df = snapshot.mutual_funds if snapshot is not None else None
+    
+    return html.Div([
+        # Record Transaction Button
+        dbc.Row([
+            dbc.Col([
+                dbc.Button([
+                    html.I(className="fas fa-plus me-2"),
+                    "Record Transaction"
+                ], id="open-add-mf", color="success", className="mb-3 float-end")
+            ], width=12),
+        ]),
+        # Summary Rows (or loading state)
+        html.Div(
+            create_summary(get_mf_portfolio_summary(df)) if df is not None else create_loading_summary(),
+            id="mf-summary"
+        ),
+        # Table Container
+        html.Div([
+            create_table(df.to_dict('records') if df is not None else [])
+        ], className="border border-secondary"),
+        # Poll for newer snapshots from the background refresher
+        dcc.Interval(id="mf-data-poll",
+                     interval=SNAPSHOT_POLL_INTERVAL if df is not None else LOADING_POLL_INTERVAL),
+        dcc.Store(id="mf-data-version", data=snapshot.version if df is not None else None),
+        # Add the modal to the layout
+        add_mf_modal
+    ])
+
+# Callback to pull the latest snapshot whenever the refresher publishes a new version
+@callback(
+    [Output("mf-summary", "children"),
+     Output("mf-portfolio-table", "data", allow_duplicate=True),
+     Output("mf-data-poll", "interval"),
+     Output("mf-data-version", "data")],
+    Input("mf-data-poll", "n_intervals"),
+    State("mf-data-version", "data"),
+    prevent_initial_call=True
+)
+def poll_mf_portfolio_data(n_intervals, version):
+    snapshot = get_snapshot()
+    if snapshot is None or snapshot.version == version:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    
+    df = snapshot.mutual_funds
+    if df is None:
+        return (create_loading_summary(snapshot.errors.get('mutual_funds')), dash.no_update,
+                SNAPSHOT_POLL_INTERVAL, snapshot.version)
+    
+    return (create_summary(get_mf_portfolio_summary(df)), df.to_dict('records'),
+            SNAPSHOT_POLL_INTERVAL, snapshot.version)
 
 # Callbacks for the modal
 @callback(
@@ -275,11 +393,13 @@ def autofill_scheme_name(scheme_code):
         State("scheme-code", "value"),
         State("units-owned", "value"),
         State("avg-nav", "value"),
+        State("mf-event", "value"),
+        State("mf-event-date", "value"),
         State("add-mf-alert", "is_open")
     ],
     prevent_initial_call=True
 )
-def add_mutual_fund(n_clicks, scheme_name, scheme_code, units_owned, avg_nav, is_open):
+def add_mutual_fund(n_clicks, scheme_name, scheme_code, units_owned, avg_nav, event, event_date, is_open):
     if not n_clicks:
         return is_open, ""
     
@@ -292,48 +412,30 @@ def add_mutual_fund(n_clicks, scheme_name, scheme_code, units_owned, avg_nav, is
         units_owned = float(units_owned)
         avg_nav = float(avg_nav)
         
-        # Create new row for the dataframe
-        new_scheme = pd.DataFrame({
-            'Scheme': [scheme_name],
-            'UnitsOwned': [units_owned],
-            'AverageNAV': [avg_nav],
-            'SchemeCode': [scheme_code]
-        })
-        
-        # Load existing data
-        csv_path = 'assets/PersonalFiles/myMFPortfolio.csv'
-        if os.path.exists(csv_path):
-            existing_data = pd.read_csv(csv_path)
-            
-            # Check if scheme already exists
-            if scheme_code in existing_data['SchemeCode'].values:
-                return True, f"Scheme with code {scheme_code} already exists in portfolio."
-            
-            # Append new scheme
-            updated_data = pd.concat([existing_data, new_scheme], ignore_index=True)
-        else:
-            updated_data = new_scheme
-        
-        # Save to CSV
-        updated_data.to_csv(csv_path, index=False)
+        # Append to the ledger; the position and realized P&L update with it
+        try:
+            record_event('mutual_funds', event or 'buy', str(scheme_code).strip(), scheme_name,
+                         units_owned, avg_nav, event_date or None)
+        except ValueError as e:
+            return True, str(e)
         
         # Success message and reload page
-        return True, "Mutual Fund added successfully! Page will reload."
+        return True, "Transaction recorded! Page will reload."
         
     except Exception as e:
         return True, f"Error: {str(e)}"
 
-# Callback to refresh the page after adding a mutual fund
+# Callback to refresh the page after recording a transaction
 @callback(
-    Output("mf-portfolio-table", "data"),
+    Output("mf-data-poll", "interval", allow_duplicate=True),
     Input("add-mf-alert", "children"),
     prevent_initial_call=True
 )
 def refresh_data(alert_message):
-    if "Mutual Fund added successfully" in alert_message:
-        # Reload data
-        refreshed_df = load_mf_portfolio_data()
-        return refreshed_df.to_dict('records')
+    if "Transaction recorded" in alert_message:
+        # Revalue in the background and poll quickly until the new snapshot lands
+        request_refresh()
+        return LOADING_POLL_INTERVAL
     
-    # If not successful, return existing data
-    return dash.no_update 
\ No newline at end of file
+    # If not successful, keep polling as before
+    return dash.no_update
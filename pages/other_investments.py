@@ -1,8 +1,7 @@
 import dash
 from dash import html, dash_table, dcc
 import dash_bootstrap_components as dbc
-import pandas as pd
-import os
+from utils.holdings_store import load_holdings
 
 # Register the page - but not in the nav since it's a sub-tab
 dash.register_page(
@@ -15,29 +14,16 @@ dash.register_page(
     nav=False
 )
 
-# Load data - create empty table if file doesn't exist
+# Load data
 def load_other_investments_data():
-    # Check if file exists
-    csv_path = 'assets/PersonalFiles/myOtherInvestments.csv'
-    os.makedirs('assets/PersonalFiles', exist_ok=True)
+    # Holdings live in the holdings store (mirrored to myOtherInvestments.csv)
+    df = load_holdings('other_investments')
     
-    if os.path.exists(csv_path):
-        # Read the data if file exists
-        df = pd.read_csv(csv_path)
-        
-        # Calculate metrics if data exists
-        if not df.empty:
-            df['CurrentValue'] = df['Amount'] * (1 + (df['ExpectedReturn'] / 100))
-            df['Profit/Loss'] = df['CurrentValue'] - df['Amount']
-            df['Returns %'] = ((df['CurrentValue'] - df['Amount']) / df['Amount'] * 100).round(2)
-        
-    else:
-        # Create empty DataFrame with correct columns
-        df = pd.DataFrame(columns=[
-            'Investment', 'Amount', 'StartDate', 'EndDate', 'ExpectedReturn'
-        ])
-        # Save the empty file
-        df.to_csv(csv_path, index=False)
+    # Calculate metrics if data exists
+    if not df.empty:
+        df['CurrentValue'] = df['Amount'] * (1 + (df['ExpectedReturn'] / 100))
+        df['Profit/Loss'] = df['CurrentValue'] - df['Amount']
+        df['Returns %'] = ((df['CurrentValue'] - df['Amount']) / df['Amount'] * 100).round(2)
     
     return df
 
@@ -1,9 +1,10 @@
 import dash
-from dash import html, dash_table, dcc, Input, Output, State, callback
+from dash import html, dash_table, dcc, Input, Output, State, callback, ctx, no_update
 import dash_bootstrap_components as dbc
-from utils.portfolio_utils import load_portfolio_data, get_portfolio_summary, get_stock_name_from_symbol
-import pandas as pd
-import os
+from utils.portfolio_utils import get_portfolio_summary, get_stock_name_from_symbol
+from utils.price_refresher import get_snapshot, request_refresh
+from utils.symbol_master import get_company_name, suggest_symbols
+from utils.ledger import record_event
 from utils.mf_excel_converter import convert_holdings_to_csv
 
 # Register the page - but not in the nav since it's now a sub-tab
@@ -17,108 +18,135 @@ dash.register_page(
     nav=False
 )
 
-# Load portfolio data
-df = load_portfolio_data()
-summary = get_portfolio_summary(df)
-
 # Create the DataTable with filters
-table = dash_table.DataTable(
-    id='stock-portfolio-table',
-    columns=[
-        {'name': 'Stock', 'id': 'Stock', 'type': 'text'},
-        {'name': 'Shares Owned', 'id': 'SharesOwned', 'type': 'numeric'},
-        {'name': 'Average Price', 'id': 'AveragePrice', 'type': 'numeric', 
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Current Price', 'id': 'Current Price', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Total Investment', 'id': 'TotalInvestment', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Current Value', 'id': 'Current Value', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Profit/Loss', 'id': 'Profit/Loss', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Returns %', 'id': 'Returns %', 'type': 'numeric',
-         'format': {'specifier': '.2f'}}
-    ],
-    data=df.to_dict('records'),
-    filter_action='native',
-    sort_action='native',
-    sort_mode='multi',
-    page_size=10,
-    style_table={
-        'overflowX': 'auto',
-        'overflowY': 'auto',
-        'maxHeight': '60vh',
-    },
-    style_header={
-        'backgroundColor': '#2C3034',
-        'color': 'white',
-        'fontWeight': 'bold',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040'
-    },
-    style_cell={
-        'backgroundColor': '#1e2124',
-        'color': 'white',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040',
-        'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
-        'minWidth': '100px',
-        'maxWidth': '180px',
-        'overflow': 'hidden',
-        'textOverflow': 'ellipsis'
-    },
-    style_data_conditional=[
-        {
-            'if': {'row_index': 'odd'},
-            'backgroundColor': '#212529'
+def create_table(records):
+    """Build the stock portfolio table for the given rows."""
+    return dash_table.DataTable(
+        id='stock-portfolio-table',
+        columns=[
+            {'name': 'Stock', 'id': 'Stock', 'type': 'text'},
+            {'name': 'Shares Owned', 'id': 'SharesOwned', 'type': 'numeric'},
+            {'name': 'Average Price', 'id': 'AveragePrice', 'type': 'numeric', 
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Current Price', 'id': 'Current Price', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Total Investment', 'id': 'TotalInvestment', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Current Value', 'id': 'Current Value', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Profit/Loss', 'id': 'Profit/Loss', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Returns %', 'id': 'Returns %', 'type': 'numeric',
+             'format': {'specifier': '.2f'}},
+            {'name': 'XIRR %', 'id': 'XIRR %', 'type': 'numeric',
+             'format': {'specifier': '.2f'}},
+            {'name': 'TWR %', 'id': 'TWR %', 'type': 'numeric',
+             'format': {'specifier': '.2f'}},
+            {'name': 'Realized P&L', 'id': 'Realized P&L', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Price Source', 'id': 'Price Source', 'type': 'text'},
+            {'name': 'Price Age', 'id': 'Price Age', 'type': 'text'}
+        ],
+        data=records,
+        filter_action='native',
+        sort_action='native',
+        sort_mode='multi',
+        page_size=10,
+        style_table={
+            'overflowX': 'auto',
+            'overflowY': 'auto',
+            'maxHeight': '60vh',
         },
-        {
-            'if': {
-                'filter_query': '{Returns %} > 0',
-                'column_id': 'Returns %'
-            },
-            'color': '#00ff00'
+        style_header={
+            'backgroundColor': '#2C3034',
+            'color': 'white',
+            'fontWeight': 'bold',
+            'textAlign': 'left',
+            'padding': '10px',
+            'border': '1px solid #404040'
         },
-        {
-            'if': {
-                'filter_query': '{Returns %} < 0',
-                'column_id': 'Returns %'
-            },
-            'color': '#ff0000'
+        style_cell={
+            'backgroundColor': '#1e2124',
+            'color': 'white',
+            'textAlign': 'left',
+            'padding': '10px',
+            'border': '1px solid #404040',
+            'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
+            'minWidth': '100px',
+            'maxWidth': '180px',
+            'overflow': 'hidden',
+            'textOverflow': 'ellipsis'
         },
-        {
-            'if': {
-                'filter_query': '{Profit/Loss} > 0',
-                'column_id': 'Profit/Loss'
+        style_data_conditional=[
+            {
+                'if': {'row_index': 'odd'},
+                'backgroundColor': '#212529'
             },
-            'color': '#00ff00'
-        },
-        {
-            'if': {
-                'filter_query': '{Profit/Loss} < 0',
-                'column_id': 'Profit/Loss'
+            {
+                'if': {
+                    'filter_query': '{Returns %} > 0',
+                    'column_id': 'Returns %'
+                },
+                'color': '#00ff00'
+            },
+            {
+                'if': {
+                    'filter_query': '{Returns %} < 0',
+                    'column_id': 'Returns %'
+                },
+                'color': '#ff0000'
+            },
+            {
+                'if': {
+                    'filter_query': '{Profit/Loss} > 0',
+                    'column_id': 'Profit/Loss'
+                },
+                'color': '#00ff00'
+            },
+            {
+                'if': {
+                    'filter_query': '{Profit/Loss} < 0',
+                    'column_id': 'Profit/Loss'
+                },
+                'color': '#ff0000'
+            },
+            {
+                'if': {
+                    'filter_query': '{Realized P&L} > 0',
+                    'column_id': 'Realized P&L'
+                },
+                'color': '#00ff00'
+            },
+            {
+                'if': {
+                    'filter_query': '{Realized P&L} < 0',
+                    'column_id': 'Realized P&L'
+                },
+                'color': '#ff0000'
             },
-            'color': '#ff0000'
+            {
+                'if': {
+                    'filter_query': '{Price Source} != "Live"',
+                    'column_id': ['Price Source', 'Price Age']
+                },
+                'color': '#ffc107'
+            }
+        ],
+        style_filter={
+            'backgroundColor': '#2C3034',
+            'color': 'white',
+            'padding': '5px'
+        },
+        filter_options={
+            'case': 'insensitive',
+            'placeholder_text': 'Filter...'
         }
-    ],
-    style_filter={
-        'backgroundColor': '#2C3034',
-        'color': 'white',
-        'padding': '5px'
-    },
-    filter_options={
-        'case': 'insensitive',
-        'placeholder_text': 'Filter...'
-    }
-)
+    )
 
-# Add Stock Modal
+# Record Stock Transaction Modal
 add_stock_modal = dbc.Modal(
     [
-        dbc.ModalHeader(dbc.ModalTitle("Add New Stock"), close_button=True),
+        dbc.ModalHeader(dbc.ModalTitle("Record Stock Transaction"), close_button=True),
         dbc.ModalBody([
             dbc.Form([
                 dbc.Row([
@@ -128,18 +156,32 @@ add_stock_modal = dbc.Modal(
                     ], width=6),
                     dbc.Col([
                         dbc.Label("NSE Symbol", html_for="nse-symbol"),
-                        dbc.Input(type="text", id="nse-symbol", placeholder="Enter NSE symbol", required=True),
+                        dbc.Input(type="text", id="nse-symbol", placeholder="Enter NSE symbol", required=True,
+                                  list="nse-symbol-suggestions", autoComplete="off"),
+                        html.Datalist(id="nse-symbol-suggestions"),
                         dbc.FormText("Enter symbol and tab out to auto-fill name", color="secondary"),
                     ], width=6),
                 ], className="mb-3"),
                 dbc.Row([
                     dbc.Col([
-                        dbc.Label("Shares Owned", html_for="shares-owned"),
+                        dbc.Label("Transaction", html_for="stock-event"),
+                        dbc.Select(id="stock-event", value="buy",
+                                   options=[{"label": "Buy", "value": "buy"}, {"label": "Sell", "value": "sell"}]),
+                    ], width=6),
+                    dbc.Col([
+                        dbc.Label("Date", html_for="stock-event-date"),
+                        dbc.Input(type="date", id="stock-event-date"),
+                        dbc.FormText("Defaults to today", color="secondary"),
+                    ], width=6),
+                ], className="mb-3"),
+                dbc.Row([
+                    dbc.Col([
+                        dbc.Label("Shares", html_for="shares-owned"),
                         dbc.Input(type="number", id="shares-owned", placeholder="Number of shares", min=1, step=1, required=True),
                     ], width=6),
                     dbc.Col([
-                        dbc.Label("Average Buy Price", html_for="avg-price"),
-                        dbc.Input(type="number", id="avg-price", placeholder="Average price per share", min=0.01, step=0.01, required=True),
+                        dbc.Label("Price", html_for="avg-price"),
+                        dbc.Input(type="number", id="avg-price", placeholder="Price per share", min=0.01, step=0.01, required=True),
                     ], width=6),
                 ], className="mb-3"),
                 dbc.Alert(
@@ -154,7 +196,7 @@ add_stock_modal = dbc.Modal(
         ]),
         dbc.ModalFooter([
             dbc.Button("Close", id="close-add-stock", className="me-2", color="secondary"),
-            dbc.Button("Add Stock", id="save-stock", color="success"),
+            dbc.Button("Save", id="save-stock", color="success"),
         ]),
     ],
     id="add-stock-modal",
@@ -162,83 +204,160 @@ add_stock_modal = dbc.Modal(
     is_open=False,
 )
 
-# Page layout - now simpler, without the card wrapper since it's in a tab
-layout = html.Div([
-    # Add Stock Button
-    dbc.Row([
-        dbc.Col([
-            dbc.Button([
-                html.I(className="fas fa-plus me-2"),
-                "Add Stock"
-            ], id="open-add-stock", color="success", className="mb-3 float-end")
-        ], width=12),
-    ]),
-    # Summary Row
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Investment", className="card-title text-muted"),
-                    html.H4(f"₹{summary['total_investment']:,.2f}", className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Current Value", className="card-title text-muted"),
-                    html.H4(f"₹{summary['current_value']:,.2f}", className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Returns", className="card-title text-muted"),
-                    html.H4([
-                        f"{summary['total_returns']}%"
-                    ], className=f"mb-2 {'text-success' if summary['total_returns'] > 0 else 'text-danger'}")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4)
-    ], className="mb-3"),
-    # New Metrics Row
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Number of Stocks", className="card-title text-muted"),
-                    html.H4(f"{summary['num_stocks']}", className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Profitable Stocks", className="card-title text-muted"),
-                    html.H4(f"{summary['profitable_stocks']} / {summary['num_stocks']}", 
-                           className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Balance in Performing", className="card-title text-muted"),
-                    html.H4([
-                        f"{summary['percent_in_performing']}%"
-                    ], className=f"mb-2 {'text-success' if summary['percent_in_performing'] > 0 else 'text-danger'}")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4)
-    ], className="mb-3"),
-    # Table Container
-    html.Div([
-        table
-    ], className="border border-secondary"),
-    # Add the modal to the layout
-    add_stock_modal
-])
+def format_rate(rate):
+    """A percentage for a summary card, or a dash when it could not be computed."""
+    return f"{rate}%" if rate is not None else "—"
+
+# Summary cards for the top of the page
+def create_summary(summary):
+    """Build the summary card rows for the given portfolio summary."""
+    return [
+        # Summary Row
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Total Investment", className="card-title text-muted"),
+                        html.H4(f"₹{summary['total_investment']:,.2f}", className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Current Value", className="card-title text-muted"),
+                        html.H4(f"₹{summary['current_value']:,.2f}", className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Total Returns", className="card-title text-muted"),
+                        html.H4([
+                            f"{summary['total_returns']}%"
+                        ], className=f"mb-2 {'text-success' if summary['total_returns'] > 0 else 'text-danger'}")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Realized P&L", className="card-title text-muted"),
+                        html.H4(f"₹{summary['realized_pnl']:,.2f}",
+                                className=f"mb-2 {'text-success' if summary['realized_pnl'] >= 0 else 'text-danger'}")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3)
+        ], className="mb-3"),
+        # New Metrics Row
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Number of Stocks", className="card-title text-muted"),
+                        html.H4(f"{summary['num_stocks']}", className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Profitable Stocks", className="card-title text-muted"),
+                        html.H4(f"{summary['profitable_stocks']} / {summary['num_stocks']}", 
+                               className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Balance in Performing", className="card-title text-muted"),
+                        html.H4([
+                            f"{summary['percent_in_performing']}%"
+                        ], className=f"mb-2 {'text-success' if summary['percent_in_performing'] > 0 else 'text-danger'}")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("XIRR / TWR", className="card-title text-muted"),
+                        html.H4(f"{format_rate(summary['xirr'])} / {format_rate(summary['twr'])}",
+                                className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=3)
+        ], className="mb-3")
+    ]
+
+def create_loading_summary(error=None):
+    """Placeholder shown in place of the summary cards while prices load."""
+    if error:
+        return dbc.Alert(f"Could not load stock portfolio: {error}", color="danger")
+    return dbc.Spinner(
+        html.Div("Loading live prices...", className="text-muted text-center p-4"),
+        color="success"
+    )
+
+# How often the page checks for a newer snapshot (ms) - fast while waiting for data
+LOADING_POLL_INTERVAL = 1000
+SNAPSHOT_POLL_INTERVAL = 15000
+
+# Page layout - rendered per request from the latest snapshot, or a loading state while it arrives
+def layout(**kwargs):
+    snapshot = get_snapshot()
+    df = snapshot.stocks if snapshot is not None else None
+    
+    return html.Div([
+        # Record Transaction Button
+        dbc.Row([
+            dbc.Col([
+                dbc.Button([
+                    html.I(className="fas fa-plus me-2"),
+                    "Record Transaction"
+                ], id="open-add-stock", color="success", className="mb-3 float-end")
+            ], width=12),
+        ]),
+        # Summary Rows (or loading state)
+        html.Div(
+            create_summary(get_portfolio_summary(df)) if df is not None else create_loading_summary(),
+            id="stock-summary"
+        ),
+        # Table Container
+        html.Div([
+            create_table(df.to_dict('records') if df is not None else [])
+        ], className="border border-secondary"),
+        # Poll for newer snapshots from the background refresher
+        dcc.Interval(id="stock-data-poll",
+                     interval=SNAPSHOT_POLL_INTERVAL if df is not None else LOADING_POLL_INTERVAL),
+        dcc.Store(id="stock-data-version", data=snapshot.version if df is not None else None),
+        # Add the modal to the layout
+        add_stock_modal
+    ])
+
+# Callback to pull the latest snapshot whenever the refresher publishes a new version
+@callback(
+    [Output("stock-summary", "children"),
+     Output("stock-portfolio-table", "data", allow_duplicate=True),
+     Output("stock-data-poll", "interval"),
+     Output("stock-data-version", "data")],
+    Input("stock-data-poll", "n_intervals"),
+    State("stock-data-version", "data"),
+    prevent_initial_call=True
+)
+def poll_portfolio_data(n_intervals, version):
+    snapshot = get_snapshot()
+    if snapshot is None or snapshot.version == version:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    
+    df = snapshot.stocks
+    if df is None:
+        return (create_loading_summary(snapshot.errors.get('stocks')), dash.no_update,
+                SNAPSHOT_POLL_INTERVAL, snapshot.version)
+    
+    return (create_summary(get_portfolio_summary(df)), df.to_dict('records'),
+            SNAPSHOT_POLL_INTERVAL, snapshot.version)
 
 # Callbacks for the modal
 @callback(
@@ -252,17 +371,32 @@ def toggle_modal(n1, n2, n3, is_open):
         return not is_open
     return is_open
 
+# Callback to suggest listed symbols while typing
+@callback(
+    Output("nse-symbol-suggestions", "children"),
+    Input("nse-symbol", "value"),
+    prevent_initial_call=True
+)
+def suggest_nse_symbols(prefix):
+    return [html.Option(value=entry['symbol'], label=entry['name'])
+            for entry in suggest_symbols(prefix)]
+
 # Callback to auto-fill stock name from NSE symbol
 @callback(
     [Output("stock-name", "value"), Output("loading-output", "children")],
-    Input("nse-symbol", "value"),
+    [Input("nse-symbol", "value"), Input("nse-symbol", "n_blur"), Input("nse-symbol", "n_submit")],
     prevent_initial_call=True
 )
-def autofill_stock_name(symbol):
+def autofill_stock_name(symbol, n_blur, n_submit):
     if not symbol:
         return "", ""
     
-    # Get stock name from symbol
+    # While typing, only fill in names the local symbol master knows
+    if ctx.triggered[0]['prop_id'] == "nse-symbol.value":
+        stock_name = get_company_name(symbol)
+        return (stock_name, "") if stock_name else (no_update, no_update)
+    
+    # Get stock name from symbol once the user tabs out
     stock_name = get_stock_name_from_symbol(symbol)
     
     return stock_name, ""
@@ -275,11 +409,13 @@ def autofill_stock_name(symbol):
         State("nse-symbol", "value"),
         State("shares-owned", "value"),
         State("avg-price", "value"),
+        State("stock-event", "value"),
+        State("stock-event-date", "value"),
         State("add-stock-alert", "is_open")
     ],
     prevent_initial_call=True
 )
-def add_stock(n_clicks, stock_name, nse_symbol, shares_owned, avg_price, is_open):
+def add_stock(n_clicks, stock_name, nse_symbol, shares_owned, avg_price, event, event_date, is_open):
     if not n_clicks:
         return is_open, ""
     
@@ -292,48 +428,30 @@ def add_stock(n_clicks, stock_name, nse_symbol, shares_owned, avg_price, is_open
         shares_owned = int(shares_owned)
         avg_price = float(avg_price)
         
-        # Create new row for the dataframe
-        new_stock = pd.DataFrame({
-            'Stock': [stock_name],
-            'SharesOwned': [shares_owned],
-            'AveragePrice': [avg_price],
-            'NSE_Symbol': [nse_symbol]
-        })
-        
-        # Load existing data
-        csv_path = 'assets/PersonalFiles/myPortfolio.csv'
-        if os.path.exists(csv_path):
-            existing_data = pd.read_csv(csv_path)
-            
-            # Check if stock already exists
-            if nse_symbol in existing_data['NSE_Symbol'].values:
-                return True, f"Stock with symbol {nse_symbol} already exists in portfolio."
-            
-            # Append new stock
-            updated_data = pd.concat([existing_data, new_stock], ignore_index=True)
-        else:
-            updated_data = new_stock
-        
-        # Save to CSV
-        updated_data.to_csv(csv_path, index=False)
+        # Append to the ledger; the position and realized P&L update with it
+        try:
+            record_event('stocks', event or 'buy', nse_symbol.strip().upper(), stock_name,
+                         shares_owned, avg_price, event_date or None)
+        except ValueError as e:
+            return True, str(e)
         
         # Success message and reload page
-        return True, "Stock added successfully! Page will reload."
+        return True, "Transaction recorded! Page will reload."
         
     except Exception as e:
         return True, f"Error: {str(e)}"
 
-# Callback to refresh the page after adding a stock
+# Callback to refresh the page after recording a transaction
 @callback(
-    Output("stock-portfolio-table", "data"),
+    Output("stock-data-poll", "interval", allow_duplicate=True),
     Input("add-stock-alert", "children"),
     prevent_initial_call=True
 )
 def refresh_data(alert_message):
-    if "Stock added successfully" in alert_message:
-        # Reload data
-        refreshed_df = load_portfolio_data()
-        return refreshed_df.to_dict('records')
+    if "Transaction recorded" in alert_message:
+        # Revalue in the background and poll quickly until the new snapshot lands
+        request_refresh()
+        return LOADING_POLL_INTERVAL
     
-    # If not successful, return existing data
-    return dash.no_update 
\ No newline at end of file
+    # If not successful, keep polling as before
+    return dash.no_update
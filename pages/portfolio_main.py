@@ -1,6 +1,10 @@
 import dash
 from dash import html, dcc
 import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+from utils.net_worth import load_net_worth
+from utils.price_refresher import get_snapshot
+from utils.returns import asset_returns, current_values, as_percent
 from pages.portfolio import layout as stock_layout
 from pages.mutual_funds import layout as mf_layout
 from pages.other_investments import layout as other_inv_layout
@@ -18,64 +22,138 @@ dash.register_page(
     order=0  # Set to 0 to ensure it appears first
 )
 
-# Page layout
-layout = html.Div([
-    dbc.Card([
-        dbc.CardHeader([
-            html.H3([
-                html.I(className="fas fa-wallet me-2"),
-                "My Portfolio"
-            ], className="text-center text-primary m-2")
-        ], className="bg-dark"),
-        dbc.CardBody([
-            # Tabs for all portfolio sections
-            dbc.Tabs([
-                dbc.Tab(
-                    stock_layout,
-                    label="Stock Portfolio",
-                    tab_id="tab-stocks",
-                    label_class_name="text-light",
-                    active_label_class_name="fw-bold",
-                ),
-                dbc.Tab(
-                    mf_layout,
-                    label="Mutual Funds",
-                    tab_id="tab-mutual-funds",
-                    label_class_name="text-light",
-                    active_label_class_name="fw-bold",
-                ),
-                dbc.Tab(
-                    other_inv_layout,
-                    label="Other Investments",
-                    tab_id="tab-other-investments",
-                    label_class_name="text-light",
-                    active_label_class_name="fw-bold",
-                ),
-                dbc.Tab(
-                    savings_layout,
-                    label="Savings Accounts",
-                    tab_id="tab-savings",
-                    label_class_name="text-light",
-                    active_label_class_name="fw-bold",
-                ),
-                dbc.Tab(
-                    credit_cards_layout,
-                    label="Credit Cards",
-                    tab_id="tab-credit-cards",
-                    label_class_name="text-light",
-                    active_label_class_name="fw-bold",
-                ),
-                dbc.Tab(
-                    loans_layout,
-                    label="Loans",
-                    tab_id="tab-loans",
-                    label_class_name="text-light",
-                    active_label_class_name="fw-bold",
-                ),
-            ],
-            id="portfolio-tabs",
-            active_tab="tab-stocks",
-            className="mb-3")
-        ], className="bg-dark p-3")
-    ], className="shadow")
-], className="p-4") 
\ No newline at end of file
+# Net worth trajectory from the stored daily series (see utils/net_worth.py)
+def create_net_worth_chart(series):
+    return go.Figure(
+        data=[
+            go.Scatter(
+                x=series['dates'],
+                y=series['net_worth'],
+                name='Net Worth',
+                line=dict(color='#4B0082', width=2),
+                fill='tozeroy',
+                fillcolor='rgba(75,0,130,0.15)',
+                hovertemplate='%{x|%d %b %Y}<br>₹%{y:,.0f}<extra></extra>'
+            )
+        ]
+    ).update_layout(
+        title="Net Worth Trajectory",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white'),
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(128,128,128,0.2)',
+            tickfont=dict(color='white')
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(128,128,128,0.2)',
+            tickfont=dict(color='white')
+        ),
+        height=300,
+        margin=dict(t=50, b=0, l=0, r=0)
+    )
+
+def create_net_worth_content():
+    """Net worth chart once the series has been built, otherwise a placeholder."""
+    try:
+        series = load_net_worth()
+    except Exception as e:
+        print(f"Error reading net worth series: {str(e)}")
+        series = None
+    if series is None or len(series['dates']) == 0:
+        return html.Div("Net worth history is being built...", className="text-muted text-center p-4")
+    return dcc.Graph(figure=create_net_worth_chart(series), config={'displayModeBar': False})
+
+def create_returns_summary():
+    """XIRR and TWR of stocks, mutual funds and both together, from the latest valuation."""
+    snapshot = get_snapshot()
+    if snapshot is None or snapshot.stocks is None or snapshot.mutual_funds is None:
+        return html.Div()
+    try:
+        returns = asset_returns({'stocks': current_values('stocks', snapshot.stocks),
+                                 'mutual_funds': current_values('mutual_funds', snapshot.mutual_funds)})
+    except Exception as e:
+        print(f"Error computing portfolio returns: {str(e)}")
+        return html.Div()
+
+    def rate(value):
+        value = as_percent(value)
+        return f"{value}%" if value is not None else "—"
+
+    labels = {'portfolio': 'Portfolio', 'stocks': 'Stocks', 'mutual_funds': 'Mutual Funds'}
+    return dbc.Row([
+        dbc.Col([
+            html.Span(f"{label} XIRR ", className="text-muted"),
+            html.Span(rate(returns[name]['xirr']), className="text-white me-3"),
+            html.Span("TWR ", className="text-muted"),
+            html.Span(rate(returns[name]['twr']), className="text-white")
+        ], width=4, className="text-center")
+        for name, label in labels.items()
+    ], className="mb-3")
+
+# Page layout - the stock and mutual fund tabs render from the shared data layer, savings from its stores
+def layout(**kwargs):
+    return html.Div([
+        dbc.Card([
+            dbc.CardHeader([
+                html.H3([
+                    html.I(className="fas fa-wallet me-2"),
+                    "My Portfolio"
+                ], className="text-center text-primary m-2")
+            ], className="bg-dark"),
+            dbc.CardBody([
+                create_net_worth_content(),
+                create_returns_summary(),
+                # Tabs for all portfolio sections
+                dbc.Tabs([
+                    dbc.Tab(
+                        stock_layout(),
+                        label="Stock Portfolio",
+                        tab_id="tab-stocks",
+                        label_class_name="text-light",
+                        active_label_class_name="fw-bold",
+                    ),
+                    dbc.Tab(
+                        mf_layout(),
+                        label="Mutual Funds",
+                        tab_id="tab-mutual-funds",
+                        label_class_name="text-light",
+                        active_label_class_name="fw-bold",
+                    ),
+                    dbc.Tab(
+                        other_inv_layout,
+                        label="Other Investments",
+                        tab_id="tab-other-investments",
+                        label_class_name="text-light",
+                        active_label_class_name="fw-bold",
+                    ),
+                    dbc.Tab(
+                        savings_layout(),
+                        label="Savings Accounts",
+                        tab_id="tab-savings",
+                        label_class_name="text-light",
+                        active_label_class_name="fw-bold",
+                    ),
+                    dbc.Tab(
+                        credit_cards_layout,
+                        label="Credit Cards",
+                        tab_id="tab-credit-cards",
+                        label_class_name="text-light",
+                        active_label_class_name="fw-bold",
+                    ),
+                    dbc.Tab(
+                        loans_layout,
+                        label="Loans",
+                        tab_id="tab-loans",
+                        label_class_name="text-light",
+                        active_label_class_name="fw-bold",
+                    ),
+                ],
+                id="portfolio-tabs",
+                active_tab="tab-stocks",
+                className="mb-3")
+            ], className="bg-dark p-3")
+        ], className="shadow")
+    ], className="p-4")
@@ -2,7 +2,8 @@ import dash
 from dash import html, dash_table, dcc
 import dash_bootstrap_components as dbc
 import pandas as pd
-import os
+from utils.holdings_store import load_holdings
+from utils.savings_store import get_account_balances, match_account
 
 # Register the page - but not in the nav since it's a sub-tab
 dash.register_page(
@@ -15,32 +16,35 @@ dash.register_page(
     nav=False
 )
 
-# Load data - create empty table if file doesn't exist
+# Load data
 def load_savings_accounts_data():
-    # Check if file exists
-    csv_path = 'assets/PersonalFiles/mySavingsAccounts.csv'
-    os.makedirs('assets/PersonalFiles', exist_ok=True)
+    # Hand-maintained accounts live in the holdings store (mirrored to mySavingsAccounts.csv)
+    df = load_holdings('savings')
+    
+    # Balances from imported statements (utils/savings_statements.py) override
+    # the hand-maintained ones; accounts only seen in statements are added
+    try:
+        imported = get_account_balances()
+    except Exception as e:
+        print(f"Error reading savings store: {str(e)}")
+        imported = pd.DataFrame()
+    if not imported.empty:
+        entered = df.copy()
+        for account in imported.itertuples(index=False):
+            match = match_account(entered, account.Bank, account.AccountNumber)
+            if match is not None:
+                df.loc[match, ['Balance', 'LastUpdated']] = [account.Balance, account.LastUpdated]
+            else:
+                df.loc[len(df)] = {'Bank': account.Bank, 'AccountType': 'Savings',
+                                   'AccountNumber': account.AccountNumber, 'Balance': account.Balance,
+                                   'LastUpdated': account.LastUpdated}
     
-    if os.path.exists(csv_path):
-        # Read the data if file exists
-        df = pd.read_csv(csv_path)
-        
-        # Calculate metrics if data exists
-        if not df.empty and 'Balance' in df.columns and 'InterestRate' in df.columns:
-            df['AnnualInterest'] = (df['Balance'] * df['InterestRate'] / 100).round(2)
-    else:
-        # Create empty DataFrame with correct columns
-        df = pd.DataFrame(columns=[
-            'Bank', 'AccountType', 'AccountNumber', 'Balance', 'InterestRate', 'LastUpdated'
-        ])
-        # Save the empty file
-        df.to_csv(csv_path, index=False)
+    # Calculate metrics if data exists
+    if not df.empty and 'Balance' in df.columns and 'InterestRate' in df.columns:
+        df['AnnualInterest'] = (df['Balance'] * df['InterestRate'] / 100).round(2)
     
     return df
 
-# Load data
-df = load_savings_accounts_data()
-
 # Calculate summary metrics
 def get_summary(df):
     if df.empty or 'Balance' not in df.columns:
@@ -54,7 +58,9 @@ def get_summary(df):
     # Calculate metrics based on available data
     total_balance = df['Balance'].sum()
     total_interest = df['AnnualInterest'].sum() if 'AnnualInterest' in df.columns else 0
-    avg_interest_rate = df['InterestRate'].mean().round(2) if 'InterestRate' in df.columns else 0
+    # Accounts imported from statements have no interest rate until one is entered
+    avg_interest_rate = df['InterestRate'].mean() if 'InterestRate' in df.columns else 0
+    avg_interest_rate = round(avg_interest_rate, 2) if pd.notna(avg_interest_rate) else 0
     
     return {
         'total_balance': total_balance,
@@ -63,69 +69,68 @@ def get_summary(df):
         'num_accounts': len(df)
     }
 
-summary = get_summary(df)
-
 # Create the DataTable
-table = dash_table.DataTable(
-    id='savings-accounts-table',
-    columns=[
-        {'name': 'Bank', 'id': 'Bank', 'type': 'text'},
-        {'name': 'Account Type', 'id': 'AccountType', 'type': 'text'},
-        {'name': 'Account Number', 'id': 'AccountNumber', 'type': 'text'},
-        {'name': 'Balance', 'id': 'Balance', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Interest Rate %', 'id': 'InterestRate', 'type': 'numeric',
-         'format': {'specifier': '.2f'}},
-        {'name': 'Annual Interest', 'id': 'AnnualInterest', 'type': 'numeric',
-         'format': {'specifier': ',.2f'}},
-        {'name': 'Last Updated', 'id': 'LastUpdated', 'type': 'text'},
-    ],
-    data=df.to_dict('records') if not df.empty else [],
-    filter_action='native',
-    sort_action='native',
-    sort_mode='multi',
-    page_size=10,
-    style_table={
-        'overflowX': 'auto',
-        'overflowY': 'auto',
-        'maxHeight': '60vh',
-    },
-    style_header={
-        'backgroundColor': '#2C3034',
-        'color': 'white',
-        'fontWeight': 'bold',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040'
-    },
-    style_cell={
-        'backgroundColor': '#1e2124',
-        'color': 'white',
-        'textAlign': 'left',
-        'padding': '10px',
-        'border': '1px solid #404040',
-        'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
-        'minWidth': '100px',
-        'maxWidth': '180px',
-        'overflow': 'hidden',
-        'textOverflow': 'ellipsis'
-    },
-    style_data_conditional=[
-        {
-            'if': {'row_index': 'odd'},
-            'backgroundColor': '#212529'
+def create_table(df):
+    return dash_table.DataTable(
+        id='savings-accounts-table',
+        columns=[
+            {'name': 'Bank', 'id': 'Bank', 'type': 'text'},
+            {'name': 'Account Type', 'id': 'AccountType', 'type': 'text'},
+            {'name': 'Account Number', 'id': 'AccountNumber', 'type': 'text'},
+            {'name': 'Balance', 'id': 'Balance', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Interest Rate %', 'id': 'InterestRate', 'type': 'numeric',
+             'format': {'specifier': '.2f'}},
+            {'name': 'Annual Interest', 'id': 'AnnualInterest', 'type': 'numeric',
+             'format': {'specifier': ',.2f'}},
+            {'name': 'Last Updated', 'id': 'LastUpdated', 'type': 'text'},
+        ],
+        data=df.to_dict('records') if not df.empty else [],
+        filter_action='native',
+        sort_action='native',
+        sort_mode='multi',
+        page_size=10,
+        style_table={
+            'overflowX': 'auto',
+            'overflowY': 'auto',
+            'maxHeight': '60vh',
+        },
+        style_header={
+            'backgroundColor': '#2C3034',
+            'color': 'white',
+            'fontWeight': 'bold',
+            'textAlign': 'left',
+            'padding': '10px',
+            'border': '1px solid #404040'
+        },
+        style_cell={
+            'backgroundColor': '#1e2124',
+            'color': 'white',
+            'textAlign': 'left',
+            'padding': '10px',
+            'border': '1px solid #404040',
+            'fontFamily': '-apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial,sans-serif',
+            'minWidth': '100px',
+            'maxWidth': '180px',
+            'overflow': 'hidden',
+            'textOverflow': 'ellipsis'
+        },
+        style_data_conditional=[
+            {
+                'if': {'row_index': 'odd'},
+                'backgroundColor': '#212529'
+            }
+        ],
+        style_filter={
+            'backgroundColor': '#2C3034',
+            'color': 'white',
+            'padding': '5px'
+        },
+        filter_options={
+            'case': 'insensitive',
+            'placeholder_text': 'Filter...'
         }
-    ],
-    style_filter={
-        'backgroundColor': '#2C3034',
-        'color': 'white',
-        'padding': '5px'
-    },
-    filter_options={
-        'case': 'insensitive',
-        'placeholder_text': 'Filter...'
-    }
-)
+    )
 
 # Basic modal without any callbacks - just a placeholder
 add_account_modal = dbc.Modal(
@@ -140,50 +145,54 @@ add_account_modal = dbc.Modal(
     is_open=False,
 )
 
-# Page layout
-layout = html.Div([
-    # Add Account Button (no callback attached)
-    dbc.Row([
-        dbc.Col([
-            dbc.Button([
-                html.I(className="fas fa-plus me-2"),
-                "Add Account"
-            ], id="open-add-account", color="success", className="mb-3 float-end")
-        ], width=12),
-    ]),
-    # Summary Row
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Balance", className="card-title text-muted"),
-                    html.H4(f"₹{summary['total_balance']:,.2f}", className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Annual Interest", className="card-title text-muted"),
-                    html.H4(f"₹{summary['total_interest']:,.2f}", className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Avg. Interest Rate", className="card-title text-muted"),
-                    html.H4([
-                        f"{summary['avg_interest_rate']}%"
-                    ], className="mb-2 text-white")
-                ])
-            ], className="bg-dark border-secondary mb-3")
-        ], width=4)
-    ], className="mb-3"),
-    # Table Container
-    html.Div([
-        table
-    ], className="border border-secondary"),
-    # Add modal to layout (but no callbacks)
-    add_account_modal
-]) 
\ No newline at end of file
+# Page layout - rendered per request so newly imported statements show up
+def layout(**kwargs):
+    df = load_savings_accounts_data()
+    summary = get_summary(df)
+    
+    return html.Div([
+        # Add Account Button (no callback attached)
+        dbc.Row([
+            dbc.Col([
+                dbc.Button([
+                    html.I(className="fas fa-plus me-2"),
+                    "Add Account"
+                ], id="open-add-account", color="success", className="mb-3 float-end")
+            ], width=12),
+        ]),
+        # Summary Row
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Total Balance", className="card-title text-muted"),
+                        html.H4(f"₹{summary['total_balance']:,.2f}", className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=4),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Annual Interest", className="card-title text-muted"),
+                        html.H4(f"₹{summary['total_interest']:,.2f}", className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=4),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Avg. Interest Rate", className="card-title text-muted"),
+                        html.H4([
+                            f"{summary['avg_interest_rate']}%"
+                        ], className="mb-2 text-white")
+                    ])
+                ], className="bg-dark border-secondary mb-3")
+            ], width=4)
+        ], className="mb-3"),
+        # Table Container
+        html.Div([
+            create_table(df)
+        ], className="border border-secondary"),
+        # Add modal to layout (but no callbacks)
+        add_account_modal
+    ])
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from utils import http_client
+from utils.http_client import DEFAULT_TIMEOUT
+from utils import quote_cache
+
+# Single text file with the latest NAV of every scheme, published daily by AMFI
+AMFI_NAV_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
+NAV_FILE_NAME = 'NAVAll.txt'
+
+# After a failed download, wait this long (seconds) before trying again
+RETRY_INTERVAL = 5 * 60
+
+_index = None
+_index_expires_at = 0.0
+_retry_after = 0.0
+_lock = threading.Lock()
+
+def parse_nav_file(text: str) -> Dict[str, Dict]:
+    """Parse the AMFI NAVAll.txt format into a dict keyed by scheme code.
+
+    Data lines look like
+    `code;ISIN growth;ISIN reinvestment;scheme name;NAV;date`, separated by
+    category headers ("Open Ended Schemes(...)") and fund house names.
+    """
+    index = {}
+    category = ''
+    fund_house = ''
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        fields = line.split(';')
+        if len(fields) >= 6:
+            code = fields[0].strip()
+            if not code.isdigit():
+                continue  # Column header row
+            try:
+                nav = float(fields[4])
+            except ValueError:
+                nav = 0.0  # AMFI prints "N.A." for suspended schemes
+            index[code] = {
+                'scheme_code': code,
+                'isin_growth': fields[1].strip().strip('-'),
+                'isin_reinvestment': fields[2].strip().strip('-'),
+                'scheme_name': fields[3].strip(),
+                'nav': nav,
+                'date': fields[5].strip(),
+                'fund_house': fund_house,
+                'scheme_category': category
+            }
+        elif line.endswith(')') and 'Schemes(' in line.replace(' (', '('):
+            category = line
+        else:
+            fund_house = line
+
+    return index
+
+def _nav_file_path() -> str:
+    return os.path.join(quote_cache.CACHE_DIR, NAV_FILE_NAME)
+
+def _is_fresh(path: str) -> bool:
+    """A saved NAV file is fresh under the same market-session rules as the quote cache."""
+    if not os.path.exists(path):
+        return False
+    saved_at = datetime.fromtimestamp(os.path.getmtime(path), quote_cache.IST)
+    return quote_cache.compute_expiry(quote_cache.MF_NAV_TTL, saved_at) > time.time()
+
+def download_nav_file(path: Optional[str] = None) -> str:
+    """Download the AMFI NAV file and persist a copy on disk. Returns the text."""
+    path = path or _nav_file_path()
+    response = http_client.get(AMFI_NAV_URL, timeout=DEFAULT_TIMEOUT)
+    response.raise_for_status()
+    text = response.text
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return text
+
+def load_nav_index(path: Optional[str] = None, refresh: bool = False) -> Dict[str, Dict]:
+    """Return the in-memory NAV index, loading it once per market session.
+
+    If `path` is given (e.g. an offline fixture) it is parsed as-is. Otherwise the
+    persisted copy is used while fresh, a new file is downloaded when it is not,
+    and a stale copy is still used if the download fails.
+    """
+    global _index, _index_expires_at, _retry_after
+
+    if path is not None:
+        with open(path, 'r', encoding='utf-8') as f:
+            return parse_nav_file(f.read())
+
+    with _lock:
+        now = time.time()
+        if _index is not None and not refresh and (_index_expires_at > now or _retry_after > now):
+            return _index
+
+        nav_path = _nav_file_path()
+        text = None
+        if not refresh and _is_fresh(nav_path):
+            with open(nav_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        elif refresh or _retry_after <= now:
+            try:
+                text = download_nav_file(nav_path)
+            except Exception as e:
+                print(f"Error downloading AMFI NAV file: {str(e)}")
+                _retry_after = now + RETRY_INTERVAL
+                # Fall back to the last saved copy, however old
+                if os.path.exists(nav_path):
+                    with open(nav_path, 'r', encoding='utf-8') as f:
+                        text = f.read()
+
+        if text is None:
+            if _index is None:
+                _index = {}
+            return _index
+
+        _index = parse_nav_file(text)
+        saved_at = datetime.fromtimestamp(os.path.getmtime(nav_path), quote_cache.IST)
+        _index_expires_at = quote_cache.compute_expiry(quote_cache.MF_NAV_TTL, saved_at)
+        return _index
+
+def get_index_nav(scheme_code) -> float:
+    """Look up the latest NAV of a scheme in the AMFI index (0 if it is not listed)."""
+    entry = load_nav_index().get(str(scheme_code).strip())
+    return entry['nav'] if entry else 0
+
+def get_index_navs(scheme_codes: Iterable) -> Dict:
+    """Look up many scheme codes in the AMFI index; unlisted codes are left out."""
+    index = load_nav_index()
+    navs = {}
+    for scheme_code in scheme_codes:
+        entry = index.get(str(scheme_code).strip())
+        if entry and entry['nav']:
+            navs[scheme_code] = entry['nav']
+    return navs
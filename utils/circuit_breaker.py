@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict
+
+# Consecutive failures that trip a host's circuit open
+FAILURE_THRESHOLD = 5
+
+# Seconds a tripped circuit stays open before one trial request is let through,
+# and how long that trial may go unreported before another one is allowed
+RESET_TIMEOUT = 60
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+_circuits = {}
+_lock = threading.Lock()
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling a host whose circuit is open."""
+
+def _circuit(host: str) -> Dict:
+    """Return the circuit for a host, creating it on first use; caller holds the lock."""
+    circuit = _circuits.get(host)
+    if circuit is None:
+        circuit = {'state': CLOSED, 'failures': 0, 'opened_at': 0.0, 'trial_at': 0.0}
+        _circuits[host] = circuit
+    return circuit
+
+def check(host: str) -> None:
+    """Raise CircuitOpenError if calls to `host` are currently blocked.
+
+    Once RESET_TIMEOUT has passed, a single trial call is allowed (half-open);
+    its outcome closes the circuit again or re-opens it. A trial that never
+    reports back is given up after another RESET_TIMEOUT, and a new one allowed.
+    """
+    with _lock:
+        circuit = _circuit(host)
+        if circuit['state'] == CLOSED:
+            return
+        now = time.time()
+        if ((circuit['state'] == OPEN and now - circuit['opened_at'] >= RESET_TIMEOUT) or
+                (circuit['state'] == HALF_OPEN and now - circuit['trial_at'] >= RESET_TIMEOUT)):
+            circuit['state'] = HALF_OPEN
+            circuit['trial_at'] = now
+            return
+    raise CircuitOpenError(f"Circuit open for {host}; skipping upstream call")
+
+def record_success(host: str) -> None:
+    """Close the host's circuit after a successful call."""
+    with _lock:
+        circuit = _circuit(host)
+        circuit['state'] = CLOSED
+        circuit['failures'] = 0
+
+def record_failure(host: str) -> None:
+    """Count a failed call; trips the circuit after FAILURE_THRESHOLD in a row."""
+    with _lock:
+        circuit = _circuit(host)
+        circuit['failures'] += 1
+        if circuit['state'] == HALF_OPEN or circuit['failures'] >= FAILURE_THRESHOLD:
+            if circuit['state'] != OPEN:
+                print(f"Circuit opened for {host} after {circuit['failures']} failures")
+            circuit['state'] = OPEN
+            circuit['opened_at'] = time.time()
+
+def release_trial(host: str) -> None:
+    """Give back a half-open trial that ended without an answer from the host (e.g. a deadline).
+
+    The circuit stays open and the next check() starts a new trial.
+    """
+    with _lock:
+        circuit = _circuit(host)
+        if circuit['state'] == HALF_OPEN:
+            circuit['state'] = OPEN
+
+def get_state(host: str) -> str:
+    """Current circuit state for a host: 'closed', 'open' or 'half-open'."""
+    with _lock:
+        return _circuit(host)['state']
@@ -0,0 +1,89 @@
+import threading
+from typing import Any, Callable, Dict, Optional
+from utils.stock_data import calculate_portfolio_metrics
+from utils.holdings_store import load_holdings
+from utils.market_performance import update_market_history
+
+# Shared, lazily loaded page data. Nothing is fetched at import time: the first
+# get_data() call for a key starts its loader on a background thread and returns
+# None; later calls return the cached result until it is invalidated.
+# Live stock and mutual fund valuations are kept fresh by utils.price_refresher.
+
+_loaders: Dict[str, Callable[[], Any]] = {}
+_results: Dict[str, Any] = {}
+_errors: Dict[str, str] = {}
+_loading: Dict[str, threading.Event] = {}
+_lock = threading.Lock()
+
+def register_loader(key: str, loader: Callable[[], Any]) -> None:
+    """Register the function that produces the data for a key."""
+    _loaders[key] = loader
+
+def _run_loader(key: str, done: threading.Event) -> None:
+    """Run a loader and publish its result; always releases waiters."""
+    try:
+        result = _loaders[key]()
+        with _lock:
+            _results[key] = result
+            _errors.pop(key, None)
+    except Exception as e:
+        print(f"Error loading {key} data: {str(e)}")
+        with _lock:
+            _errors[key] = str(e)
+    finally:
+        with _lock:
+            _loading.pop(key, None)
+        done.set()
+
+def _start_load(key: str) -> threading.Event:
+    """Start a background load unless one is already running; caller must hold the lock."""
+    done = _loading.get(key)
+    if done is None:
+        done = threading.Event()
+        _loading[key] = done
+        threading.Thread(target=_run_loader, args=(key, done), daemon=True,
+                         name=f"load-{key}").start()
+    return done
+
+def get_data(key: str, retry_failed: bool = False) -> Optional[Any]:
+    """Return cached data for a key, or None while it loads in the background.
+
+    A key whose last load failed is only retried when `retry_failed` is set.
+    """
+    with _lock:
+        if key in _results:
+            return _results[key]
+        if retry_failed:
+            _errors.pop(key, None)
+        if key not in _errors:
+            _start_load(key)
+        return None
+
+def load_data(key: str, refresh: bool = False, timeout: Optional[float] = None) -> Optional[Any]:
+    """Return data for a key, waiting for it to load (or reload when `refresh` is set)."""
+    with _lock:
+        if key in _results and not refresh:
+            return _results[key]
+        done = _start_load(key)
+    done.wait(timeout)
+    with _lock:
+        return _results.get(key)
+
+def get_error(key: str) -> Optional[str]:
+    """Return the error from the last failed load of a key, if any."""
+    with _lock:
+        return _errors.get(key)
+
+def invalidate(key: str) -> None:
+    """Drop cached data and errors so the next access loads again."""
+    with _lock:
+        _results.pop(key, None)
+        _errors.pop(key, None)
+
+def load_market_metrics() -> Dict:
+    """Sector and category metrics for the stock portfolio."""
+    df = load_holdings('stocks')
+    return calculate_portfolio_metrics(df)
+
+register_loader('market_metrics', load_market_metrics)
+register_loader('market_history', update_market_history)
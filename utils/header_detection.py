@@ -0,0 +1,121 @@
+import re
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+# Field vocabularies for statement imports. Each field lists header phrases
+# (matched on word boundaries, case-insensitive) and whether its data cells are
+# expected to be text or numbers.
+MF_HOLDINGS_FIELDS = {
+    'scheme': {'kind': 'text', 'keywords': ['scheme name', 'scheme', 'fund name', 'fund', 'name']},
+    'units': {'kind': 'number', 'keywords': ['units', 'unit balance', 'balance units', 'closing units',
+                                             'unit', 'balance', 'holdings', 'quantity']},
+    'average_nav': {'kind': 'number', 'keywords': ['average nav', 'avg nav', 'avg. nav', 'purchase nav',
+                                                   'average cost', 'avg cost']},
+    'invested': {'kind': 'number', 'keywords': ['invested value', 'invested amount', 'amount invested',
+                                                'cost value', 'purchase value', 'investment', 'invested']},
+    'folio': {'kind': 'text', 'keywords': ['folio no', 'folio number', 'folio']},
+}
+MF_HOLDINGS_REQUIRED = ['scheme', 'units']
+
+STOCK_HOLDINGS_FIELDS = {
+    'name': {'kind': 'text', 'keywords': ['stock name', 'company name', 'security name', 'scrip name',
+                                          'instrument', 'name', 'scrip', 'security']},
+    'symbol': {'kind': 'text', 'keywords': ['nse symbol', 'trading symbol', 'symbol', 'ticker']},
+    'isin': {'kind': 'text', 'keywords': ['isin', 'isin code', 'isin number']},
+    'quantity': {'kind': 'number', 'keywords': ['quantity', 'qty', 'shares', 'free quantity',
+                                                'quantity available', 'balance', 'units']},
+    'average_price': {'kind': 'number', 'keywords': ['average price', 'avg price', 'average buy price',
+                                                     'avg. price', 'average cost', 'avg cost', 'buy price']},
+    'invested': {'kind': 'number', 'keywords': ['invested value', 'buy value', 'invested amount',
+                                                'investment', 'cost value']},
+}
+STOCK_HOLDINGS_REQUIRED = ['name', 'quantity']
+
+# Keyword score for a header cell: the whole cell is the phrase, or contains it
+EXACT_MATCH_SCORE = 2.0
+PARTIAL_MATCH_SCORE = 1.0
+
+def _to_block(rows: Sequence[Sequence]) -> np.ndarray:
+    """Pad the top rows of a sheet into a rectangular (rows x columns) object array."""
+    width = max((len(row) for row in rows), default=0)
+    block = np.full((len(rows), width), None, dtype=object)
+    for i, row in enumerate(rows):
+        block[i, :len(row)] = row
+    return block
+
+def _keyword_scores(cells: np.ndarray, fields: Dict) -> np.ndarray:
+    """Score each distinct cell string against each field's vocabulary: (cells x fields)."""
+    scores = np.zeros((len(cells), len(fields)))
+    for f, field in enumerate(fields.values()):
+        for keyword in field['keywords']:
+            pattern = re.compile(r'(?<![a-z0-9])' + re.escape(keyword) + r'(?![a-z0-9])')
+            for u, cell in enumerate(cells):
+                if cell == keyword:
+                    scores[u, f] = max(scores[u, f], EXACT_MATCH_SCORE)
+                elif cell and pattern.search(cell):
+                    scores[u, f] = max(scores[u, f], PARTIAL_MATCH_SCORE)
+    return scores
+
+def detect_layout(rows: Sequence[Sequence], fields: Dict, required: List[str]) -> Optional[Dict]:
+    """Find the header row and field columns among the first rows of a sheet.
+
+    The block is tokenized once: every distinct cell string is scored against
+    every field vocabulary, and each (row, column, field) keyword score is
+    weighted by how much of the column below that row holds the field's kind of
+    data (text or numbers). The header row with the best total over its fields
+    wins; rows missing a required field are never chosen.
+
+    Returns {'header_row', 'columns': {field: column}, 'score'} (0-based), or None.
+    """
+    block = _to_block(rows)
+    if block.size == 0:
+        return None
+    n_rows = block.shape[0]
+    field_names = list(fields)
+
+    # Tokenize once: distinct normalized strings plus an index back into the block
+    text = np.array([' '.join(str(cell).lower().split()) if cell is not None else '' for cell in block.ravel()],
+                    dtype=object)
+    cells, inverse = np.unique(text, return_inverse=True)
+    keyword = _keyword_scores(cells, fields)[inverse].reshape(block.shape + (len(fields),))
+
+    # Data evidence: share of numeric / text cells below each row, per column
+    numeric = pd.to_numeric(pd.Series(text).str.replace(',', '', regex=False), errors='coerce').notna()
+    numeric = numeric.to_numpy().reshape(block.shape)
+    filled = (text != '').reshape(block.shape)
+    texty = filled & ~numeric
+    below = np.maximum(n_rows - 1 - np.arange(n_rows), 1)[:, None]
+    numeric_below = (np.cumsum(numeric[::-1], axis=0)[::-1] - numeric) / below
+    text_below = (np.cumsum(texty[::-1], axis=0)[::-1] - texty) / below
+    kinds = np.array([fields[name]['kind'] == 'number' for name in field_names])
+    evidence = np.where(kinds, numeric_below[..., None], text_below[..., None])
+
+    # Best column per (row, field) and the total score of every candidate header row
+    combined = keyword * (1 + evidence)
+    best_columns = combined.argmax(axis=1)
+    best_scores = combined.max(axis=1)
+    required_idx = [field_names.index(name) for name in required]
+    row_scores = best_scores.sum(axis=1)
+    row_scores[(best_scores[:, required_idx] <= 0).any(axis=1)] = -np.inf
+
+    header_row = int(row_scores.argmax())
+    if not np.isfinite(row_scores[header_row]):
+        return None
+
+    # Give each column to one field only, strongest fields first
+    columns = {}
+    taken = set()
+    for f in np.argsort(-best_scores[header_row]):
+        if best_scores[header_row, f] <= 0:
+            break
+        ranked = np.argsort(-combined[header_row, :, f])
+        column = next((int(c) for c in ranked if c not in taken and combined[header_row, c, f] > 0), None)
+        if column is not None:
+            columns[field_names[f]] = column
+            taken.add(column)
+
+    if any(name not in columns for name in required):
+        return None
+
+    return {'header_row': header_row, 'columns': columns, 'score': round(float(row_scores[header_row]), 3)}
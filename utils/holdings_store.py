@@ -0,0 +1,315 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import pandas as pd
+
+# Embedded store behind every PersonalFiles holdings table. The CSVs stay the
+# import/export format: every write re-exports the asset's CSV, and a CSV edited
+# outside the app (or written by a converter) is re-imported on the next read.
+HOLDINGS_DB_FILE = os.path.join('assets', 'PersonalFiles', 'holdings.db')
+PERSONAL_FILES_DIR = os.path.join('assets', 'PersonalFiles')
+
+# Per asset class: CSV file, typed columns (in CSV order) and the columns that
+# identify a holding. Stocks and mutual funds fall back to the name when the
+# symbol/scheme code is blank, matching utils.statement_importer; rows of theirs
+# sharing a key (e.g. two folios of one scheme) are added together.
+ASSET_CLASSES = {
+    'stocks': {
+        'csv': 'myPortfolio.csv',
+        'columns': {'Stock': 'TEXT', 'SharesOwned': 'REAL', 'AveragePrice': 'REAL', 'NSE_Symbol': 'TEXT'},
+        'key': ['NSE_Symbol'],
+        'name': 'Stock',
+        'quantity': 'SharesOwned',
+        'price': 'AveragePrice'
+    },
+    'mutual_funds': {
+        'csv': 'myMFPortfolio.csv',
+        'columns': {'Scheme': 'TEXT', 'UnitsOwned': 'REAL', 'AverageNAV': 'REAL', 'SchemeCode': 'TEXT',
+                    'MatchConfidence': 'REAL'},
+        'key': ['SchemeCode'],
+        'name': 'Scheme',
+        'quantity': 'UnitsOwned',
+        'price': 'AverageNAV'
+    },
+    'savings': {
+        'csv': 'mySavingsAccounts.csv',
+        'columns': {'Bank': 'TEXT', 'AccountType': 'TEXT', 'AccountNumber': 'TEXT', 'Balance': 'REAL',
+                    'InterestRate': 'REAL', 'LastUpdated': 'TEXT'},
+        'key': ['Bank', 'AccountNumber']
+    },
+    'loans': {
+        'csv': 'myLoans.csv',
+        'columns': {'LoanType': 'TEXT', 'Lender': 'TEXT', 'Principal': 'REAL', 'OutstandingAmount': 'REAL',
+                    'InterestRate': 'REAL', 'EMI': 'REAL', 'Tenure': 'INTEGER', 'StartDate': 'TEXT',
+                    'EndDate': 'TEXT'},
+        'key': ['Lender', 'LoanType', 'StartDate']
+    },
+    'credit_cards': {
+        'csv': 'myCreditCards.csv',
+        'columns': {'Bank': 'TEXT', 'CardType': 'TEXT', 'CardNumber': 'TEXT', 'CreditLimit': 'REAL',
+                    'OutstandingBalance': 'REAL', 'MinimumDue': 'REAL', 'DueDate': 'TEXT', 'APR': 'REAL'},
+        'key': ['Bank', 'CardNumber']
+    },
+    'other_investments': {
+        'csv': 'myOtherInvestments.csv',
+        'columns': {'Investment': 'TEXT', 'Amount': 'REAL', 'StartDate': 'TEXT', 'EndDate': 'TEXT',
+                    'ExpectedReturn': 'REAL'},
+        'key': ['Investment', 'StartDate']
+    }
+}
+
+class DuplicateHoldingError(ValueError):
+    """Raised when adding a holding whose key is already in the store."""
+
+def _spec(asset: str) -> Dict:
+    if asset not in ASSET_CLASSES:
+        raise ValueError(f"Unknown asset class: {asset}")
+    return ASSET_CLASSES[asset]
+
+def csv_path(asset: str) -> str:
+    return os.path.join(PERSONAL_FILES_DIR, _spec(asset)['csv'])
+
+def holding_key(asset: str, record: Dict) -> str:
+    """Normalized identity of a holding: its key columns, else 'name:' + its name."""
+    spec = _spec(asset)
+    parts = [str(record.get(column) if pd.notna(record.get(column)) else '').strip().upper()
+             for column in spec['key']]
+    if not any(parts) and spec.get('name'):
+        return 'name:' + str(record.get(spec['name']) or '').strip().upper()
+    return '|'.join(parts)
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """Open the store (autocommit; writes use explicit transactions), creating tables on first use."""
+    path = path or HOLDINGS_DB_FILE
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS csv_sync (asset TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER)")
+    for asset, spec in ASSET_CLASSES.items():
+        columns = ', '.join(f'"{name}" {sql_type}' for name, sql_type in spec['columns'].items())
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{asset}" (holding_key TEXT PRIMARY KEY, {columns})')
+    return conn
+
+@contextmanager
+def _write_transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """BEGIN IMMEDIATE ... COMMIT: concurrent writers (e.g. gunicorn workers) queue on the lock."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+def _csv_stat(asset: str):
+    try:
+        stat = os.stat(csv_path(asset))
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+def _synced_stat(conn: sqlite3.Connection, asset: str):
+    row = conn.execute("SELECT mtime_ns, size FROM csv_sync WHERE asset = ?", (asset,)).fetchone()
+    return tuple(row) if row else None
+
+def _typed(asset: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce a frame to the asset's columns and types; missing columns are added empty."""
+    df = df.copy()
+    for column, sql_type in _spec(asset)['columns'].items():
+        if column not in df.columns:
+            df[column] = None
+        if sql_type == 'TEXT':
+            df[column] = df[column].apply(lambda value: '' if pd.isna(value) else str(value).strip())
+        else:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df[list(_spec(asset)['columns'])]
+
+def combine_duplicates(asset: str, df: pd.DataFrame) -> pd.DataFrame:
+    """One row per holding key, typed to the asset's columns.
+
+    Stocks and mutual funds held in several rows are added together: quantities
+    are summed and the average price is weighted by quantity, so the invested
+    value is kept. For other asset classes the last row of a key is kept.
+    Either way the combined keys are reported.
+    """
+    df = _typed(asset, df).reset_index(drop=True)
+    keys = pd.Series([holding_key(asset, record) for record in df.to_dict('records')])
+    duplicated = keys.duplicated(keep=False)
+    if not duplicated.any():
+        return df
+
+    spec = _spec(asset)
+    repeated = ', '.join(sorted(set(keys[duplicated])))
+    if 'quantity' not in spec:
+        print(f"Warning: several {asset} rows for {repeated}; keeping the last of each")
+        return df[~keys.duplicated(keep='last')].reset_index(drop=True)
+
+    quantity = df[spec['quantity']].fillna(0)
+    priced = df[spec['price']].notna()
+    totals = pd.DataFrame({'quantity': quantity, 'cost': (quantity * df[spec['price']]).where(priced, 0),
+                           'priced': quantity.where(priced, 0)}).groupby(keys, sort=False).sum()
+    first = ~keys.duplicated()
+    combined = df[first].reset_index(drop=True)
+    totals = totals.loc[keys[first]].reset_index(drop=True)
+    combined[spec['quantity']] = totals['quantity']
+    combined[spec['price']] = (totals['cost'] / totals['priced']).where(totals['priced'] > 0)
+    print(f"Combined {asset} rows held under the same key: {repeated}")
+    return combined
+
+def _rows(asset: str, df: pd.DataFrame) -> List[tuple]:
+    """(holding_key, *columns) tuples for an insert; NaN becomes NULL."""
+    df = _typed(asset, df)
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    return [(holding_key(asset, record), *record.values()) for record in records]
+
+def _insert_sql(asset: str, on_conflict: str) -> str:
+    columns = list(_spec(asset)['columns'])
+    names = ', '.join(f'"{column}"' for column in columns)
+    placeholders = ', '.join('?' * (len(columns) + 1))
+    return f'INSERT INTO "{asset}" (holding_key, {names}) VALUES ({placeholders}) {on_conflict}'
+
+def _replace_all(conn: sqlite3.Connection, asset: str, df: pd.DataFrame) -> None:
+    """Replace an asset's rows (caller holds the write transaction); duplicate keys are combined."""
+    conn.execute(f'DELETE FROM "{asset}"')
+    conn.executemany(_insert_sql(asset, ''), _rows(asset, combine_duplicates(asset, df)))
+
+def _import_csv_if_changed(conn: sqlite3.Connection, asset: str) -> None:
+    """Load the asset's CSV into the store when it changed outside the store (caller holds the write lock)."""
+    stat = _csv_stat(asset)
+    if stat is None or stat == _synced_stat(conn, asset):
+        return
+    text_columns = [name for name, sql_type in _spec(asset)['columns'].items() if sql_type == 'TEXT']
+    df = pd.read_csv(csv_path(asset), dtype={column: str for column in text_columns})
+    _replace_all(conn, asset, df)
+    conn.execute("INSERT OR REPLACE INTO csv_sync VALUES (?, ?, ?)", (asset, *stat))
+
+def _export_csv(conn: sqlite3.Connection, asset: str) -> None:
+    """Rewrite the asset's CSV from the store (caller holds the write lock)."""
+    df = _read_table(conn, asset)
+    os.makedirs(PERSONAL_FILES_DIR, exist_ok=True)
+    tmp_path = csv_path(asset) + '.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, csv_path(asset))
+    conn.execute("INSERT OR REPLACE INTO csv_sync VALUES (?, ?, ?)", (asset, *_csv_stat(asset)))
+
+def _read_table(conn: sqlite3.Connection, asset: str) -> pd.DataFrame:
+    columns = list(_spec(asset)['columns'])
+    names = ', '.join(f'"{column}"' for column in columns)
+    df = pd.DataFrame(conn.execute(f'SELECT {names} FROM "{asset}" ORDER BY rowid').fetchall(), columns=columns)
+    return _typed(asset, df)
+
+@contextmanager
+def asset_transaction(conn: sqlite3.Connection, asset: str) -> Iterator[sqlite3.Connection]:
+    """Write transaction over one asset's holdings for modules keeping their own tables in the store.
+
+    Syncs an externally edited CSV in first and re-exports the CSV on commit.
+    """
+    with _write_transaction(conn):
+        _import_csv_if_changed(conn, asset)
+        yield conn
+        _export_csv(conn, asset)
+
+def read_holding(conn: sqlite3.Connection, asset: str, key: str) -> Optional[Dict]:
+    """One holding by key, as a dict of its columns (None if not held)."""
+    columns = list(_spec(asset)['columns'])
+    names = ', '.join(f'"{column}"' for column in columns)
+    row = conn.execute(f'SELECT {names} FROM "{asset}" WHERE holding_key = ?', (key,)).fetchone()
+    return dict(zip(columns, row)) if row else None
+
+def write_holding(conn: sqlite3.Connection, asset: str, record: Dict) -> str:
+    """Insert or update one holding inside a caller's transaction; returns its key."""
+    row = _rows(asset, pd.DataFrame([record]))[0]
+    updates = ', '.join(f'"{column}" = excluded."{column}"' for column in _spec(asset)['columns'])
+    conn.execute(_insert_sql(asset, f'ON CONFLICT(holding_key) DO UPDATE SET {updates}'), row)
+    return row[0]
+
+def remove_holding(conn: sqlite3.Connection, asset: str, key: str) -> bool:
+    """Delete one holding inside a caller's transaction; returns whether it existed."""
+    return conn.execute(f'DELETE FROM "{asset}" WHERE holding_key = ?', (key,)).rowcount > 0
+
+def load_holdings(asset: str, path: Optional[str] = None) -> pd.DataFrame:
+    """All holdings of an asset class, in insertion order, with typed columns.
+
+    Text columns are strings ('' when blank); numeric columns are floats (NaN when blank).
+    """
+    conn = connect(path)
+    try:
+        if _csv_stat(asset) not in (None, _synced_stat(conn, asset)):
+            with _write_transaction(conn):
+                _import_csv_if_changed(conn, asset)
+        return _read_table(conn, asset)
+    finally:
+        conn.close()
+
+def add_holding(asset: str, record: Dict, path: Optional[str] = None) -> str:
+    """Insert one new holding; raises DuplicateHoldingError if its key is already held.
+
+    Returns the holding's key.
+    """
+    row = _rows(asset, pd.DataFrame([record]))[0]
+    conn = connect(path)
+    try:
+        with _write_transaction(conn):
+            _import_csv_if_changed(conn, asset)
+            cursor = conn.execute(_insert_sql(asset, 'ON CONFLICT(holding_key) DO NOTHING'), row)
+            if cursor.rowcount == 0:
+                raise DuplicateHoldingError(f"{row[0]} is already in {asset}")
+            _export_csv(conn, asset)
+        return row[0]
+    finally:
+        conn.close()
+
+def upsert_holdings(asset: str, df: pd.DataFrame, path: Optional[str] = None) -> int:
+    """Insert or update holdings by key in one transaction; returns the number of rows written.
+
+    Rows of `df` sharing a key are combined first (see combine_duplicates).
+    """
+    rows = _rows(asset, combine_duplicates(asset, df))
+    columns = list(_spec(asset)['columns'])
+    updates = ', '.join(f'"{column}" = excluded."{column}"' for column in columns)
+    conn = connect(path)
+    try:
+        with _write_transaction(conn):
+            _import_csv_if_changed(conn, asset)
+            conn.executemany(_insert_sql(asset, f'ON CONFLICT(holding_key) DO UPDATE SET {updates}'), rows)
+            _export_csv(conn, asset)
+        return len(rows)
+    finally:
+        conn.close()
+
+def replace_holdings(asset: str, df: pd.DataFrame, path: Optional[str] = None) -> None:
+    """Replace every holding of an asset class in one transaction."""
+    conn = connect(path)
+    try:
+        with _write_transaction(conn):
+            _replace_all(conn, asset, df)
+            _export_csv(conn, asset)
+    finally:
+        conn.close()
+
+def delete_holding(asset: str, key: str, path: Optional[str] = None) -> bool:
+    """Remove a holding by key; returns whether it existed."""
+    conn = connect(path)
+    try:
+        with _write_transaction(conn):
+            _import_csv_if_changed(conn, asset)
+            deleted = conn.execute(f'DELETE FROM "{asset}" WHERE holding_key = ?', (key,)).rowcount > 0
+            if deleted:
+                _export_csv(conn, asset)
+        return deleted
+    finally:
+        conn.close()
+
+def import_csv(asset: str, source: str, path: Optional[str] = None) -> int:
+    """Replace an asset class's holdings with the contents of a CSV file; returns the row count."""
+    text_columns = [name for name, sql_type in _spec(asset)['columns'].items() if sql_type == 'TEXT']
+    df = pd.read_csv(source, dtype={column: str for column in text_columns})
+    replace_holdings(asset, df, path)
+    return len(df)
+
+def export_csv(asset: str, destination: str, path: Optional[str] = None) -> int:
+    """Write an asset class's holdings to a CSV file; returns the row count."""
+    df = load_holdings(asset, path)
+    df.to_csv(destination, index=False)
+    return len(df)
@@ -0,0 +1,127 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from utils import circuit_breaker, rate_limiter
+
+# Browser-like headers - Yahoo Finance rejects requests without a User-Agent
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# (connect, read) timeout in seconds applied to every upstream request
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Number of keep-alive connections kept open per host
+POOL_SIZE = 16
+
+# Retries for throttled (429) or failing (5xx) responses before giving up
+MAX_RETRIES = 3
+
+_session = None
+_session_lock = threading.Lock()
+
+# Absolute time.time() by which every request in the current context must finish
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+def get_session() -> requests.Session:
+    """Return the shared keep-alive session used for all upstream API calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+@contextmanager
+def request_deadline(seconds: float):
+    """Bound the total time of all upstream requests made inside the block.
+
+    Nested blocks can only shorten the deadline. Worker threads inherit it when
+    their tasks are submitted through contextvars.copy_context().run.
+    """
+    deadline = time.time() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+def get_deadline() -> Optional[float]:
+    """Return the deadline of the current request_deadline block, if any."""
+    return _deadline.get()
+
+def _remaining_timeout(timeout, deadline: Optional[float]):
+    """Shrink a (connect, read) timeout so it cannot outlast the deadline."""
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TimeoutError("Request deadline reached")
+    if isinstance(timeout, tuple):
+        return tuple(min(t, remaining) for t in timeout)
+    return min(timeout, remaining)
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+def get(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+        timeout=DEFAULT_TIMEOUT, max_retries: int = MAX_RETRIES) -> requests.Response:
+    """GET a URL over the shared session, paced by the host's adaptive rate limiter.
+
+    Throttled (429) and server-error (5xx) responses are retried with jittered
+    backoff; the last such response is returned if every retry fails. Raises
+    TimeoutError once the current request_deadline has passed, and
+    circuit_breaker.CircuitOpenError without touching the network while the
+    host's circuit is open.
+    """
+    host = urlparse(url).hostname or ''
+    deadline = _deadline.get()
+
+    # Retries belong to the same call, so a half-open trial is not blocked by itself
+    circuit_breaker.check(host)
+    attempt = 0
+    while True:
+        try:
+            rate_limiter.acquire(host, deadline)
+            response = get_session().get(url, params=params, headers=headers,
+                                         timeout=_remaining_timeout(timeout, deadline))
+        except requests.RequestException:
+            circuit_breaker.record_failure(host)
+            raise
+        except BaseException:
+            # The deadline ran out before the host was asked; that says nothing about the host
+            circuit_breaker.release_trial(host)
+            raise
+
+        if response.status_code != 429 and response.status_code < 500:
+            rate_limiter.record_success(host)
+            circuit_breaker.record_success(host)
+            return response
+
+        delay = rate_limiter.record_throttle(host, attempt, _retry_after(response))
+        if attempt >= max_retries or (deadline is not None and time.time() + delay > deadline):
+            circuit_breaker.record_failure(host)
+            return response
+        attempt += 1
+
+def get_json(url: str, params: Optional[Dict] = None, timeout=DEFAULT_TIMEOUT) -> Dict:
+    """GET a URL over the shared session and decode the JSON body."""
+    response = get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from utils import quote_cache
+
+# Most recent real value seen for every price/NAV key, kept across restarts so an
+# upstream outage can still show real (if dated) numbers
+LKG_FILE = 'last_known_good.json'
+
+_entries = None
+_entries_dir = None
+_lock = threading.Lock()
+
+def _path() -> str:
+    return os.path.join(quote_cache.CACHE_DIR, LKG_FILE)
+
+def _load_entries() -> Dict:
+    """Load the store once per cache directory; caller must hold the lock."""
+    global _entries, _entries_dir
+    if _entries is None or _entries_dir != quote_cache.CACHE_DIR:
+        try:
+            with open(_path(), 'r') as f:
+                _entries = json.load(f)
+        except (OSError, ValueError):
+            _entries = {}
+        _entries_dir = quote_cache.CACHE_DIR
+    return _entries
+
+def _save_entries() -> None:
+    """Atomically write the store; caller must hold the lock."""
+    try:
+        os.makedirs(quote_cache.CACHE_DIR, exist_ok=True)
+        tmp_path = _path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(_entries, f)
+        os.replace(tmp_path, _path())
+    except OSError as e:
+        print(f"Error saving last-known-good store: {str(e)}")
+
+def record_values(values: Dict[str, float], source: str, as_of: Optional[float] = None) -> None:
+    """Remember real values (keyed like the quote cache) along with where and when they came from.
+
+    Zero values are failures and never overwrite a real one.
+    """
+    values = {key: value for key, value in values.items() if value}
+    if not values:
+        return
+    as_of = as_of or time.time()
+    with _lock:
+        entries = _load_entries()
+        for key, value in values.items():
+            entries[key] = {'value': float(value), 'as_of': as_of, 'source': source}
+        _save_entries()
+
+def get_values(keys: Iterable[str]) -> Dict[str, Dict]:
+    """Return the stored {'value', 'as_of', 'source'} entry for each known key."""
+    with _lock:
+        entries = _load_entries()
+        return {key: dict(entries[key]) for key in keys if key in entries}
+
+def format_age(seconds: float) -> str:
+    """Human-readable age of a value, e.g. '5 min' or '2 d'."""
+    if seconds < 60:
+        return 'just now'
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h"
+    return f"{int(seconds // 86400)} d"
+
+def resolve_values(values: Dict[str, float], source: str) -> Dict[str, Dict]:
+    """Record the real values just fetched and fill failed (zero) ones from the store.
+
+    Returns, per key, the value to show with its provenance ('Live', 'Last known'
+    or 'Unavailable') and its age as text.
+    """
+    record_values(values, source)
+    known = get_values(values.keys())
+    now = time.time()
+
+    resolved = {}
+    for key, value in values.items():
+        entry = known.get(key)
+        if value:
+            resolved[key] = {'value': value, 'provenance': 'Live', 'age': format_age(0)}
+        elif entry is not None:
+            resolved[key] = {'value': entry['value'], 'provenance': 'Last known',
+                             'age': format_age(now - entry['as_of'])}
+        else:
+            resolved[key] = {'value': 0, 'provenance': 'Unavailable', 'age': ''}
+    return resolved
@@ -0,0 +1,217 @@
+import time
+from datetime import date as date_type
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from utils import holdings_store
+
+# Append-only record of every buy, sell, SIP and redemption, kept in the holdings
+# store. Positions (the stocks/mutual_funds holdings tables) and realized P&L
+# (the positions table) are materialized from it: each appended event updates
+# them in the same transaction, so nothing is ever recomputed from the full ledger.
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset TEXT NOT NULL,
+    holding_key TEXT NOT NULL,
+    event TEXT NOT NULL,
+    date TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    name TEXT,
+    code TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ledger_by_holding ON ledger (asset, holding_key, id);
+CREATE INDEX IF NOT EXISTS ledger_by_date ON ledger (asset, date);
+CREATE TRIGGER IF NOT EXISTS ledger_no_update BEFORE UPDATE ON ledger
+BEGIN SELECT RAISE(ABORT, 'the ledger is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS ledger_no_delete BEFORE DELETE ON ledger
+BEGIN SELECT RAISE(ABORT, 'the ledger is append-only'); END;
+CREATE TABLE IF NOT EXISTS positions (
+    asset TEXT NOT NULL,
+    holding_key TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    cost_basis REAL NOT NULL,
+    realized_pnl REAL NOT NULL,
+    last_event INTEGER NOT NULL,
+    PRIMARY KEY (asset, holding_key)
+);
+"""
+
+# Which holdings columns an asset's events act on, and the events it accepts
+LEDGER_ASSETS = {
+    'stocks': {'code': 'NSE_Symbol', 'name': 'Stock', 'quantity': 'SharesOwned', 'price': 'AveragePrice',
+               'events': ['buy', 'sell']},
+    'mutual_funds': {'code': 'SchemeCode', 'name': 'Scheme', 'quantity': 'UnitsOwned', 'price': 'AverageNAV',
+                     'events': ['buy', 'sip', 'sell', 'redemption']}
+}
+
+# +1 adds to a position at its price, -1 takes out of it at the average cost.
+# An 'opening' event sets a position outright: it carries holdings that reached
+# the store without the ledger (statement imports, CSV edits) into it.
+EVENT_DIRECTIONS = {'buy': 1, 'sip': 1, 'sell': -1, 'redemption': -1, 'opening': 0}
+
+# Quantities closer than this are equal; a position below it is closed
+QUANTITY_EPSILON = 1e-6
+
+def _spec(asset: str) -> Dict:
+    if asset not in LEDGER_ASSETS:
+        raise ValueError(f"No ledger for asset class: {asset}")
+    return LEDGER_ASSETS[asset]
+
+def connect(path: Optional[str] = None):
+    """Open the holdings store with the ledger tables in place."""
+    conn = holdings_store.connect(path)
+    conn.executescript(LEDGER_SCHEMA)
+    return conn
+
+def apply_event(state: Tuple[float, float, float], event: str, quantity: float,
+                price: float) -> Tuple[float, float, float]:
+    """Next (quantity, cost basis, realized P&L) of a position after one event.
+
+    Average-cost method: inflows add their cost, outflows remove the average cost
+    of what they take out and realize the difference to their price.
+    """
+    held, cost, realized = state
+    direction = EVENT_DIRECTIONS[event]
+    if direction == 0:
+        return quantity, quantity * price, realized
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive")
+    if direction > 0:
+        return held + quantity, cost + quantity * price, realized
+    if quantity > held + QUANTITY_EPSILON:
+        raise ValueError(f"Cannot {event} {quantity:g} units: only {held:g} held")
+    quantity = min(quantity, held)
+    average = cost / held if held else 0.0
+    held -= quantity
+    if held < QUANTITY_EPSILON:
+        return 0.0, 0.0, realized + quantity * (price - average)
+    return held, cost - quantity * average, realized + quantity * (price - average)
+
+def _same(a: float, b: float) -> bool:
+    return abs(a - b) <= QUANTITY_EPSILON * max(1.0, abs(a), abs(b))
+
+def _append(conn, asset: str, key: str, event: str, date: str, quantity: float, price: float,
+            name: str, code: str) -> int:
+    return conn.execute(
+        "INSERT INTO ledger (asset, holding_key, event, date, quantity, price, name, code, recorded_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (asset, key, event, date, quantity, price, name, code, time.time())).lastrowid
+
+def record_event(asset: str, event: str, code: str, name: str, quantity: float, price: float,
+                 date: Optional[str] = None, path: Optional[str] = None) -> Dict:
+    """Append one event to the ledger and update the position it touches.
+
+    The ledger row, the holdings row and the realized P&L are written in one
+    transaction. A holding changed outside the ledger since its last event is
+    first carried in with an 'opening' event. Selling more than is held raises
+    ValueError and writes nothing.
+
+    Returns the position after the event: {'key', 'quantity', 'average_price', 'realized_pnl'}.
+    """
+    spec = _spec(asset)
+    event = event.strip().lower()
+    if event not in spec['events']:
+        raise ValueError(f"Unknown {asset} event: {event}")
+    quantity, price = float(quantity), float(price)
+    date = date or date_type.today().isoformat()
+    code, name = str(code or '').strip().upper(), str(name or '').strip()
+    key = holdings_store.holding_key(asset, {spec['code']: code, spec['name']: name})
+
+    conn = connect(path)
+    try:
+        with holdings_store.asset_transaction(conn, asset):
+            holding = holdings_store.read_holding(conn, asset, key)
+            held = float(holding[spec['quantity']] or 0) if holding else 0.0
+            average = float(holding[spec['price']] or 0) if holding else 0.0
+            position = conn.execute(
+                "SELECT quantity, cost_basis, realized_pnl FROM positions WHERE asset = ? AND holding_key = ?",
+                (asset, key)).fetchone()
+            realized = position[2] if position else 0.0
+            state = (held, held * average, realized)
+
+            # Holdings imported or edited outside the ledger are taken as they stand
+            if (position is None and holding) or (position and not (_same(position[0], state[0]) and
+                                                                   _same(position[1], state[1]))):
+                _append(conn, asset, key, 'opening', date, held, average,
+                        name or (holding or {}).get(spec['name'], ''), code)
+
+            held, cost, realized = apply_event(state, event, quantity, price)
+            event_id = _append(conn, asset, key, event, date, quantity, price,
+                               name or (holding or {}).get(spec['name'], ''), code)
+            conn.execute(
+                "INSERT INTO positions (asset, holding_key, quantity, cost_basis, realized_pnl, last_event) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(asset, holding_key) DO UPDATE SET "
+                "quantity = excluded.quantity, cost_basis = excluded.cost_basis, "
+                "realized_pnl = excluded.realized_pnl, last_event = excluded.last_event",
+                (asset, key, held, cost, realized, event_id))
+
+            if held > 0:
+                record = dict(holding or {})
+                record.update({spec['name']: name or record.get(spec['name'], ''), spec['code']: code,
+                               spec['quantity']: held, spec['price']: cost / held})
+                holdings_store.write_holding(conn, asset, record)
+            else:
+                holdings_store.remove_holding(conn, asset, key)
+        return {'key': key, 'quantity': held, 'average_price': cost / held if held else 0.0,
+                'realized_pnl': realized}
+    finally:
+        conn.close()
+
+def load_positions(asset: str, path: Optional[str] = None) -> pd.DataFrame:
+    """Open positions of an asset class: its holdings plus a RealizedPnL column."""
+    df = holdings_store.load_holdings(asset, path)
+    conn = connect(path)
+    try:
+        realized = dict(conn.execute("SELECT holding_key, realized_pnl FROM positions WHERE asset = ?",
+                                     (asset,)).fetchall())
+    finally:
+        conn.close()
+    keys = [holdings_store.holding_key(asset, record) for record in df.to_dict('records')]
+    df['RealizedPnL'] = [realized.get(key, 0.0) for key in keys]
+    return df
+
+def get_realized_pnl(asset: str, path: Optional[str] = None) -> float:
+    """Total realized P&L of an asset class, closed positions included."""
+    conn = connect(path)
+    try:
+        return conn.execute("SELECT COALESCE(SUM(realized_pnl), 0) FROM positions WHERE asset = ?",
+                            (asset,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def get_ledger(asset: Optional[str] = None, path: Optional[str] = None) -> pd.DataFrame:
+    """Ledger events in the order they were recorded, optionally for one asset class."""
+    columns = ['id', 'asset', 'holding_key', 'event', 'date', 'quantity', 'price', 'name', 'code']
+    query = f"SELECT {', '.join(columns)} FROM ledger"
+    params: List = []
+    if asset is not None:
+        query += " WHERE asset = ?"
+        params.append(asset)
+    conn = connect(path)
+    try:
+        return pd.DataFrame(conn.execute(query + " ORDER BY id", params).fetchall(), columns=columns)
+    finally:
+        conn.close()
+
+def changes_since(last_id: int = 0, path: Optional[str] = None) -> Tuple[int, Optional[str]]:
+    """Id of the newest ledger event, and the earliest date among events recorded after `last_id`."""
+    conn = connect(path)
+    try:
+        latest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ledger").fetchone()[0]
+        earliest = conn.execute("SELECT MIN(date) FROM ledger WHERE id > ?", (last_id,)).fetchone()[0]
+        return latest, earliest
+    finally:
+        conn.close()
+
+def replay_positions(asset: str, path: Optional[str] = None) -> Dict[str, Tuple[float, float, float]]:
+    """(quantity, cost basis, realized P&L) per holding key, recomputed from the full ledger.
+
+    Only for checking the materialized positions; the app never needs it.
+    """
+    states: Dict[str, Tuple[float, float, float]] = {}
+    for row in get_ledger(asset, path).itertuples():
+        state = states.get(row.holding_key, (0.0, 0.0, 0.0))
+        states[row.holding_key] = apply_event(state, row.event, row.quantity, row.price)
+    return states
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import numpy as np
+from utils.holdings_store import load_holdings
+from utils.http_client import request_deadline
+from utils.portfolio_utils import get_price_history, get_price_history_last_date, update_price_history
+from utils.quote_cache import IST
+
+# Yahoo symbol of the NIFTY 50 index (benchmark of the Market Analysis chart)
+NIFTY_SYMBOL = '^NSEI'
+
+# Selectable chart ranges, in calendar days
+CHART_RANGES = {'1M': 30, '6M': 182, '1Y': 365, '5Y': 5 * 365}
+
+# Upper bound (seconds) on the history downloads made by one update
+UPDATE_DEADLINE = 30
+
+# Computed figures of the current holdings per (holdings hash, range), with the
+# history version they were drawn from; figures of older holdings are dropped
+_figures: Dict[Tuple[str, str], Tuple[str, object]] = {}
+_lock = threading.Lock()
+
+def _today() -> np.datetime64:
+    return np.datetime64(datetime.now(IST).date(), 'D')
+
+def _stock_quantities() -> Dict[str, float]:
+    """Shares held per NSE symbol (rows without a symbol cannot be priced)."""
+    df = load_holdings('stocks')
+    df = df[df['NSE_Symbol'] != '']
+    return df.groupby('NSE_Symbol')['SharesOwned'].sum().to_dict()
+
+def holdings_hash(quantities: Dict[str, float]) -> str:
+    payload = '|'.join(f"{symbol}:{quantity:g}" for symbol, quantity in sorted(quantities.items()))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def update_market_history() -> Dict:
+    """Fetch the missing tail of the daily closes of every held stock and the index.
+
+    Each series only requests the days after its last stored close, at most
+    once per market session (see utils.portfolio_utils.update_price_history).
+    """
+    quantities = _stock_quantities()
+    added = 0
+    with request_deadline(UPDATE_DEADLINE):
+        for symbol in [NIFTY_SYMBOL] + sorted(quantities):
+            added += update_price_history(symbol)
+    return {'date': str(_today()), 'added': added}
+
+def _closes(symbol: str, start: np.datetime64, end: np.datetime64) -> Tuple[np.ndarray, np.ndarray]:
+    history = get_price_history(symbol, str(start), str(end), update=False)
+    return history['Date'].values.astype('datetime64[D]'), history['Close'].values
+
+def performance_series(range_key: str, quantities: Optional[Dict[str, float]] = None,
+                       today: Optional[np.datetime64] = None) -> Dict[str, np.ndarray]:
+    """Portfolio and NIFTY 50 values over a range, both rebased to 100 at its first day.
+
+    The index's trading days are the date axis. The portfolio is today's
+    holdings valued at each day's closes, forward-filled over days a stock did
+    not trade. Days before a stock's first stored close (not yet listed, or
+    history missing) cannot be valued, so the series starts on the first day
+    every stock with history has a close.
+    Returns {'dates', 'portfolio', 'nifty'}; empty arrays without index data.
+    """
+    quantities = _stock_quantities() if quantities is None else quantities
+    today = today if today is not None else _today()
+    start = today - CHART_RANGES[range_key]
+    dates, nifty = _closes(NIFTY_SYMBOL, start, today)
+    if len(dates) == 0:
+        return {'dates': dates, 'portfolio': np.array([]), 'nifty': nifty}
+
+    portfolio = np.zeros(len(dates))
+    first = 0
+    for symbol, quantity in quantities.items():
+        stock_dates, closes = _closes(symbol, start - 7, today)
+        if len(stock_dates) == 0 or not quantity:
+            continue
+        positions = np.searchsorted(stock_dates, dates, side='right') - 1
+        first = max(first, int(np.searchsorted(positions, 0)))
+        portfolio += quantity * closes[np.maximum(positions, 0)]
+
+    dates, portfolio, nifty = dates[first:], portfolio[first:], nifty[first:]
+    if len(dates) == 0:
+        return {'dates': dates, 'portfolio': portfolio, 'nifty': nifty}
+    rebased_portfolio = portfolio / portfolio[0] * 100 if portfolio[0] > 0 else np.full(len(dates), np.nan)
+    return {'dates': dates, 'portfolio': rebased_portfolio, 'nifty': nifty / nifty[0] * 100}
+
+def history_version(quantities: Dict[str, float]) -> str:
+    """Changes whenever a day is added to any series the chart reads."""
+    return '|'.join(str(get_price_history_last_date(symbol)) for symbol in [NIFTY_SYMBOL] + sorted(quantities))
+
+def get_performance_figure(range_key: str, build_figure):
+    """The chart for a range, built with `build_figure(series)` and cached by (holdings hash, range).
+
+    A cached figure is reused until a new close is stored for any of its series.
+    """
+    quantities = _stock_quantities()
+    key = (holdings_hash(quantities), range_key)
+    version = history_version(quantities)
+    with _lock:
+        cached = _figures.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    figure = build_figure(performance_series(range_key, quantities))
+    with _lock:
+        for stale in [cached_key for cached_key in _figures if cached_key[0] != key[0]]:
+            del _figures[stale]
+        _figures[key] = (version, figure)
+    return figure
@@ -1,282 +1,186 @@
 import pandas as pd
 import os
 import argparse
+from itertools import chain, islice
 from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from openpyxl import load_workbook
+from utils.scheme_master import match_scheme_names
+from utils.header_detection import detect_layout, MF_HOLDINGS_FIELDS, MF_HOLDINGS_REQUIRED
+
+# Only this many rows at the top of each sheet are searched for the header row
+HEADER_SCAN_ROWS = 30
+
+# Holdings are resolved and written to CSV this many rows at a time
+WRITE_CHUNK_ROWS = 500
+
+OUTPUT_COLUMNS = ['Scheme', 'UnitsOwned', 'AverageNAV', 'SchemeCode', 'MatchConfidence']
+
+def resolve_scheme_codes(df):
+    """Fill SchemeCode and MatchConfidence by fuzzy-matching every scheme name against AMFI."""
+    try:
+        codes, confidence = match_scheme_names(df['Scheme'])
+    except Exception as e:
+        print(f"Error resolving scheme codes: {str(e)}")
+        df['SchemeCode'] = ''
+        df['MatchConfidence'] = 0.0
+        return df
+
+    df['SchemeCode'] = codes
+    df['MatchConfidence'] = confidence.round(3)
+    return df
+
+def find_excel_file(excel_file: str, folder: str = 'MutualFunds') -> str:
+    """Locate the holdings file, also looking in assets/<folder>."""
+    if os.path.exists(excel_file):
+        return excel_file
+
+    # Try checking if it's in the assets folder for this kind of statement
+    mf_path = os.path.join('assets', folder, os.path.basename(excel_file))
+    if os.path.exists(mf_path):
+        return mf_path
+
+    # Also try absolute path
+    abs_mf_path = os.path.join('D:', 'StockPicker', 'assets', folder, os.path.basename(excel_file))
+    if os.path.exists(abs_mf_path):
+        return abs_mf_path
+
+    raise FileNotFoundError(f"Could not find Excel file: {excel_file}")
+
+def find_holdings_header(rows: List[Tuple]) -> Optional[Dict]:
+    """Find the header row and field columns among the first rows of a sheet.
+
+    Returns the detected layout ({'header_row', 'columns', 'score'}), or None.
+    """
+    return detect_layout(rows, MF_HOLDINGS_FIELDS, MF_HOLDINGS_REQUIRED)
+
+def to_number(value) -> Optional[float]:
+    """Parse a numeric cell ('1,234.50' strings included); None if it is not a number."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+
+def iter_holdings_rows(rows: Iterator[Tuple], layout: Dict) -> Iterator[Tuple[str, float, object]]:
+    """Yield (scheme, units, average NAV) for every data row; blank or non-numeric rows are skipped.
+
+    The average NAV comes from an average-NAV column, else invested value / units,
+    else it is left blank.
+    """
+    columns = layout['columns']
+    scheme_col, units_col = columns['scheme'], columns['units']
+    nav_col, invested_col = columns.get('average_nav'), columns.get('invested')
+    for row in rows:
+        if len(row) <= max(scheme_col, units_col):
+            continue
+        scheme = row[scheme_col]
+        units = to_number(row[units_col])
+        if scheme is None or units is None or not str(scheme).strip():
+            continue
+
+        average_nav = None
+        if nav_col is not None and nav_col < len(row):
+            average_nav = to_number(row[nav_col])
+        if average_nav is None and invested_col is not None and invested_col < len(row) and units:
+            invested = to_number(row[invested_col])
+            average_nav = round(invested / units, 4) if invested is not None else None
+
+        yield str(scheme).strip(), units, average_nav if average_nav is not None else ''
+
+def open_holdings_rows(workbook, find_header=find_holdings_header) -> Tuple[str, Dict, Iterator[Tuple]]:
+    """Find the sheet holding the statement data in an open workbook.
+
+    Only the first HEADER_SCAN_ROWS rows of each sheet are read to find the
+    header (with `find_header`, mutual fund layouts by default); returns
+    (sheet name, layout, iterator over the remaining rows).
+    """
+    for worksheet in workbook.worksheets:
+        rows = worksheet.iter_rows(values_only=True)
+        head = list(islice(rows, HEADER_SCAN_ROWS))
+        layout = find_header(head)
+        if layout is not None:
+            print(f"Found header in sheet {worksheet.title} at row {layout['header_row'] + 1} "
+                  f"(score {layout['score']}), columns: {layout['columns']}")
+            return worksheet.title, layout, chain(head[layout['header_row'] + 1:], rows)
+
+    raise ValueError("Could not find any sheet with holdings data")
+
+def _chunked(items: Iterator, size: int) -> Iterator[List]:
+    """Group an iterator into lists of at most `size` items."""
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def read_holdings(excel_file: str) -> Iterator[pd.DataFrame]:
+    """Stream a holdings workbook as DataFrames of up to WRITE_CHUNK_ROWS rows.
+
+    The workbook is opened once in read-only mode and rows are read as they are
+    consumed. Each chunk has the OUTPUT_COLUMNS, with scheme codes resolved.
+    """
+    workbook = load_workbook(find_excel_file(excel_file), read_only=True, data_only=True)
+    try:
+        sheet_name, layout, rows = open_holdings_rows(workbook)
+        for chunk in _chunked(iter_holdings_rows(rows, layout), WRITE_CHUNK_ROWS):
+            df = pd.DataFrame(chunk, columns=['Scheme', 'UnitsOwned', 'AverageNAV'])
+            yield resolve_scheme_codes(df)[OUTPUT_COLUMNS]
+    finally:
+        workbook.close()
 
 def convert_holdings_to_csv(excel_file, output_csv=None):
     """
     Convert a mutual funds holdings Excel file to the format needed for the StockPicker app.
-    
+
     Parameters:
     -----------
     excel_file : str
         Path to the Excel file containing mutual fund holdings data
     output_csv : str, optional
         Path where the CSV should be saved. If None, will save to default location.
-    
+
     Returns:
     --------
     str
         Path to the saved CSV file
     """
     try:
-        # Check if file exists
-        if not os.path.exists(excel_file):
-            # Try checking if it's in the MutualFunds directory
-            mf_path = os.path.join('assets', 'MutualFunds', os.path.basename(excel_file))
-            if os.path.exists(mf_path):
-                excel_file = mf_path
-            else:
-                # Also try absolute path
-                abs_mf_path = os.path.join('D:', 'StockPicker', 'assets', 'MutualFunds', os.path.basename(excel_file))
-                if os.path.exists(abs_mf_path):
-                    excel_file = abs_mf_path
-                else:
-                    raise FileNotFoundError(f"Could not find Excel file: {excel_file}")
-        
-        # Read the Excel file - try various ways
         print(f"Reading Excel file: {excel_file}")
 
-        # First, try automatic sheet detection
-        try:
-            # Try reading the first sheet
-            excel_data = pd.read_excel(excel_file, header=None)
-            sheet_name = pd.ExcelFile(excel_file).sheet_names[0]
-            print(f"Using first sheet: {sheet_name}")
-        except Exception as e:
-            print(f"Error reading first sheet, trying 'Holdings' sheet: {str(e)}")
-            try:
-                # Try reading the 'Holdings' sheet explicitly
-                excel_data = pd.read_excel(excel_file, sheet_name='Holdings', header=None)
-                print("Using 'Holdings' sheet")
-            except Exception as e2:
-                print(f"Error reading 'Holdings' sheet, trying all sheets: {str(e2)}")
-                # Try all sheets and find one with MF data
-                xls = pd.ExcelFile(excel_file)
-                found_sheet = False
-                
-                for sheet in xls.sheet_names:
-                    try:
-                        temp_data = pd.read_excel(excel_file, sheet_name=sheet, header=None)
-                        # Check if this sheet contains scheme data
-                        for i, row in temp_data.head(20).iterrows():
-                            row_data = " ".join([str(cell) for cell in row if cell is not None])
-                            if "scheme" in row_data.lower() or "fund" in row_data.lower() or "mutual" in row_data.lower():
-                                excel_data = temp_data
-                                print(f"Found data in sheet: {sheet}")
-                                found_sheet = True
-                                break
-                        if found_sheet:
-                            break
-                    except:
-                        continue
-                
-                if not found_sheet:
-                    raise ValueError("Could not find any sheet with mutual fund data")
-        
-        # Now we have the excel_data, let's process it
-        
-        # Debug info - shape of the data
-        print(f"Excel data shape: {excel_data.shape}")
-        
-        # Try multiple approaches to find the scheme data
-        
-        # Approach 1: Look for the header row by searching for common column names
-        header_row = None
-        scheme_col_idx = None
-        units_col_idx = None
-        
-        # Search for header row (look through first 30 rows)
-        for i in range(min(30, len(excel_data))):
-            row = excel_data.iloc[i]
-            # Convert row to strings and clean up
-            row_values = [str(val).strip().lower() if val is not None else "" for val in row.values]
-            row_text = " ".join(row_values)
-            
-            # Check if this looks like a header row
-            if ("scheme" in row_text and "unit" in row_text) or \
-               ("fund" in row_text and "unit" in row_text) or \
-               ("scheme name" in row_values) or \
-               ("folio" in row_text and "balance" in row_text):
-                
-                # This could be our header row
-                header_row = i
-                
-                # Find column indices
-                for j, val in enumerate(row_values):
-                    if "scheme" in val or "fund name" in val or "name" in val:
-                        scheme_col_idx = j
-                    if "unit" in val or "balance" in val or "holdings" in val:
-                        units_col_idx = j
-                
-                if scheme_col_idx is not None and units_col_idx is not None:
-                    print(f"Found header at row {i+1}, scheme col: {scheme_col_idx}, units col: {units_col_idx}")
-                    break
-        
-        if header_row is None:
-            # If still not found, try looking for rows with "scheme" or "fund" in them
-            for i in range(min(30, len(excel_data))):
-                row = excel_data.iloc[i]
-                if any("scheme" in str(val).lower() for val in row if val is not None) or \
-                   any("fund" in str(val).lower() for val in row if val is not None):
-                    print(f"Potential header found at row {i+1}")
-                    header_row = i
-                    break
-        
-        # Fall back to a liberal approach if we still haven't found a header
-        if header_row is None or scheme_col_idx is None or units_col_idx is None:
-            print("Could not find reliable header row. Trying fallback method...")
-            
-            # Just use the first several rows as candidate headers and look for data patterns
-            found_data = False
-            test_offset_range = 5  # Try a few different starting rows
-            
-            for test_header in range(min(10, len(excel_data))):
-                for offset in range(test_offset_range):
-                    try:
-                        # Try this row as header
-                        test_df = pd.DataFrame(excel_data.iloc[test_header+offset+1:].values,
-                                               columns=excel_data.iloc[test_header])
-                        
-                        # Find columns that might contain scheme names and units
-                        col_candidates = {}
-                        for col in test_df.columns:
-                            if col is None:
-                                continue
-                                
-                            col_str = str(col).lower()
-                            
-                            # Check potential scheme name column
-                            if "scheme" in col_str or "name" in col_str or "fund" in col_str:
-                                # Count non-null values as a quality metric
-                                non_null = test_df[col].count()
-                                col_candidates[col] = {'type': 'scheme', 'quality': non_null}
-                            
-                            # Check potential units column
-                            elif "unit" in col_str or "balance" in col_str or "holding" in col_str or "quantity" in col_str:
-                                # Try to convert to numeric as a quality check
-                                try:
-                                    numeric_count = pd.to_numeric(test_df[col], errors='coerce').count()
-                                    col_candidates[col] = {'type': 'units', 'quality': numeric_count}
-                                except:
-                                    pass
-                        
-                        # Find best candidates
-                        scheme_cols = {col: info for col, info in col_candidates.items() 
-                                      if info['type'] == 'scheme'}
-                        units_cols = {col: info for col, info in col_candidates.items() 
-                                     if info['type'] == 'units'}
-                        
-                        if scheme_cols and units_cols:
-                            best_scheme_col = max(scheme_cols.items(), key=lambda x: x[1]['quality'])[0]
-                            best_units_col = max(units_cols.items(), key=lambda x: x[1]['quality'])[0]
-                            
-                            # Verify we have enough data
-                            if test_df[best_scheme_col].count() >= 10 and test_df[best_units_col].count() >= 10:
-                                print(f"Found data with header at row {test_header+1}, offset {offset}")
-                                print(f"Scheme column: {best_scheme_col}")
-                                print(f"Units column: {best_units_col}")
-                                
-                                # Create our result dataframe directly
-                                result_df = pd.DataFrame({
-                                    'Scheme': test_df[best_scheme_col],
-                                    'UnitsOwned': test_df[best_units_col]
-                                })
-                                
-                                # Clean and convert units
-                                result_df['UnitsOwned'] = pd.to_numeric(result_df['UnitsOwned'], errors='coerce')
-                                
-                                # Drop rows with NA scheme or units
-                                result_df = result_df.dropna(subset=['Scheme', 'UnitsOwned']).reset_index(drop=True)
-                                
-                                if len(result_df) > 10:  # Make sure we have a reasonable number of funds
-                                    # Add empty columns for missing data
-                                    result_df['AverageNAV'] = ''  # Not available in Excel
-                                    result_df['SchemeCode'] = ''  # Not available in Excel
-                                    
-                                    # Save to CSV
-                                    if output_csv is None:
-                                        output_dir = 'assets/PersonalFiles'
-                                        os.makedirs(output_dir, exist_ok=True)
-                                        output_csv = os.path.join(output_dir, 'myMFPortfolio.csv')
-                                    
-                                    # Save the data and return
-                                    result_df.to_csv(output_csv, index=False)
-                                    print(f"Successfully converted mutual fund holdings to: {output_csv}")
-                                    print(f"Found {len(result_df)} mutual fund schemes")
-                                    return output_csv
-                    except Exception as e:
-                        # Just try next iteration
-                        pass
-            
-            # If we get here, we couldn't find the data with the fallback method
-            raise ValueError("Could not identify mutual fund data in the Excel file with fallback methods")
-            
-        # Now process the data based on the header we found
-        headers = excel_data.iloc[header_row].values
-        data_rows = excel_data.iloc[header_row + 1:]
-        
-        # Create DataFrame
-        df = pd.DataFrame(data_rows.values, columns=headers)
-        
-        # Clean up column names
-        df.columns = [str(col).strip() if col is not None else f"Column{i}" 
-                       for i, col in enumerate(df.columns)]
-        
-        # If we already know the scheme and units columns, extract them
-        if scheme_col_idx is not None and units_col_idx is not None:
-            scheme_col = df.columns[scheme_col_idx] 
-            units_col = df.columns[units_col_idx]
-        else:
-            # Otherwise, try to identify them by name
-            scheme_col = None
-            units_col = None
-            
-            for col in df.columns:
-                col_lower = str(col).lower()
-                if "scheme" in col_lower or "name" in col_lower or "fund" in col_lower:
-                    scheme_col = col
-                elif "unit" in col_lower or "balance" in col_lower or "holding" in col_lower:
-                    units_col = col
-        
-        if scheme_col is None or units_col is None:
-            raise ValueError("Could not identify scheme name and units columns")
-                
-        # Select and rename relevant columns
-        csv_data = df[[scheme_col, units_col]].copy()
-        csv_data.columns = ['Scheme', 'UnitsOwned']
-        
-        # Clean data - drop NAs
-        csv_data = csv_data.dropna(subset=['Scheme']).reset_index(drop=True)
-        
-        # Convert units to numeric
-        csv_data['UnitsOwned'] = pd.to_numeric(csv_data['UnitsOwned'], errors='coerce')
-        
-        # Drop NA units
-        csv_data = csv_data.dropna(subset=['UnitsOwned']).reset_index(drop=True)
-        
-        # Make sure schemes are strings
-        csv_data['Scheme'] = csv_data['Scheme'].astype(str)
-        
-        # Drop any rows with empty schemes
-        csv_data = csv_data[csv_data['Scheme'].str.strip() != ''].reset_index(drop=True)
-        
-        # Add empty columns for missing data
-        csv_data['AverageNAV'] = ''  # Not available in Excel
-        csv_data['SchemeCode'] = ''  # Not available in Excel
-        
-        # Save to CSV
         if output_csv is None:
             output_dir = 'assets/PersonalFiles'
             os.makedirs(output_dir, exist_ok=True)
             output_csv = os.path.join(output_dir, 'myMFPortfolio.csv')
-            
-        csv_data.to_csv(output_csv, index=False)
+
+        # Stream chunks into a temporary file so a failed conversion leaves the old CSV intact
+        tmp_csv = output_csv + '.tmp'
+        count = 0
+        resolved = 0
+        try:
+            with open(tmp_csv, 'w', newline='') as f:
+                f.write(','.join(OUTPUT_COLUMNS) + '\n')
+                for chunk in read_holdings(excel_file):
+                    chunk.to_csv(f, header=False, index=False)
+                    count += len(chunk)
+                    resolved += (chunk['SchemeCode'] != '').sum()
+            if count == 0:
+                raise ValueError("Could not identify mutual fund data in the Excel file")
+        except Exception:
+            if os.path.exists(tmp_csv):
+                os.remove(tmp_csv)
+            raise
+        os.replace(tmp_csv, output_csv)
+
         print(f"Successfully converted mutual fund holdings to: {output_csv}")
-        print(f"Found {len(csv_data)} mutual fund schemes")
-        
+        print(f"Found {count} mutual fund schemes")
+        print(f"Resolved {resolved} of {count} scheme codes")
+
         return output_csv
-        
+
     except Exception as e:
         print(f"Error converting Excel file: {str(e)}")
         raise
@@ -285,12 +189,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Convert mutual fund holdings Excel to CSV format for StockPicker')
     parser.add_argument('excel_file', help='Path to the mutual fund holdings Excel file')
     parser.add_argument('--output', '-o', help='Output CSV file path (optional)')
-    
+
     args = parser.parse_args()
-    
+
     try:
         output_path = convert_holdings_to_csv(args.excel_file, args.output)
         print(f"Conversion completed. CSV saved to: {output_path}")
     except Exception as e:
         print(f"Failed to convert holdings: {str(e)}")
-        exit(1) 
\ No newline at end of file
+        exit(1)
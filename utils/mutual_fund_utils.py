@@ -1,89 +1,71 @@
 import pandas as pd
+import numpy as np
 from typing import Dict
 import time
-import requests
-import json
 import os
 from datetime import datetime
+from utils import quote_cache
+from utils.quote_cache import get_quote, put_quote, mf_key, get_cache_stats, MF_NAV_TTL
+from utils.amfi_nav import get_index_nav, get_index_navs
+from utils.scheme_documents import get_scheme_document, fetch_scheme_history
+from utils.timeseries_store import append_series, read_series, get_last_date, get_series_info, set_series_fields
+from utils.single_flight import single_flight
+from utils.http_client import request_deadline
+from utils.last_known_good import resolve_values
+from utils.holdings_store import replace_holdings, holding_key, csv_path as holdings_csv_path
+from utils.ledger import load_positions, get_realized_pnl
+from utils.returns import holding_returns, asset_returns, current_values, as_percent
 
+# Upper bound (seconds) on the upstream calls made while loading the portfolio
+LOAD_DEADLINE = 20
+
+@single_flight
 def get_mf_nav(scheme_code: str) -> float:
-    """Get latest NAV for a mutual fund scheme using AMFI API."""
-    try:
-        # Using AMFI API to get latest NAV
-        url = f"https://api.mfapi.in/mf/{scheme_code}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers)
-        data = json.loads(response.text)
-        
-        # Extract the latest NAV
-        if 'data' in data and len(data['data']) > 0:
-            latest_nav = data['data'][0]['nav']
-            return float(latest_nav)
-        
-        # If no NAV found, return 0
-        return 0
-            
-    except Exception as e:
-        print(f"Error fetching NAV for scheme {scheme_code}: {str(e)}")
-        return 0
+    """Get latest NAV for a mutual fund scheme from the AMFI index, then the quote cache."""
+    nav = get_index_nav(scheme_code)
+    if nav:
+        return nav
+    
+    cached = get_quote(mf_key(scheme_code))
+    if cached is not None:
+        return cached
+    
+    nav = fetch_mf_nav(scheme_code)
+    put_quote(mf_key(scheme_code), nav, ttl=MF_NAV_TTL)
+    return nav
 
-def use_dummy_mf_data_for_testing():
-    """Create dummy NAVs for testing - only used if API calls fail."""
-    # Map of dummy NAVs based on common schemes
-    return {
-        '119598': 45.12,  # SBI Blue Chip Fund
-        '119551': 57.80,  # Axis Bluechip Fund
-        '120505': 110.25,  # HDFC Index Fund-NIFTY 50 Plan
-        '122639': 85.45,  # Mirae Asset Large Cap Fund
-        '119609': 76.30,  # ICICI Prudential Bluechip Fund
-        '119533': 65.20,  # Kotak Standard Multicap Fund
-        '120178': 155.90,  # UTI Nifty Index Fund
-        '118759': 92.35,  # Aditya Birla Sun Life Frontline Equity Fund
-        '100356': 125.60,  # HDFC Mid-Cap Opportunities Fund
-        '118560': 84.70,  # ICICI Prudential Value Discovery Fund
-    }
+def fetch_mf_nav(scheme_code: str) -> float:
+    """Fetch latest NAV for a mutual fund scheme from its cached mfapi document."""
+    document = get_scheme_document(scheme_code)
+    
+    # The NAV series is stored oldest first
+    if document is not None and len(document['navs']) > 0:
+        return float(document['navs'][-1])
+    
+    # If no NAV found, return 0
+    return 0
 
 def get_mf_info(scheme_code: str) -> Dict:
     """Get detailed information for a mutual fund scheme."""
-    try:
-        # Using AMFI API to get scheme info
-        url = f"https://api.mfapi.in/mf/{scheme_code}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers)
-        data = json.loads(response.text)
-        
-        if 'meta' in data:
-            return {
-                'scheme_name': data['meta'].get('scheme_name', ''),
-                'fund_house': data['meta'].get('fund_house', ''),
-                'scheme_type': data['meta'].get('scheme_type', ''),
-                'scheme_category': data['meta'].get('scheme_category', ''),
-                'scheme_code': data['meta'].get('scheme_code', '')
-            }
-        
-        return {
-            'scheme_name': '',
-            'fund_house': '',
-            'scheme_type': '',
-            'scheme_category': '',
-            'scheme_code': scheme_code
-        }
-            
-    except Exception as e:
-        print(f"Error fetching info for scheme {scheme_code}: {str(e)}")
+    document = get_scheme_document(scheme_code)
+    
+    if document is not None and document['meta']:
+        meta = document['meta']
         return {
-            'scheme_name': '',
-            'fund_house': '',
-            'scheme_type': '',
-            'scheme_category': '',
-            'scheme_code': scheme_code
+            'scheme_name': meta.get('scheme_name', ''),
+            'fund_house': meta.get('fund_house', ''),
+            'scheme_type': meta.get('scheme_type', ''),
+            'scheme_category': meta.get('scheme_category', ''),
+            'scheme_code': meta.get('scheme_code', '')
         }
+    
+    return {
+        'scheme_name': '',
+        'fund_house': '',
+        'scheme_type': '',
+        'scheme_category': '',
+        'scheme_code': scheme_code
+    }
 
 def get_scheme_name_from_code(scheme_code: str) -> str:
     """Get the scheme name from scheme code using AMFI API."""
@@ -121,14 +103,63 @@ def get_scheme_name_from_code(scheme_code: str) -> str:
         print(f"Error fetching scheme name for {scheme_code}: {str(e)}")
         return scheme_code  # Return the code itself if any error occurs
 
+def _nav_history_dir() -> str:
+    return os.path.join(quote_cache.CACHE_DIR, 'nav_history')
+
+def update_nav_history(scheme_code) -> int:
+    """Append NAVs published since the last stored date to the local history store.
+
+    The first call for a scheme stores its full history; later calls only request
+    dates after the last stored one, at most once per market session.
+    Returns the number of new rows.
+    """
+    scheme_code = str(scheme_code).strip()
+    directory = _nav_history_dir()
+    
+    # Skip the network entirely if this scheme was already checked this session
+    info = get_series_info(directory, scheme_code)
+    if info and info.get('checked_at'):
+        checked_at = datetime.fromtimestamp(info['checked_at'], quote_cache.IST)
+        if quote_cache.compute_expiry(MF_NAV_TTL, checked_at) > time.time():
+            return 0
+    
+    last_date = get_last_date(directory, scheme_code)
+    if last_date is None:
+        document = get_scheme_document(scheme_code)
+    else:
+        document = fetch_scheme_history(scheme_code, start_date=last_date + np.timedelta64(1, 'D'))
+    
+    if document is None:
+        return 0
+    
+    added = append_series(directory, scheme_code, document['dates'], document['navs'])
+    set_series_fields(directory, scheme_code, checked_at=time.time())
+    return added
+
+def get_nav_history(scheme_code, start_date=None, end_date=None, update: bool = True) -> pd.DataFrame:
+    """Get the stored NAV history of a scheme between two dates (inclusive)."""
+    if update:
+        update_nav_history(scheme_code)
+    
+    dates, navs = read_series(_nav_history_dir(), str(scheme_code).strip(), start_date, end_date)
+    return pd.DataFrame({'Date': pd.to_datetime(dates), 'NAV': navs})
+
+def get_nav_on_date(scheme_code, date, update: bool = True) -> float:
+    """Get the NAV in effect on a date (the last one published on or before it), or 0."""
+    if update:
+        update_nav_history(scheme_code)
+    
+    dates, navs = read_series(_nav_history_dir(), str(scheme_code).strip(), end=date)
+    return float(navs[-1]) if len(navs) > 0 else 0
+
+@single_flight
 def load_mf_portfolio_data() -> pd.DataFrame:
-    """Load and process mutual fund portfolio data from CSV."""
-    # Create directory if it doesn't exist
-    os.makedirs('assets/PersonalFiles', exist_ok=True)
+    """Load and process mutual fund portfolio data from the ledger's open positions."""
+    # Read the portfolio data (codes are strings; unresolved ones are blank)
+    df = load_positions('mutual_funds')
     
-    # Create the file with sample data if it doesn't exist
-    csv_path = 'assets/PersonalFiles/myMFPortfolio.csv'
-    if not os.path.exists(csv_path):
+    # Start with sample data if there is nothing yet
+    if df.empty and not os.path.exists(holdings_csv_path('mutual_funds')):
         sample_data = pd.DataFrame({
             'Scheme': ['SBI Blue Chip Fund-Direct Plan-Growth', 
                       'Axis Bluechip Fund Direct Plan Growth',
@@ -137,39 +168,61 @@ def load_mf_portfolio_data() -> pd.DataFrame:
             'AverageNAV': [39.75, 52.45, 98.60],
             'SchemeCode': ['119598', '119551', '120505']
         })
-        sample_data.to_csv(csv_path, index=False)
-    
-    # Read the portfolio data
-    df = pd.read_csv(csv_path)
-    
-    # Get dummy data ready for any schemes that fail
-    dummy_navs = use_dummy_mf_data_for_testing()
+        replace_holdings('mutual_funds', sample_data)
+        df = load_positions('mutual_funds')
     
-    # Try to get live NAVs with fallback to dummy data
-    navs = {}
-    for scheme_code in df['SchemeCode'].unique():
-        # Try to get the NAV
-        nav = get_mf_nav(scheme_code)
+    # Price everything we can from the bulk AMFI NAV file
+    with request_deadline(LOAD_DEADLINE):
+        navs = get_index_navs(df['SchemeCode'].unique())
         
-        # If NAV fetch failed, use dummy data without retrying
-        if nav == 0:
-            nav = dummy_navs.get(scheme_code, 0)
+        # Schemes missing from the AMFI file fall back to per-scheme lookups (paced by
+        # the mfapi rate limiter)
+        for scheme_code in df['SchemeCode'].unique():
+            if scheme_code in navs:
+                continue
             
-        navs[scheme_code] = nav
-        time.sleep(0.5)  # Add delay between requests to avoid rate limiting
+            # Schemes the converter could not match have no code to look up; they show as Unavailable
+            if not scheme_code:
+                navs[scheme_code] = 0
+                continue
+            
+            # Use the cached NAV if it is still valid for this market session
+            nav = get_quote(mf_key(scheme_code))
+            if nav is None:
+                nav = fetch_mf_nav(scheme_code)
+                put_quote(mf_key(scheme_code), nav, ttl=MF_NAV_TTL)
+            
+            navs[scheme_code] = nav
+    
+    stats = get_cache_stats()
+    print(f"Quote cache: {stats['hits']} hits, {stats['misses']} misses")
+    
+    # Anything neither AMFI nor mfapi could price falls back to its last known real NAV
+    resolved = resolve_values({mf_key(code): nav for code, nav in navs.items()}, 'AMFI')
+    keys = df['SchemeCode'].map(mf_key)
     
     # Add NAV data to dataframe
-    df['Current NAV'] = df['SchemeCode'].map(navs)
+    df['Current NAV'] = keys.map(lambda key: resolved[key]['value'])
+    df['NAV Source'] = keys.map(lambda key: resolved[key]['provenance'])
+    df['NAV Age'] = keys.map(lambda key: resolved[key]['age'])
     
     # Calculate investment metrics
     df['TotalInvestment'] = df['UnitsOwned'] * df['AverageNAV']
     df['Current Value'] = df['UnitsOwned'] * df['Current NAV']
     df['Profit/Loss'] = df['Current Value'] - df['TotalInvestment']
     df['Returns %'] = ((df['Current Value'] - df['TotalInvestment']) / df['TotalInvestment'] * 100).round(2)
+    df['Realized P&L'] = df['RealizedPnL']
+    
+    # Money- and time-weighted returns from each scheme's ledger events (SIPs included)
+    returns = holding_returns('mutual_funds', [holding_key('mutual_funds', record) for record in df.to_dict('records')],
+                              df['Current Value'].values, df['Current NAV'].values)
+    df['XIRR %'] = (returns['xirr'].values * 100).round(2)
+    df['TWR %'] = (returns['twr'].values * 100).round(2)
     
-    # Reorder columns
+    # Reorder columns (SchemeCode is kept for the returns summary, not shown)
     columns = ['Scheme', 'UnitsOwned', 'AverageNAV', 'Current NAV', 'TotalInvestment', 
-              'Current Value', 'Profit/Loss', 'Returns %']
+              'Current Value', 'Profit/Loss', 'Returns %', 'XIRR %', 'TWR %', 'Realized P&L',
+              'NAV Source', 'NAV Age', 'SchemeCode']
     result_df = df[columns].copy()
     
     return result_df
@@ -188,11 +241,18 @@ def get_mf_portfolio_summary(df: pd.DataFrame) -> Dict:
     performing_schemes_value = df[df['Returns %'] > 0]['Current Value'].sum()
     percent_in_performing = ((performing_schemes_value / current_value) * 100).round(2) if current_value > 0 else 0.0
     
+    # Annualized returns of the whole mutual fund portfolio (None when there is no history for them)
+    returns = asset_returns({'mutual_funds': current_values('mutual_funds', df)})['mutual_funds']
+    
     return {
         'total_investment': total_investment,
         'current_value': current_value,
         'total_returns': total_returns,
+        # Includes schemes that have since been redeemed in full
+        'realized_pnl': get_realized_pnl('mutual_funds'),
         'num_schemes': num_schemes,
         'profitable_schemes': profitable_schemes,
-        'percent_in_performing': percent_in_performing
+        'percent_in_performing': percent_in_performing,
+        'xirr': as_percent(returns['xirr']),
+        'twr': as_percent(returns['twr'])
     } 
\ No newline at end of file
@@ -0,0 +1,283 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from utils import ledger, quote_cache, savings_store
+from utils.quote_cache import get_quote, stock_key, mf_key, IST
+from utils.holdings_store import holding_key, load_holdings
+from utils.ledger import apply_event, get_ledger
+from utils.portfolio_utils import get_price_history, update_price_history
+from utils.mutual_fund_utils import get_nav_history, update_nav_history
+from utils.timeseries_store import get_series_info
+from utils.http_client import request_deadline
+
+# Daily net worth, one row per calendar day, kept as a columnar .npz snapshot in
+# the cache directory. An update values the days since the last final row and
+# leaves older rows alone, unless ledger events or savings transactions recorded
+# since the last update are dated earlier: then it revalues from the earliest of
+# those dates. Hand-edited balances (loans, cards, ...) only affect new rows.
+NET_WORTH_FILE = 'net_worth.npz'
+
+# Days covered when the series is first built
+NET_WORTH_HISTORY_DAYS = 5 * 365
+
+# Components of a row; liabilities are stored as positive amounts
+ASSET_COLUMNS = ['stocks', 'mutual_funds', 'savings', 'other_investments']
+LIABILITY_COLUMNS = ['loans', 'credit_cards']
+
+# A day's row is final once every held price/NAV history has reached it, or at
+# the latest this many days later (histories of delisted schemes stop)
+MAX_PROVISIONAL_DAYS = 7
+
+# Upper bound (seconds) on the history downloads made by one update
+UPDATE_DEADLINE = 30
+
+_loaded = {}
+_lock = threading.Lock()
+
+def _snapshot_path() -> str:
+    return os.path.join(quote_cache.CACHE_DIR, NET_WORTH_FILE)
+
+def _today() -> np.datetime64:
+    return np.datetime64(datetime.now(IST).date(), 'D')
+
+def _to_date(value) -> Optional[np.datetime64]:
+    date = pd.to_datetime(value, errors='coerce')
+    return None if pd.isna(date) else np.datetime64(date.date(), 'D')
+
+def _on_grid(dates: np.ndarray, values: np.ndarray, grid: np.ndarray, before=0.0) -> np.ndarray:
+    """Value in effect on each grid day: the last one dated on or before it (`before` if none)."""
+    if len(dates) == 0:
+        return np.full(len(grid), before, dtype=np.float64)
+    positions = np.searchsorted(dates, grid, side='right') - 1
+    return np.where(positions >= 0, values[np.maximum(positions, 0)], before)
+
+def _quantities(asset: str, holdings: pd.DataFrame, quantity_column: str, grid: np.ndarray) -> Dict[str, np.ndarray]:
+    """Quantity held on each grid day per holding key.
+
+    Holdings with ledger events follow them; the quantity carried in by an
+    opening event (or a holding with no events at all) is taken as held since
+    before the series starts. A holding edited outside the ledger since its
+    last event is taken as constant at its current quantity.
+    """
+    ledger = get_ledger(asset)
+    events = {key: group.sort_values(['date', 'id'], kind='stable')
+              for key, group in ledger.groupby('holding_key')} if not ledger.empty else {}
+
+    quantities = {}
+    for record in holdings.to_dict('records'):
+        key = holding_key(asset, record)
+        current = float(record[quantity_column] or 0)
+        quantities[key] = np.full(len(grid), current)
+        if key not in events:
+            continue
+
+        state, dates, steps = (0.0, 0.0, 0.0), [], []
+        for event in events[key].itertuples():
+            state = apply_event(state, event.event, event.quantity, event.price)
+            dates.append(event.date)
+            steps.append(state[0])
+        if abs(steps[-1] - current) > 1e-6:
+            continue
+        first = events[key].iloc[0]
+        before = first.quantity if first.event == 'opening' else 0.0
+        quantities[key] = _on_grid(np.array(dates, dtype='datetime64[D]'), np.array(steps), grid, before)
+    return quantities
+
+def _market_value(asset: str, grid: np.ndarray, today: np.datetime64) -> np.ndarray:
+    """Stocks or mutual funds: quantity held times the close/NAV in effect, per day.
+
+    Today is valued at the live quote when the quote cache has one.
+    """
+    if asset == 'stocks':
+        code_column, quantity_column, history, live_key = 'NSE_Symbol', 'SharesOwned', get_price_history, stock_key
+    else:
+        code_column, quantity_column, history, live_key = 'SchemeCode', 'UnitsOwned', get_nav_history, mf_key
+
+    holdings = load_holdings(asset)
+    quantities = _quantities(asset, holdings, quantity_column, grid)
+    total = np.zeros(len(grid))
+    for record in holdings.to_dict('records'):
+        code = record[code_column]
+        if not code:
+            continue
+        series = history(code, end_date=str(today), update=False)
+        prices = _on_grid(series.iloc[:, 0].values.astype('datetime64[D]'), series.iloc[:, 1].values, grid)
+        live = get_quote(live_key(code))
+        if live:
+            prices[grid == today] = live
+        total += quantities[holding_key(asset, record)] * prices
+    return total
+
+def _savings_value(grid: np.ndarray) -> np.ndarray:
+    """Savings balances per day: statement transactions where imported, else the entered balance."""
+    total = np.zeros(len(grid))
+    transactions = savings_store.get_transactions()
+    accounts = load_holdings('savings')
+    imported = set()
+    for (bank, account), group in transactions.groupby(['bank', 'account'], sort=False):
+        imported.add(savings_store.match_account(accounts, bank, account))
+        group = group.dropna(subset=['balance'])
+        if group.empty:
+            continue
+        dates = group['date'].values.astype('datetime64[D]')
+        balances = group['balance'].values.astype(np.float64)
+        first = group.iloc[0]
+        opening = first['balance'] - first['amount'] if pd.notna(first['amount']) else first['balance']
+        # Transactions are in date order; the last one of a day holds its closing balance
+        last_of_day = np.append(dates[1:] != dates[:-1], True)
+        total += _on_grid(dates[last_of_day], balances[last_of_day], grid, opening)
+
+    for index, account in accounts.iterrows():
+        if index not in imported and pd.notna(account['Balance']):
+            total += account['Balance']
+    return total
+
+def _other_investments_value(grid: np.ndarray) -> np.ndarray:
+    total = np.zeros(len(grid))
+    for investment in load_holdings('other_investments').itertuples(index=False):
+        if pd.isna(investment.Amount):
+            continue
+        start = _to_date(investment.StartDate)
+        total += np.where(grid >= start, investment.Amount, 0.0) if start is not None else investment.Amount
+    return total
+
+def _loans_value(grid: np.ndarray, today: np.datetime64) -> np.ndarray:
+    """Loan outstanding per day, interpolated from the principal at the start date to today's amount."""
+    total = np.zeros(len(grid))
+    for loan in load_holdings('loans').itertuples(index=False):
+        outstanding = 0.0 if pd.isna(loan.OutstandingAmount) else loan.OutstandingAmount
+        principal = outstanding if pd.isna(loan.Principal) else loan.Principal
+        start = _to_date(loan.StartDate)
+        if start is None or start >= today:
+            total += outstanding
+            continue
+        days = np.array([0, (today - start).astype(int)], dtype=np.float64)
+        elapsed = (grid - start).astype(int).astype(np.float64)
+        values = np.interp(elapsed, days, [principal, outstanding])
+        total += np.where(grid >= start, values, 0.0)
+    return total
+
+def _credit_cards_value(grid: np.ndarray) -> np.ndarray:
+    balances = load_holdings('credit_cards')['OutstandingBalance'].fillna(0).sum()
+    return np.full(len(grid), float(balances))
+
+def value_days(grid: np.ndarray, today: Optional[np.datetime64] = None) -> Dict[str, np.ndarray]:
+    """Every component and the net worth for each day of a date grid, from local data only."""
+    today = today if today is not None else _today()
+    columns = {
+        'stocks': _market_value('stocks', grid, today),
+        'mutual_funds': _market_value('mutual_funds', grid, today),
+        'savings': _savings_value(grid),
+        'other_investments': _other_investments_value(grid),
+        'loans': _loans_value(grid, today),
+        'credit_cards': _credit_cards_value(grid)
+    }
+    columns['net_worth'] = (sum(columns[column] for column in ASSET_COLUMNS) -
+                            sum(columns[column] for column in LIABILITY_COLUMNS))
+    return columns
+
+def _held_codes() -> Dict[str, List[str]]:
+    stocks = load_holdings('stocks')['NSE_Symbol']
+    schemes = load_holdings('mutual_funds')['SchemeCode']
+    return {'stocks': sorted(set(stocks[stocks != ''])), 'mutual_funds': sorted(set(schemes[schemes != '']))}
+
+def _history_dirs() -> Dict[str, str]:
+    return {'stocks': os.path.join(quote_cache.CACHE_DIR, 'price_history'),
+            'mutual_funds': os.path.join(quote_cache.CACHE_DIR, 'nav_history')}
+
+def _final_through(codes: Dict[str, List[str]], today: np.datetime64) -> np.datetime64:
+    """Last day whose row will not change any more."""
+    final = today - 1
+    for asset, asset_codes in codes.items():
+        for code in asset_codes:
+            info = get_series_info(_history_dirs()[asset], code)
+            last = np.datetime64(info['last'], 'D') if info and info.get('last') else None
+            final = min(final, last) if last is not None else final
+    return max(final, today - MAX_PROVISIONAL_DAYS)
+
+def load_net_worth() -> Optional[Dict[str, np.ndarray]]:
+    """The stored series as arrays ('dates', each component, 'net_worth'), or None if not built yet.
+
+    Loaded once per file version, so repeated renders cost a stat call.
+    """
+    path = _snapshot_path()
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        with np.load(path, allow_pickle=False) as data:
+            series = {name: data[name] for name in data.files}
+        _loaded[path] = (mtime_ns, series)
+        return series
+
+def _save(series: Dict[str, np.ndarray]) -> None:
+    """Atomically replace the snapshot."""
+    path = _snapshot_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, **series)
+    os.replace(path + '.tmp', path)
+
+def _first_change(existing: Dict[str, np.ndarray]) -> Tuple[int, int, Optional[np.datetime64]]:
+    """Newest ledger event and savings transaction ids, and the earliest date recorded since `existing`."""
+    ledger_through, ledger_date = ledger.changes_since(int(existing['ledger_through']))
+    savings_through, savings_date = savings_store.changes_since(int(existing['savings_through']))
+    dates = [_to_date(date) for date in (ledger_date, savings_date) if date]
+    dates = [date for date in dates if date is not None]
+    return ledger_through, savings_through, min(dates) if dates else None
+
+def _unchanged(existing: Dict[str, np.ndarray], rows: Dict[str, np.ndarray]) -> bool:
+    return existing.keys() == rows.keys() and all(np.array_equal(existing[name], rows[name]) for name in rows)
+
+def update_net_worth(force: bool = False) -> int:
+    """Bring the net-worth series up to today.
+
+    Refreshes the held price/NAV histories (at most once per market session
+    each), then values only the days after the last final row, or from the
+    earliest date of any ledger event or savings transaction recorded since
+    the last update. The snapshot is not rewritten when no row changed. The
+    series is built from scratch the first time or with force=True.
+    Returns the number of rows revalued (0 when nothing changed).
+    """
+    today = _today()
+    codes = _held_codes()
+    with request_deadline(UPDATE_DEADLINE):
+        for symbol in codes['stocks']:
+            update_price_history(symbol)
+        for scheme_code in codes['mutual_funds']:
+            update_nav_history(scheme_code)
+
+    existing = None if force else load_net_worth()
+    if existing is not None and 'ledger_through' in existing:
+        ledger_through, savings_through, changed = _first_change(existing)
+        start = existing['final_through'][()] + 1
+        if changed is not None:
+            start = max(min(start, changed), existing['dates'][0])
+        keep = existing['dates'] < start
+    else:
+        ledger_through, _ = ledger.changes_since()
+        savings_through, _ = savings_store.changes_since()
+        keep = None
+        start = today - NET_WORTH_HISTORY_DAYS
+    if start > today:
+        return 0
+
+    grid = np.arange(start, today + 1, dtype='datetime64[D]')
+    rows = value_days(grid, today)
+    rows['dates'] = grid
+    if keep is not None:
+        rows = {name: np.concatenate([existing[name][keep], values]) for name, values in rows.items()}
+    rows['final_through'] = np.array(_final_through(codes, today))
+    rows['ledger_through'] = np.array(ledger_through)
+    rows['savings_through'] = np.array(savings_through)
+    if existing is not None and _unchanged(existing, rows):
+        return 0
+    _save(rows)
+    return len(grid)
@@ -1,111 +1,170 @@
+import os
+import time
+from datetime import datetime
+import numpy as np
 import pandas as pd
 from typing import Dict
-import yfinance as yf
-import time
-import requests
-import json
+from utils import quote_cache
+from utils.quote_engine import fetch_chart_price, fetch_chart_history, fetch_live_quotes, fetch_ticker_info, get_live_prices as fetch_batch_prices
+from utils.quote_cache import get_quote, get_quotes, put_quote, put_quotes, stock_key, previous_close_key, get_cache_stats, MF_NAV_TTL
+from utils.timeseries_store import append_series, read_series, get_last_date, get_series_info, set_series_fields
+from utils.single_flight import single_flight
+from utils.http_client import request_deadline
+from utils.last_known_good import resolve_values
+from utils.symbol_master import get_company_name, KNOWN_COMPANY_NAMES
+from utils.ledger import load_positions, get_realized_pnl
+from utils.holdings_store import holding_key
+from utils.returns import holding_returns, asset_returns, current_values, as_percent
+
+# Upper bound (seconds) on the upstream calls made while loading a portfolio
+LOAD_DEADLINE = 20
 
+# How far back the first download of a symbol's daily closes goes
+PRICE_HISTORY_DAYS = 5 * 366
+
+@single_flight
 def get_live_price(symbol: str) -> float:
     """Get live market price for a given NSE stock symbol using direct Yahoo Finance API."""
-    try:
-        # Direct Yahoo Finance API approach
-        url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}.NS"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers)
-        data = json.loads(response.text)
-        
-        # Extract the last closing price
-        if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
-            result = data['chart']['result'][0]
-            if 'meta' in result and 'regularMarketPrice' in result['meta']:
-                price = result['meta']['regularMarketPrice']
-                return float(price)
-        
-        # If no price found through API, use dummy data directly
+    cached = get_quote(stock_key(symbol))
+    if cached is not None:
+        return cached
+    
+    price = fetch_chart_price(symbol)
+    put_quote(stock_key(symbol), price)
+    return price
+
+@single_flight
+def get_live_prices(symbols) -> Dict[str, float]:
+    """Get live market prices for many NSE symbols using batched Yahoo Finance requests."""
+    symbols = list(dict.fromkeys(symbols))
+    
+    # Serve what we can from the quote cache and only fetch the rest
+    cached = get_quotes(stock_key(symbol) for symbol in symbols)
+    prices = {symbol: cached[stock_key(symbol)] for symbol in symbols if stock_key(symbol) in cached}
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    
+    if missing:
+        fetched = fetch_batch_prices(missing)
+        put_quotes({stock_key(symbol): price for symbol, price in fetched.items()})
+        prices.update(fetched)
+    
+    return prices
+
+@single_flight
+def get_price_changes(symbols, fetch: bool = True) -> Dict[str, tuple]:
+    """(last price, previous close) of NSE symbols, for day-change figures.
+
+    Symbols whose quote is still valid in the quote cache (within the quote TTL,
+    or any time the market is closed) are not fetched again; the rest are
+    fetched concurrently from the Yahoo chart endpoint unless `fetch` is off.
+    Symbols without both values are left out.
+    """
+    symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol]
+    cached = get_quotes([stock_key(symbol) for symbol in symbols] +
+                        [previous_close_key(symbol) for symbol in symbols])
+    changes = {symbol: (cached[stock_key(symbol)], cached[previous_close_key(symbol)]) for symbol in symbols
+               if stock_key(symbol) in cached and previous_close_key(symbol) in cached}
+    missing = [symbol for symbol in symbols if symbol not in changes]
+    
+    if fetch and missing:
+        with request_deadline(LOAD_DEADLINE):
+            quotes = fetch_live_quotes(missing)
+        fetched = {symbol: quote for symbol, quote in quotes.items() if quote[0] and quote[1]}
+        put_quotes({key: value for symbol, (price, previous_close) in fetched.items()
+                    for key, value in ((stock_key(symbol), price), (previous_close_key(symbol), previous_close))})
+        changes.update(fetched)
+    
+    return changes
+
+def _price_history_dir() -> str:
+    return os.path.join(quote_cache.CACHE_DIR, 'price_history')
+
+def update_price_history(symbol: str) -> int:
+    """Append daily closes since the last stored date to the local history store.
+
+    Only completed sessions are stored (today's price is a live quote). The first
+    call for a symbol stores PRICE_HISTORY_DAYS of history; later calls only
+    request dates after the last stored one, at most once per market session.
+    Returns the number of new rows.
+    """
+    symbol = str(symbol).strip().upper()
+    directory = _price_history_dir()
+    
+    # Skip the network entirely if this symbol was already checked this session
+    info = get_series_info(directory, symbol)
+    if info and info.get('checked_at'):
+        checked_at = datetime.fromtimestamp(info['checked_at'], quote_cache.IST)
+        if quote_cache.compute_expiry(MF_NAV_TTL, checked_at) > time.time():
+            return 0
+    
+    today = np.datetime64(datetime.now(quote_cache.IST).date(), 'D')
+    last_date = get_last_date(directory, symbol)
+    start = today - PRICE_HISTORY_DAYS if last_date is None else last_date + 1
+    if start >= today:
         return 0
-            
-    except Exception as e:
-        print(f"Error fetching price for {symbol}: {str(e)}")
+    
+    history = fetch_chart_history(symbol, start, today - 1)
+    if history is None:
         return 0
+    
+    dates, closes = history
+    completed = dates < today
+    added = append_series(directory, symbol, dates[completed], closes[completed])
+    set_series_fields(directory, symbol, checked_at=time.time())
+    return added
 
-def use_dummy_data_for_testing():
-    """Create dummy prices for testing - only used if API calls fail."""
-    # Map of dummy prices based on the last available AveragePrice
-    return {
-        'GAIL': 190.50,
-        'MOTHERSON': 140.25,
-        'NTPC': 352.75,
-        'RPOWER': 42.30,
-        'ADANIGREEN': 910.20,
-        'INDIANREN': 170.45,
-        'SUZLON': 60.80,
-        'OBEROIRLTY': 1650.30,
-        'TATAMOTORS': 700.90,
-        'MAHLIFE': 360.40,
-        'DLF': 695.75,
-        'TATASTEEL': 155.20,
-        'SHRIRAMPPS': 90.50,
-        'VIKASECO': 2.75,
-        'BLS': 430.60,
-        'JYOTISTRUC': 25.30,
-        'MOTILALOFS': 200.45,
-        'BEL': 290.25,
-        'IDFCFIRSTB': 62.30,
-        'NHPC': 80.40,
-        'L&TFH': 155.25,
-        'SBIN': 750.40,
-        'NCC': 205.30,
-        'BANDHANBNK': 160.45,
-        'BANKINDIA': 110.25,
-        'IEX': 185.60,
-        'ASHOKLEY': 220.40,
-        'APOLLOTYRE': 440.25,
-        'JIOFIN': 250.75,
-        'JKTYRE': 300.40,
-        'PNB': 100.25,
-        'IDBI': 82.30,
-        'TATAPOWER': 385.45,
-        'ITC': 420.30,
-        'REDINGTON': 245.70
-    }
+def get_price_history_last_date(symbol: str):
+    """Date of the last stored close of a symbol (None if none is stored)."""
+    return get_last_date(_price_history_dir(), str(symbol).strip().upper())
 
+def get_price_history(symbol: str, start_date=None, end_date=None, update: bool = True) -> pd.DataFrame:
+    """Get the stored daily closes of a symbol between two dates (inclusive)."""
+    if update:
+        update_price_history(symbol)
+    
+    dates, closes = read_series(_price_history_dir(), str(symbol).strip().upper(), start_date, end_date)
+    return pd.DataFrame({'Date': pd.to_datetime(dates), 'Close': closes})
+
+@single_flight
 def load_portfolio_data() -> pd.DataFrame:
-    """Load and process portfolio data from CSV."""
-    # Read the portfolio data
-    df = pd.read_csv('assets/PersonalFiles/myPortfolio.csv')
-    
-    # Get dummy data ready for any stocks that fail
-    dummy_prices = use_dummy_data_for_testing()
-    
-    # Try to get live prices with fallback to dummy data
-    prices = {}
-    for symbol in df['NSE_Symbol'].unique():
-        # Try to get the price
-        price = get_live_price(symbol)
-        
-        # If price fetch failed, use dummy data without retrying
-        if price == 0:
-            price = dummy_prices.get(symbol, 0)
-            print(f"Using dummy price for {symbol}: {price}")
-            
-        prices[symbol] = price
-        time.sleep(0.5)  # Add delay between requests to avoid rate limiting
+    """Load and process portfolio data from the ledger's open positions."""
+    # Imported rows without a known NSE symbol have a blank one
+    df = load_positions('stocks')
+    
+    # Fetch all live prices in batches
+    symbols = df['NSE_Symbol'].unique()
+    with request_deadline(LOAD_DEADLINE):
+        prices = get_live_prices([symbol for symbol in symbols if symbol])
+    
+    stats = get_cache_stats()
+    print(f"Quote cache: {stats['hits']} hits, {stats['misses']} misses")
+    
+    # Anything Yahoo could not price falls back to its last known real price
+    resolved = resolve_values({stock_key(symbol): prices.get(symbol, 0) for symbol in symbols}, 'Yahoo')
+    keys = df['NSE_Symbol'].map(stock_key)
     
     # Add price data to dataframe
-    df['Current Price'] = df['NSE_Symbol'].map(prices)
+    df['Current Price'] = keys.map(lambda key: resolved[key]['value'])
+    df['Price Source'] = keys.map(lambda key: resolved[key]['provenance'])
+    df['Price Age'] = keys.map(lambda key: resolved[key]['age'])
     
     # Calculate investment metrics
     df['TotalInvestment'] = df['SharesOwned'] * df['AveragePrice']
     df['Current Value'] = df['SharesOwned'] * df['Current Price']
     df['Profit/Loss'] = df['Current Value'] - df['TotalInvestment']
     df['Returns %'] = ((df['Current Value'] - df['TotalInvestment']) / df['TotalInvestment'] * 100).round(2)
+    df['Realized P&L'] = df['RealizedPnL']
+    
+    # Money- and time-weighted returns from each holding's ledger events
+    returns = holding_returns('stocks', [holding_key('stocks', record) for record in df.to_dict('records')],
+                              df['Current Value'].values, df['Current Price'].values)
+    df['XIRR %'] = (returns['xirr'].values * 100).round(2)
+    df['TWR %'] = (returns['twr'].values * 100).round(2)
     
-    # Drop NSE_Symbol column and reorder columns
+    # Reorder columns (NSE_Symbol is kept for the returns summary, not shown)
     columns = ['Stock', 'SharesOwned', 'AveragePrice', 'Current Price', 'TotalInvestment', 
-              'Current Value', 'Profit/Loss', 'Returns %']
+              'Current Value', 'Profit/Loss', 'Returns %', 'XIRR %', 'TWR %', 'Realized P&L',
+              'Price Source', 'Price Age', 'NSE_Symbol']
     result_df = df[columns].copy()
     
     return result_df
@@ -124,45 +183,36 @@ def get_portfolio_summary(df: pd.DataFrame) -> Dict:
     performing_stocks_value = df[df['Returns %'] > 0]['Current Value'].sum()
     percent_in_performing = ((performing_stocks_value / current_value) * 100).round(2) if current_value > 0 else 0.0
     
+    # Annualized returns of the whole stock portfolio (None when there is no history for them)
+    returns = asset_returns({'stocks': current_values('stocks', df)})['stocks']
+    
     return {
         'total_investment': total_investment,
         'current_value': current_value,
         'total_returns': total_returns,
+        # Includes positions that have since been sold off
+        'realized_pnl': get_realized_pnl('stocks'),
         'num_stocks': num_stocks,
         'profitable_stocks': profitable_stocks,
-        'percent_in_performing': percent_in_performing
+        'percent_in_performing': percent_in_performing,
+        'xirr': as_percent(returns['xirr']),
+        'twr': as_percent(returns['twr'])
     }
 
 def get_stock_name_from_symbol(symbol: str) -> str:
-    """Get the full stock name from NSE symbol using Yahoo Finance."""
-    # Custom mapping for common Indian stocks
-    custom_name_mapping = {
-        'SBIN': 'State Bank Of India',
-        'HDFC': 'HDFC Bank Ltd',
-        'ICICIBANK': 'ICICI Bank Ltd',
-        'INFY': 'Infosys Ltd',
-        'TATAMOTORS': 'Tata Motors Ltd',
-        'IREDA': 'Indian Renewable Energy Development Agency',
-        'IEX': 'Indian Energy Exchange',
-        'NHPC': 'NHPC Ltd',
-        'NTPC': 'NTPC Ltd',
-        'BEL': 'Bharat Electronics Ltd',
-        'GAIL': 'GAIL (India) Ltd',
-        'LTF': 'L&T Finance Ltd',
-        'ITC': 'ITC Ltd',
-        'PNB': 'Punjab National Bank',
-        'IDBI': 'IDBI Bank Ltd',
-    }
+    """Get the full stock name from NSE symbol using the NSE symbol master, then Yahoo Finance."""
+    # Listed symbols are answered from the local NSE equity master
+    company_name = get_company_name(symbol)
+    if company_name:
+        return company_name
     
-    # Check if symbol exists in our custom mapping
-    if symbol in custom_name_mapping:
-        return custom_name_mapping[symbol]
+    # Common stocks are known without the master file
+    if symbol in KNOWN_COMPANY_NAMES:
+        return KNOWN_COMPANY_NAMES[symbol]
     
-    # If not in custom mapping, try Yahoo Finance
+    # Otherwise try Yahoo Finance
     try:
-        # Append .NS for NSE symbols
-        ticker = yf.Ticker(f"{symbol}.NS")
-        info = ticker.info
+        info = fetch_ticker_info(symbol)
         
         # Get the long name or short name
         stock_name = info.get('longName', info.get('shortName', ''))
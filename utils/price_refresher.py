@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import namedtuple
+from typing import Optional
+from utils.portfolio_utils import load_portfolio_data
+from utils.mutual_fund_utils import load_mf_portfolio_data
+from utils.net_worth import update_net_worth
+
+# Seconds between background revaluations of the stock and mutual fund portfolios
+REFRESH_INTERVAL = 60
+
+# A published snapshot is never modified; each refresh publishes a new one with a
+# higher version. The DataFrames inside must be treated as read-only by callers.
+PortfolioSnapshot = namedtuple(
+    'PortfolioSnapshot',
+    ['version', 'created_at', 'stocks', 'mutual_funds', 'errors']
+)
+
+_snapshot = None
+_thread = None
+_wake = threading.Event()
+_lock = threading.Lock()
+
+def _revalue(previous: Optional[PortfolioSnapshot]) -> PortfolioSnapshot:
+    """Load fresh valuations, keeping the previous frame for anything that fails."""
+    errors = {}
+    stocks = previous.stocks if previous else None
+    mutual_funds = previous.mutual_funds if previous else None
+
+    try:
+        stocks = load_portfolio_data()
+    except Exception as e:
+        print(f"Error refreshing stock prices: {str(e)}")
+        errors['stocks'] = str(e)
+
+    try:
+        mutual_funds = load_mf_portfolio_data()
+    except Exception as e:
+        print(f"Error refreshing mutual fund NAVs: {str(e)}")
+        errors['mutual_funds'] = str(e)
+
+    # Extend the daily net-worth series (only the days since its last final row are valued)
+    try:
+        update_net_worth()
+    except Exception as e:
+        print(f"Error updating net worth: {str(e)}")
+        errors['net_worth'] = str(e)
+
+    version = previous.version + 1 if previous else 1
+    return PortfolioSnapshot(version, time.time(), stocks, mutual_funds, errors)
+
+def _run(interval: float) -> None:
+    """Worker loop: revalue, publish, then sleep until the interval passes or a refresh is requested."""
+    global _snapshot
+    while True:
+        _wake.clear()
+        snapshot = _revalue(_snapshot)
+        with _lock:
+            _snapshot = snapshot
+        _wake.wait(interval)
+
+def start_refresher(interval: float = REFRESH_INTERVAL) -> None:
+    """Start the background refresher thread if it is not already running."""
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, args=(interval,), daemon=True,
+                                       name='price-refresher')
+            _thread.start()
+
+def get_snapshot() -> Optional[PortfolioSnapshot]:
+    """Return the latest published snapshot (None until the first one is ready).
+
+    Starts the refresher on first use, so nothing is fetched at import time.
+    """
+    start_refresher()
+    with _lock:
+        return _snapshot
+
+def request_refresh() -> None:
+    """Ask the refresher to revalue now instead of waiting for the next interval."""
+    start_refresher()
+    _wake.set()
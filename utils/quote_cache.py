@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+# Cache files live next to the personal data unless WALLET_CACHE_DIR says otherwise
+CACHE_DIR = os.environ.get('WALLET_CACHE_DIR', os.path.join('assets', 'PersonalFiles', 'cache'))
+QUOTE_CACHE_FILE = 'quotes.json'
+
+# NSE trades 09:15-15:30 IST, Monday to Friday
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_OPEN = (9, 15)
+MARKET_CLOSE = (15, 30)
+
+# Time-to-live while the market is open, in seconds
+STOCK_QUOTE_TTL = 60
+MF_NAV_TTL = 60 * 60
+
+_entries = None
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+def set_cache_dir(path: str) -> None:
+    """Point the quote cache at a different directory (drops the in-memory copy)."""
+    global CACHE_DIR, _entries
+    with _lock:
+        CACHE_DIR = path
+        _entries = None
+
+def stock_key(symbol: str) -> str:
+    """Cache key for an NSE stock quote."""
+    return f"NSE:{symbol}"
+
+def previous_close_key(symbol: str) -> str:
+    """Cache key for the previous session's close of an NSE stock."""
+    return f"NSE-PREV:{symbol}"
+
+def mf_key(scheme_code) -> str:
+    """Cache key for a mutual fund NAV."""
+    return f"MF:{scheme_code}"
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """Check whether NSE is in its regular trading session."""
+    now = (now or datetime.now(IST)).astimezone(IST)
+    if now.weekday() >= 5:
+        return False
+    session_open = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    session_close = now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0)
+    return session_open <= now < session_close
+
+def next_market_open(now: Optional[datetime] = None) -> datetime:
+    """Return the start of the next NSE trading session after `now`."""
+    now = (now or datetime.now(IST)).astimezone(IST)
+    candidate = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+def compute_expiry(ttl: float, now: Optional[datetime] = None) -> float:
+    """Expiry timestamp for an entry: `ttl` seconds in session, else the next session open."""
+    now = (now or datetime.now(IST)).astimezone(IST)
+    if is_market_open(now):
+        return now.timestamp() + ttl
+    return next_market_open(now).timestamp()
+
+def _cache_path() -> str:
+    return os.path.join(CACHE_DIR, QUOTE_CACHE_FILE)
+
+def _load_entries() -> Dict:
+    """Load the cache file once per process; caller must hold the lock."""
+    global _entries
+    if _entries is None:
+        try:
+            with open(_cache_path(), 'r') as f:
+                _entries = json.load(f)
+        except (OSError, ValueError):
+            _entries = {}
+    return _entries
+
+def _save_entries() -> None:
+    """Atomically write the cache file; caller must hold the lock."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = _cache_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(_entries, f)
+        os.replace(tmp_path, _cache_path())
+    except OSError as e:
+        print(f"Error saving quote cache: {str(e)}")
+
+def get_quote(key: str) -> Optional[float]:
+    """Return a cached value if it has not expired, counting the read as a hit or miss."""
+    with _lock:
+        entry = _load_entries().get(key)
+        if entry is not None and entry['expires_at'] > time.time():
+            _stats['hits'] += 1
+            return entry['value']
+        _stats['misses'] += 1
+        return None
+
+def get_quotes(keys: Iterable[str]) -> Dict[str, float]:
+    """Return the unexpired subset of `keys`, counting each read as a hit or miss."""
+    found = {}
+    now = time.time()
+    with _lock:
+        entries = _load_entries()
+        for key in keys:
+            entry = entries.get(key)
+            if entry is not None and entry['expires_at'] > now:
+                _stats['hits'] += 1
+                found[key] = entry['value']
+            else:
+                _stats['misses'] += 1
+    return found
+
+def put_quotes(values: Dict[str, float], ttl: float = STOCK_QUOTE_TTL) -> None:
+    """Store fresh values and persist the cache. Zero (failed) values are not cached."""
+    values = {key: value for key, value in values.items() if value}
+    if not values:
+        return
+    fetched_at = time.time()
+    expires_at = compute_expiry(ttl)
+    with _lock:
+        entries = _load_entries()
+        for key, value in values.items():
+            entries[key] = {'value': value, 'fetched_at': fetched_at, 'expires_at': expires_at}
+        _save_entries()
+
+def put_quote(key: str, value: float, ttl: float = STOCK_QUOTE_TTL) -> None:
+    """Store a single fresh value."""
+    put_quotes({key: value}, ttl)
+
+def get_cache_stats() -> Dict[str, int]:
+    """Return hit/miss counters for this process."""
+    with _lock:
+        return dict(_stats)
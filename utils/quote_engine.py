@@ -0,0 +1,214 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from utils.http_client import get_json, get_deadline, DEFAULT_TIMEOUT, POOL_SIZE
+from utils import circuit_breaker, rate_limiter
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}.NS"
+YAHOO_HISTORY_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v7/finance/spark"
+YAHOO_SEARCH_URL = "https://query1.finance.yahoo.com/v1/finance/search"
+YAHOO_HOST = "query1.finance.yahoo.com"
+
+# Yahoo's spark endpoint accepts at most 20 symbols per request
+BATCH_SIZE = 20
+
+# Upper bound on simultaneous requests to Yahoo; never more than the connection pool
+MAX_CONCURRENT_REQUESTS = 8
+
+def fetch_chart_quote(symbol: str, timeout=DEFAULT_TIMEOUT) -> Tuple[float, float]:
+    """Fetch (last price, previous close) of one NSE symbol from the Yahoo chart endpoint.
+
+    Either is 0 when Yahoo did not return it.
+    """
+    try:
+        data = get_json(YAHOO_CHART_URL.format(symbol=symbol), timeout=timeout)
+
+        # Extract the last traded price and the previous session's close
+        if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
+            meta = data['chart']['result'][0].get('meta') or {}
+            previous_close = meta.get('previousClose') or meta.get('chartPreviousClose') or 0
+            return float(meta.get('regularMarketPrice') or 0), float(previous_close)
+
+        return 0, 0
+
+    except Exception as e:
+        print(f"Error fetching price for {symbol}: {str(e)}")
+        return 0, 0
+
+def fetch_chart_price(symbol: str, timeout=DEFAULT_TIMEOUT) -> float:
+    """Fetch the live market price of one NSE symbol from the Yahoo chart endpoint."""
+    return fetch_chart_quote(symbol, timeout)[0]
+
+def yahoo_ticker(symbol: str) -> str:
+    """Yahoo ticker of an NSE symbol; index symbols (e.g. ^NSEI) are used as they are."""
+    return symbol if symbol.startswith('^') else f"{symbol}.NS"
+
+def fetch_chart_history(symbol: str, start_date=None, end_date=None,
+                        timeout=DEFAULT_TIMEOUT) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Fetch daily closes of an NSE symbol or index between two dates (inclusive).
+
+    Returns (dates, closes) oldest first, without days Yahoo has no close for,
+    or None if the request failed.
+    """
+    start = np.datetime64(start_date or '1990-01-01', 'D')
+    end = np.datetime64(end_date, 'D') if end_date is not None else np.datetime64('today', 'D')
+    params = {
+        'period1': int((start - np.datetime64('1970-01-01', 'D')) / np.timedelta64(1, 's')),
+        'period2': int((end + 1 - np.datetime64('1970-01-01', 'D')) / np.timedelta64(1, 's')),
+        'interval': '1d'
+    }
+    try:
+        data = get_json(YAHOO_HISTORY_URL.format(ticker=yahoo_ticker(symbol)), params=params, timeout=timeout)
+        result = (data.get('chart', {}).get('result') or [None])[0]
+        if not result or not result.get('timestamp'):
+            return np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64)
+
+        # Bars are stamped at the session open, which is the same day in UTC and IST
+        dates = np.array(result['timestamp'], dtype='datetime64[s]').astype('datetime64[D]')
+        closes = np.array([np.nan if close is None else close
+                           for close in result['indicators']['quote'][0]['close']], dtype=np.float64)
+        valid = ~np.isnan(closes)
+        return dates[valid], closes[valid]
+
+    except Exception as e:
+        print(f"Error fetching price history for {symbol}: {str(e)}")
+        return None
+
+def _fetch_concurrently(fetch, symbols: Iterable[str], max_workers: int, timeout) -> Dict:
+    """Run fetch(symbol, timeout) for every distinct symbol over the shared connection pool."""
+    unique_symbols = list(dict.fromkeys(symbols))
+    if not unique_symbols:
+        return {}
+
+    workers = max(1, min(max_workers, POOL_SIZE, len(unique_symbols)))
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Each task runs in a copy of the caller's context so request deadlines carry over
+        futures = {executor.submit(contextvars.copy_context().run, fetch, symbol, timeout): symbol
+                   for symbol in unique_symbols}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    return results
+
+def fetch_live_prices(symbols: Iterable[str], max_workers: int = MAX_CONCURRENT_REQUESTS,
+                      timeout=DEFAULT_TIMEOUT) -> Dict[str, float]:
+    """Fetch live prices for many NSE symbols concurrently over the shared connection pool.
+
+    Returns a map of symbol to price; symbols that could not be priced map to 0.
+    """
+    return _fetch_concurrently(fetch_chart_price, symbols, max_workers, timeout)
+
+def fetch_live_quotes(symbols: Iterable[str], max_workers: int = MAX_CONCURRENT_REQUESTS,
+                      timeout=DEFAULT_TIMEOUT) -> Dict[str, Tuple[float, float]]:
+    """Fetch (last price, previous close) for many NSE symbols concurrently.
+
+    Symbols that could not be quoted map to (0, 0).
+    """
+    return _fetch_concurrently(fetch_chart_quote, symbols, max_workers, timeout)
+
+def search_nse_symbol(query: str, timeout=DEFAULT_TIMEOUT) -> str:
+    """NSE symbol of the first NSE listing Yahoo's search finds for an ISIN or company name ('' if none)."""
+    try:
+        data = get_json(YAHOO_SEARCH_URL, params={'q': query, 'quotesCount': 10, 'newsCount': 0},
+                        timeout=timeout)
+        for quote in data.get('quotes') or []:
+            symbol = str(quote.get('symbol') or '')
+            if symbol.endswith('.NS'):
+                return symbol[:-len('.NS')]
+        return ''
+
+    except Exception as e:
+        print(f"Error searching NSE symbol for {query}: {str(e)}")
+        return ''
+
+def search_nse_symbols(queries: Iterable[str], max_workers: int = MAX_CONCURRENT_REQUESTS,
+                       timeout=DEFAULT_TIMEOUT) -> Dict[str, str]:
+    """Run search_nse_symbol for many ISINs/names concurrently; unmatched queries map to ''."""
+    return _fetch_concurrently(search_nse_symbol, queries, max_workers, timeout)
+
+def fetch_ticker_info(symbol: str) -> Dict:
+    """Fetch yfinance's info dict for an NSE symbol, paced by the 'yfinance' rate limiter."""
+    # Imported lazily: yfinance takes ~0.5s to import and is rarely needed
+    import yfinance as yf
+
+    circuit_breaker.check('yfinance')
+    try:
+        rate_limiter.acquire('yfinance', get_deadline())
+    except BaseException:
+        circuit_breaker.release_trial('yfinance')
+        raise
+    try:
+        info = yf.Ticker(f"{symbol}.NS").info
+    except BaseException as e:
+        if '429' in str(e) or 'Too Many Requests' in str(e):
+            rate_limiter.record_throttle('yfinance')
+        circuit_breaker.record_failure('yfinance')
+        raise
+    rate_limiter.record_success('yfinance')
+    circuit_breaker.record_success('yfinance')
+    return info
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    """Split a list into consecutive chunks of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def fetch_spark_prices(symbols: List[str], timeout=DEFAULT_TIMEOUT) -> Dict[str, float]:
+    """Fetch live prices for up to BATCH_SIZE NSE symbols in a single spark request.
+
+    Only symbols that came back with a price are included in the result.
+    """
+    params = {
+        'symbols': ','.join(f"{symbol}.NS" for symbol in symbols),
+        'range': '1d',
+        'interval': '1d'
+    }
+    data = get_json(YAHOO_SPARK_URL, params=params, timeout=timeout)
+
+    prices = {}
+    for item in (data.get('spark') or {}).get('result') or []:
+        symbol = str(item.get('symbol', ''))
+        if symbol.endswith('.NS'):
+            symbol = symbol[:-3]
+        response = item.get('response') or []
+        if symbol in symbols and response:
+            price = (response[0].get('meta') or {}).get('regularMarketPrice')
+            if price:
+                prices[symbol] = float(price)
+    return prices
+
+def get_live_prices(symbols: Iterable[str], batch_size: int = BATCH_SIZE,
+                    max_workers: int = MAX_CONCURRENT_REQUESTS,
+                    timeout=DEFAULT_TIMEOUT) -> Dict[str, float]:
+    """Price many NSE symbols with as few upstream requests as possible.
+
+    Symbols are packed into spark requests of `batch_size`, which run concurrently.
+    Symbols missing from a batch response (or whose whole batch failed) are retried
+    one at a time on the chart endpoint, unless Yahoo's circuit has tripped in the
+    meantime; anything still unpriced is left out of the result.
+    """
+    unique_symbols = list(dict.fromkeys(symbols))
+    if not unique_symbols:
+        return {}
+
+    batches = _chunks(unique_symbols, max(1, batch_size))
+    prices = {}
+    workers = max(1, min(max_workers, POOL_SIZE, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(contextvars.copy_context().run, fetch_spark_prices, batch, timeout): batch
+                   for batch in batches}
+        for future in as_completed(futures):
+            try:
+                prices.update(future.result())
+            except Exception as e:
+                print(f"Error fetching batch of {len(futures[future])} prices: {str(e)}")
+
+    # Map partial failures back to single-symbol requests
+    missing = [symbol for symbol in unique_symbols if symbol not in prices]
+    if missing and circuit_breaker.get_state(YAHOO_HOST) != circuit_breaker.OPEN:
+        fallback = fetch_live_prices(missing, max_workers=max_workers, timeout=timeout)
+        prices.update({symbol: price for symbol, price in fallback.items() if price})
+
+    return prices
@@ -0,0 +1,90 @@
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+# Per-host request rates (requests/second): starting rate, floor and ceiling.
+# Rates grow additively while requests succeed and halve on every 429/5xx.
+HOST_LIMITS = {
+    'query1.finance.yahoo.com': {'rate': 5.0, 'min_rate': 0.5, 'max_rate': 20.0},
+    'api.mfapi.in': {'rate': 4.0, 'min_rate': 0.5, 'max_rate': 10.0},
+    'yfinance': {'rate': 2.0, 'min_rate': 0.2, 'max_rate': 5.0},
+}
+DEFAULT_LIMITS = {'rate': 4.0, 'min_rate': 0.5, 'max_rate': 10.0}
+
+RATE_INCREASE = 0.5
+RATE_DECREASE_FACTOR = 0.5
+
+# Exponential backoff after throttling: base * 2**attempt seconds, capped, with full jitter
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+# Slack for float residue in the token count, and the shortest wait between checks,
+# so a bucket a hair below one token cannot spin acquire() in a busy loop
+TOKEN_EPSILON = 1e-9
+MIN_WAIT = 0.001
+
+_buckets = {}
+_lock = threading.Lock()
+
+def _bucket(host: str) -> Dict:
+    """Return the token bucket for a host, creating it on first use; caller holds the lock."""
+    bucket = _buckets.get(host)
+    if bucket is None:
+        limits = HOST_LIMITS.get(host, DEFAULT_LIMITS)
+        bucket = dict(limits, tokens=1.0, updated=time.time(), blocked_until=0.0)
+        _buckets[host] = bucket
+    return bucket
+
+def acquire(host: str, deadline: Optional[float] = None) -> None:
+    """Block until a request to `host` is allowed.
+
+    Raises TimeoutError if the wait would run past `deadline` (a time.time() value).
+    """
+    while True:
+        with _lock:
+            bucket = _bucket(host)
+            now = time.time()
+            capacity = max(1.0, bucket['rate'])
+            bucket['tokens'] = min(capacity, bucket['tokens'] + (now - bucket['updated']) * bucket['rate'])
+            bucket['updated'] = now
+
+            wait = bucket['blocked_until'] - now
+            if wait <= 0:
+                if bucket['tokens'] >= 1 - TOKEN_EPSILON:
+                    bucket['tokens'] = max(0.0, bucket['tokens'] - 1)
+                    return
+                wait = max(MIN_WAIT, (1 - bucket['tokens']) / bucket['rate'])
+
+        if deadline is not None and now + wait > deadline:
+            raise TimeoutError(f"Deadline reached waiting for a request slot on {host}")
+        time.sleep(wait)
+
+def record_success(host: str) -> None:
+    """Raise the host's rate after a successful request."""
+    with _lock:
+        bucket = _bucket(host)
+        bucket['rate'] = min(bucket['max_rate'], bucket['rate'] + RATE_INCREASE)
+
+def record_throttle(host: str, attempt: int = 0, retry_after: Optional[float] = None) -> float:
+    """Cut the host's rate after a 429/5xx and pause it. Returns the pause in seconds.
+
+    The pause honours Retry-After when the server sent one, otherwise it is a
+    jittered exponential backoff for the given retry attempt.
+    """
+    delay = retry_after if retry_after is not None else backoff_delay(attempt)
+    with _lock:
+        bucket = _bucket(host)
+        bucket['rate'] = max(bucket['min_rate'], bucket['rate'] * RATE_DECREASE_FACTOR)
+        bucket['tokens'] = 0.0
+        bucket['blocked_until'] = max(bucket['blocked_until'], time.time() + delay)
+    return delay
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for a retry attempt (0-based)."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+def get_rate(host: str) -> float:
+    """Current allowed request rate for a host."""
+    with _lock:
+        return _bucket(host)['rate']
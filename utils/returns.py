@@ -0,0 +1,260 @@
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from utils.holdings_store import holding_key
+from utils.ledger import EVENT_DIRECTIONS, get_ledger
+from utils.quote_cache import IST
+
+# Money-weighted (XIRR) and time-weighted (TWR) returns, solved for every group
+# of cash flows at once. Flows are flat numpy arrays with a group id per flow;
+# each solver iteration is a handful of array operations plus np.bincount over
+# all flows, so thousands of flows across hundreds of holdings cost a few ms.
+
+DAYS_PER_YEAR = 365.0
+
+# Newton steps smaller than this (relative to the rate) count as converged
+XIRR_TOLERANCE = 1e-10
+MAX_NEWTON_ITERATIONS = 50
+MAX_BISECTION_ITERATIONS = 200
+
+# Annual rates are searched between -99.99% and +1,000,000%
+XIRR_BOUNDS = (-0.9999, 10000.0)
+
+def _today() -> np.datetime64:
+    return np.datetime64(datetime.now(IST).date(), 'D')
+
+def _npv(rates: np.ndarray, amounts: np.ndarray, years: np.ndarray, groups: np.ndarray, n_groups: int):
+    """Net present value of every group at its rate, and its derivative in the rate."""
+    rate = rates[groups]
+    discounted = amounts * np.exp(-years * np.log1p(rate))
+    npv = np.bincount(groups, discounted, minlength=n_groups)
+    slope = np.bincount(groups, -years * discounted / (1 + rate), minlength=n_groups)
+    return npv, slope
+
+def xirr(amounts, dates, groups=None, n_groups: Optional[int] = None) -> np.ndarray:
+    """Annual internal rate of return of each group of dated cash flows.
+
+    Outflows (investments) are negative, inflows (sales, current value)
+    positive. All groups are solved together: Newton iterations first, then
+    bisection for the groups Newton did not settle. Groups without both an
+    outflow and an inflow, or without a root in XIRR_BOUNDS, get NaN.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    groups = np.zeros(len(amounts), dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+    if n_groups is None:
+        n_groups = int(groups.max()) + 1 if len(groups) else 0
+    if n_groups == 0:
+        return np.array([], dtype=np.float64)
+
+    # Each flow's time in years since its group's first flow
+    first = np.full(n_groups, np.iinfo(np.int64).max)
+    np.minimum.at(first, groups, days)
+    years = (days - first[groups]) / DAYS_PER_YEAR
+
+    valid = ((np.bincount(groups, amounts < 0, minlength=n_groups) > 0) &
+             (np.bincount(groups, amounts > 0, minlength=n_groups) > 0))
+    lo, hi = XIRR_BOUNDS
+    scale = np.bincount(groups, np.abs(amounts), minlength=n_groups)
+
+    with np.errstate(all='ignore'):
+        rates = np.full(n_groups, 0.1)
+        active = valid.copy()
+        converged = np.zeros(n_groups, dtype=bool)
+        for _ in range(MAX_NEWTON_ITERATIONS):
+            if not active.any():
+                break
+            npv, slope = _npv(rates, amounts, years, groups, n_groups)
+            stepped = rates - npv / slope
+            diverged = active & (~np.isfinite(stepped) | (stepped <= lo) | (stepped >= hi))
+            settled = active & ~diverged & (np.abs(stepped - rates) <= XIRR_TOLERANCE * np.maximum(1, np.abs(rates)))
+            rates = np.where(active & ~diverged, stepped, rates)
+            converged |= settled
+            active &= ~(diverged | settled)
+
+        # A settled Newton step must also be a root (it can stall on a flat NPV)
+        npv, _ = _npv(rates, amounts, years, groups, n_groups)
+        converged &= np.abs(npv) <= 1e-6 * np.maximum(scale, 1)
+
+        pending = valid & ~converged
+        if pending.any():
+            low, high = np.full(n_groups, lo), np.full(n_groups, hi)
+            npv_low, _ = _npv(low, amounts, years, groups, n_groups)
+            npv_high, _ = _npv(high, amounts, years, groups, n_groups)
+            bracketed = pending & (np.sign(npv_low) != np.sign(npv_high))
+            for _ in range(MAX_BISECTION_ITERATIONS):
+                middle = (low + high) / 2
+                npv_middle, _ = _npv(middle, amounts, years, groups, n_groups)
+                same_side = np.sign(npv_middle) == np.sign(npv_low)
+                low = np.where(same_side, middle, low)
+                npv_low = np.where(same_side, npv_middle, npv_low)
+                high = np.where(same_side, high, middle)
+                if np.all(~bracketed | (high - low <= XIRR_TOLERANCE * np.maximum(1, np.abs(low)))):
+                    break
+            rates = np.where(bracketed, (low + high) / 2, rates)
+            converged |= bracketed
+
+    return np.where(valid & converged, rates, np.nan)
+
+def annualize(total_return: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Annual rate of a cumulative return; periods under a year are left as they are."""
+    total_return, days = np.asarray(total_return, dtype=np.float64), np.asarray(days, dtype=np.float64)
+    with np.errstate(all='ignore'):
+        annual = (1 + total_return) ** (DAYS_PER_YEAR / days) - 1
+    return np.where(days >= DAYS_PER_YEAR, annual, total_return)
+
+def twr(values, flows) -> float:
+    """Cumulative time-weighted return of a daily value series.
+
+    `values` are end-of-day values after that day's external flows, `flows` the
+    net amount put in (positive) or taken out (negative) on each day. Days that
+    start from nothing held contribute no return.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    flows = np.asarray(flows, dtype=np.float64)
+    if len(values) < 2:
+        return np.nan
+    start, end, flow = values[:-1], values[1:], flows[1:]
+    held = start > 0
+    if not held.any():
+        return np.nan
+    with np.errstate(all='ignore'):
+        factors = (end[held] - flow[held]) / start[held]
+    return float(np.prod(factors) - 1)
+
+def _flows(assets: Sequence[str]) -> pd.DataFrame:
+    """Ledger events of the given asset classes as signed cash flows (investments negative)."""
+    ledger = pd.concat([get_ledger(asset) for asset in assets], ignore_index=True)
+    if ledger.empty:
+        return ledger.assign(amount=pd.Series(dtype=np.float64))
+    direction = ledger['event'].map(EVENT_DIRECTIONS)
+    # An opening event is the cost of a position carried in, invested on its date
+    ledger['amount'] = np.where(direction < 0, 1, -1) * ledger['quantity'] * ledger['price']
+    return ledger
+
+def holding_returns(asset: str, keys: Sequence[str], current_values: Sequence[float],
+                    current_prices: Sequence[float], today: Optional[np.datetime64] = None) -> pd.DataFrame:
+    """XIRR and annualized TWR of each holding, aligned with `keys`.
+
+    Cash flows are the holding's ledger events plus its current value today.
+    The TWR chains the price moves between events (and to the current price)
+    over the periods anything was held, taking each event's price as the market
+    price that day. Holdings with no ledger events, or without a current
+    price (<= 0, e.g. no quote and no last known good one), get NaN.
+    """
+    today = today if today is not None else _today()
+    keys = list(keys)
+    index = {key: i for i, key in enumerate(keys)}
+    ledger = _flows([asset])
+    ledger = ledger[ledger['holding_key'].isin(index)] if not ledger.empty else ledger
+    result = pd.DataFrame({'xirr': np.full(len(keys), np.nan), 'twr': np.full(len(keys), np.nan)})
+    if ledger.empty:
+        return result
+
+    ledger = ledger.sort_values(['holding_key', 'date', 'id'], kind='stable')
+    groups = ledger['holding_key'].map(index).values.astype(np.int64)
+    tracked = np.unique(groups)
+
+    # XIRR: every event plus the current value as a final inflow
+    values = np.asarray(current_values, dtype=np.float64)[tracked]
+    amounts = np.concatenate([ledger['amount'].values, np.nan_to_num(values)])
+    dates = np.concatenate([ledger['date'].values.astype('datetime64[D]'), np.full(len(tracked), today)])
+    priced = np.nan_to_num(np.asarray(current_prices, dtype=np.float64)) > 0
+    result['xirr'] = np.where(priced, xirr(amounts, dates, np.concatenate([groups, tracked]), len(keys)), np.nan)
+
+    # TWR: price ratios between consecutive events (and the current price),
+    # counted only while a quantity was held. The quantity after each event is
+    # a running sum per group that restarts at every opening event.
+    direction = ledger['event'].map(EVENT_DIRECTIONS).values
+    quantities = ledger['quantity'].values.astype(np.float64)
+    restart = np.ones(len(ledger), dtype=bool)
+    restart[1:] = (groups[1:] != groups[:-1]) | (direction[1:] == 0)
+    steps = np.where(direction == 0, quantities, direction * quantities)
+    running = np.cumsum(steps)
+    starts = np.flatnonzero(restart)
+    offsets = running[starts] - steps[starts]
+    held_after = np.maximum(running - offsets[np.cumsum(restart) - 1], 0)
+
+    prices = np.concatenate([ledger['price'].values, np.asarray(current_prices, dtype=np.float64)[tracked]])
+    held = np.concatenate([held_after, np.zeros(len(tracked))])
+    all_groups = np.concatenate([groups, tracked])
+    order = np.argsort(all_groups, kind='stable')
+    prices, held, all_groups, dates = prices[order], held[order], all_groups[order], dates[order]
+
+    same = all_groups[1:] == all_groups[:-1]
+    counted = same & (held[:-1] > 0) & (prices[:-1] > 0) & (prices[1:] > 0)
+    with np.errstate(all='ignore'):
+        log_ratio = np.where(counted, np.log(prices[1:] / np.where(prices[:-1] > 0, prices[:-1], 1)), 0.0)
+    total = np.expm1(np.bincount(all_groups[1:], log_ratio, minlength=len(keys)))
+    first = np.full(len(keys), np.iinfo(np.int64).max)
+    np.minimum.at(first, all_groups, dates.astype(np.int64))
+    days = today.astype(np.int64) - first
+    annual = annualize(total, np.maximum(days, 1))
+    result['twr'] = np.where(np.isin(np.arange(len(keys)), tracked) & priced, annual, np.nan)
+    return result
+
+def as_percent(rate: float) -> Optional[float]:
+    """A rate as a percentage rounded for display, or None if it could not be computed."""
+    return round(rate * 100, 2) if np.isfinite(rate) else None
+
+def current_values(asset: str, df: pd.DataFrame, value_column: str = 'Current Value') -> Dict[str, float]:
+    """Current value per holding key of a valued holdings frame (its key and name columns included)."""
+    return {holding_key(asset, record): float(record[value_column] or 0)
+            for record in df.to_dict('records')}
+
+def asset_returns(values: Dict[str, Dict[str, float]], series: Optional[Dict[str, np.ndarray]] = None,
+                  today: Optional[np.datetime64] = None) -> Dict[str, Dict[str, float]]:
+    """XIRR and annualized TWR of each asset class in `values`, and of all of them as 'portfolio'.
+
+    `values` maps an asset class to the current value of each holding key. The
+    XIRR covers the holdings that have ledger events: their events plus their
+    current value today. The TWR chains the daily values of the net-worth
+    series (see utils.net_worth) net of the ledger's buys and sells.
+    """
+    today = today if today is not None else _today()
+    assets = list(values)
+    ledger = _flows(assets)
+    if series is None:
+        # Imported here: utils.net_worth depends on the portfolio loaders, which use this module
+        from utils.net_worth import load_net_worth
+        series = load_net_worth()
+
+    names = assets + ['portfolio']
+    members = {asset: [asset] for asset in assets}
+    members['portfolio'] = assets
+    amounts, dates, groups = [], [], []
+    for group, name in enumerate(names):
+        for asset in members[name]:
+            flows = ledger[ledger['asset'] == asset] if not ledger.empty else ledger
+            if flows.empty:
+                continue
+            tracked = set(flows['holding_key'])
+            amounts += [flows['amount'].values, [sum(value for key, value in values[asset].items() if key in tracked)]]
+            dates += [flows['date'].values.astype('datetime64[D]'), [today]]
+            groups += [np.full(len(flows) + 1, group)]
+    rates = (xirr(np.concatenate(amounts), np.concatenate(dates), np.concatenate(groups), len(names))
+             if groups else np.full(len(names), np.nan))
+
+    results = {}
+    for group, name in enumerate(names):
+        results[name] = {'xirr': float(rates[group]), 'twr': np.nan}
+        if series is None or not all(asset in series for asset in members[name]):
+            continue
+        grid = series['dates']
+        daily_values = sum(series[asset] for asset in members[name])
+        daily_flows = np.zeros(len(grid))
+        flows = ledger[ledger['asset'].isin(members[name]) & (ledger['event'] != 'opening')] if not ledger.empty else ledger
+        if not flows.empty:
+            flow_dates = flows['date'].values.astype('datetime64[D]')
+            positions = np.searchsorted(grid, flow_dates)
+            on_grid = (positions < len(grid)) & (grid[np.minimum(positions, len(grid) - 1)] == flow_dates)
+            # Money put in is the negative of the investor's cash flow
+            np.add.at(daily_flows, positions[on_grid], -flows['amount'].values[on_grid])
+        held = np.flatnonzero(daily_values > 0)
+        if len(held) == 0:
+            continue
+        total = twr(daily_values[held[0]:], daily_flows[held[0]:])
+        days = (grid[-1] - grid[held[0]]).astype(np.int64)
+        results[name]['twr'] = float(annualize(total, max(days, 1)))
+    return results
@@ -0,0 +1,277 @@
+import hashlib
+import os
+import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pypdf import PdfReader
+from utils import savings_store
+
+SAVINGS_STATEMENTS_FOLDER = os.path.join('assets', 'SavingsAccounts')
+
+# How each bank's statement text is laid out. `transaction` matches the line a
+# transaction starts on and captures its date; `columns` (where the layout has
+# one) captures the debit and credit written before the date. Amounts and their
+# sign are otherwise recovered from the running balance.
+BANK_PROFILES = {
+    'HDFC': {
+        'name': 'HDFC Bank',
+        'markers': ['HDFC BANK LIMITED'],
+        'transaction': re.compile(r'^(\d{2}/\d{2}/\d{2})\s'),
+        'date_format': '%d/%m/%y',
+        'account': re.compile(r'Account No\s*:\s*(\d+)'),
+        'opening': re.compile(r'Opening Balance[^\n]*\n\s*([\d,]+\.\d{2})')
+    },
+    'SBI': {
+        'name': 'State Bank of India',
+        'markers': ['State Bank of India'],
+        'transaction': re.compile(r'^(?:[\d,]+\.\d{2}|-) (?:[\d,]+\.\d{2}|-) (\d{1,2} [A-Za-z]{3} \d{4})\s'),
+        'columns': re.compile(r'^(?P<debit>[\d,]+\.\d{2}|-) (?P<credit>[\d,]+\.\d{2}|-) '),
+        'date_format': '%d %b %Y',
+        # The account number is not reliably recoverable from the text layer;
+        # the statement's file name keys the account instead
+        'account': None,
+        'opening': None
+    },
+    'AXIS': {
+        'name': 'Axis Bank',
+        'markers': ['Statement of Axis Account', 'AXIS BANK LTD'],
+        'transaction': re.compile(r'^(\d{2}-\d{2}-\d{4})'),
+        'date_format': '%d-%m-%Y',
+        'account': re.compile(r'Axis Account No\s*:\s*(\d+)'),
+        'opening': re.compile(r'OPENING BALANCE\s+([\d,]+\.\d{2})')
+    },
+    'IDFCFIRST': {
+        'name': 'IDFC FIRST Bank',
+        'markers': ['IDFC FIRST BANK'],
+        'transaction': re.compile(r'^(\d{2}-[A-Za-z]{3}-\d{4}) \d{2}-[A-Za-z]{3}-\d{4}\s'),
+        'date_format': '%d-%b-%Y',
+        'account': re.compile(r'ACCOUNT NO\s*:\s*(\d+)'),
+        'opening': re.compile(r'Opening Balance\s+([\d,]+\.\d{2})')
+    }
+}
+
+# Money amounts: 2 decimals, optionally with (Indian) thousands separators. Balances
+# are sometimes glued to the preceding narration ("...UPI85190.20").
+MONEY_PATTERN = re.compile(r'(?<![\d.,])\d{1,3}(?:,\d{2,3})+\.\d{2}(?!\d)|(?<![\d.,])\d+\.\d{2}(?!\d)')
+
+# Two amounts closer than this are the same amount
+BALANCE_TOLERANCE = 0.005
+
+# Worker processes used to extract statement pages
+MAX_PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+def to_amount(text: str) -> float:
+    return float(text.replace(',', ''))
+
+def detect_bank(path: str, first_page_text: str = '') -> Optional[str]:
+    """Bank key for a statement, from its file name (e.g. SBI_Statement.pdf) or its text."""
+    prefix = os.path.basename(path).split('_')[0].upper()
+    if prefix in BANK_PROFILES:
+        return prefix
+    for bank, profile in BANK_PROFILES.items():
+        if any(marker in first_page_text for marker in profile['markers']):
+            return bank
+    return None
+
+def open_statement(path: str) -> PdfReader:
+    """Open a statement PDF, unlocking it if it is only owner-password protected."""
+    reader = PdfReader(path)
+    if reader.is_encrypted and not reader.decrypt(''):
+        raise ValueError("Statement is password protected")
+    return reader
+
+def parse_page(path: str, page_number: int, bank: str) -> Dict:
+    """Extract one page and split it into raw transaction blocks (runs in a worker process).
+
+    Each block is {'date', 'text', 'amounts', 'debit', 'credit'}: the ISO date,
+    the block's text, every money amount in it in order, and the debit/credit
+    columns where the bank's layout has them. Lines before the first
+    transaction on a page (headers) belong to no block.
+    """
+    profile = BANK_PROFILES[bank]
+    text = open_statement(path).pages[page_number].extract_text() or ''
+
+    blocks = []
+    for line in text.splitlines():
+        match = profile['transaction'].match(line.strip())
+        if match:
+            try:
+                date = datetime.strptime(match.group(1), profile['date_format']).strftime('%Y-%m-%d')
+            except ValueError:
+                date = None
+            if date is not None:
+                debit = credit = None
+                columns = profile.get('columns')
+                column_match = columns.match(line.strip()) if columns else None
+                if column_match:
+                    debit = to_amount(column_match.group('debit')) if column_match.group('debit') != '-' else 0.0
+                    credit = to_amount(column_match.group('credit')) if column_match.group('credit') != '-' else 0.0
+                    line = line.strip()[column_match.end():]
+                blocks.append({'date': date, 'lines': [line.strip()], 'debit': debit, 'credit': credit})
+                continue
+        if blocks:
+            blocks[-1]['lines'].append(line.strip())
+
+    for block in blocks:
+        block['text'] = ' '.join(block.pop('lines'))
+        block['amounts'] = [to_amount(amount) for amount in MONEY_PATTERN.findall(block['text'])]
+    return {'page': page_number, 'text': text, 'blocks': blocks}
+
+def _chain_transaction(block: Dict, previous: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+    """Signed amount and balance of a block, given the balance before it.
+
+    Debit/credit columns give the amount directly; the printed balance can be
+    glued to narration digits, so it is only read for a first transaction.
+    Otherwise, with a known previous balance, the (amount, balance) pair among
+    the block's amounts that satisfies previous +/- amount = balance is taken,
+    which also skips footer totals trailing the last transaction of a page.
+    Failing both, the amount is unknown and the last amount is the balance.
+    """
+    amounts = block['amounts']
+    if block['debit'] is not None:
+        amount = block['credit'] - block['debit']
+        if previous is not None:
+            return amount, round(previous + amount, 2)
+        return amount, amounts[-1] if amounts else None
+
+    if previous is not None:
+        for j in range(1, len(amounts)):
+            delta = amounts[j] - previous
+            for i in range(j - 1, -1, -1):
+                if amounts[i] > 0 and abs(abs(delta) - amounts[i]) < BALANCE_TOLERANCE:
+                    return round(delta, 2), amounts[j]
+    return None, amounts[-1] if amounts else None
+
+def _description(block: Dict) -> str:
+    """Narration of a block, with its amounts taken out."""
+    text = MONEY_PATTERN.sub(' ', block['text'])
+    return ' '.join(text.split())[:200]
+
+def assemble_statement(path: str, bank: str, pages: List[Dict]) -> Tuple[Dict, List[Dict]]:
+    """Stitch the per-page blocks of a statement into its transactions.
+
+    Runs the balance chain across page boundaries, starting from the printed
+    opening balance when the statement has one. Returns (statement, transactions).
+    """
+    profile = BANK_PROFILES[bank]
+    pages = sorted(pages, key=lambda page: page['page'])
+    text = '\n'.join(page['text'] for page in pages)
+
+    account_match = profile['account'].search(text) if profile['account'] else None
+    opening_match = profile['opening'].search(text) if profile['opening'] else None
+    opening = to_amount(opening_match.group(1)) if opening_match else None
+
+    transactions = []
+    previous = opening
+    for page in pages:
+        for block in page['blocks']:
+            amount, balance = _chain_transaction(block, previous)
+            if balance is None:
+                continue
+            if opening is None and not transactions and amount is not None:
+                opening = round(balance - amount, 2)
+            transactions.append({'date': block['date'], 'description': _description(block),
+                                 'amount': amount, 'balance': balance})
+            previous = balance
+
+    statement = {
+        'path': path,
+        'bank': profile['name'],
+        'account': account_match.group(1) if account_match else savings_store.statement_account_key(path),
+        'first_date': transactions[0]['date'] if transactions else None,
+        'last_date': transactions[-1]['date'] if transactions else None,
+        'opening_balance': opening,
+        'closing_balance': transactions[-1]['balance'] if transactions else opening
+    }
+    return statement, transactions
+
+def file_sha256(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def scan_savings_statements(folder: Optional[str] = None) -> List[str]:
+    """Every statement PDF in the savings statements folder."""
+    folder = folder or SAVINGS_STATEMENTS_FOLDER
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.lower().endswith('.pdf')]
+
+def ingest_statements(folder: Optional[str] = None, force: bool = False) -> Dict[str, Dict]:
+    """Parse new statement PDFs into the savings store.
+
+    Statements already in the store (by content hash) are skipped. The pages of
+    all new statements are extracted in one process pool, then each statement
+    is assembled and saved in its own transaction.
+
+    Returns per file {'bank', 'account', 'transactions', 'new', 'closing_balance'}
+    or {'error'}; skipped files are not listed.
+    """
+    known = set() if force else savings_store.imported_hashes()
+    jobs = []
+    results = {}
+    for path in scan_savings_statements(folder):
+        sha256 = file_sha256(path)
+        if sha256 in known:
+            continue
+        try:
+            reader = open_statement(path)
+            bank = detect_bank(path) or detect_bank(path, reader.pages[0].extract_text() or '')
+            if bank is None:
+                raise ValueError("Unrecognised bank statement layout")
+            jobs.append((path, sha256, bank, len(reader.pages)))
+        except Exception as e:
+            print(f"Error reading statement {path}: {str(e)}")
+            results[path] = {'error': str(e)}
+
+    tasks = [(path, page, bank) for path, sha256, bank, n_pages in jobs for page in range(n_pages)]
+    if len(tasks) > 1 and MAX_PDF_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=min(MAX_PDF_WORKERS, len(tasks))) as executor:
+            futures = [executor.submit(parse_page, *task) for task in tasks]
+            pages = [_page_result(future.result) for future in futures]
+    else:
+        pages = [_page_result(lambda task=task: parse_page(*task)) for task in tasks]
+
+    start = 0
+    for path, sha256, bank, n_pages in jobs:
+        file_pages = pages[start:start + n_pages]
+        start += n_pages
+        errors = [page for page in file_pages if 'error' in page]
+        if errors:
+            print(f"Error parsing statement {path}: {errors[0]['error']}")
+            results[path] = {'error': errors[0]['error']}
+            continue
+
+        statement, transactions = assemble_statement(path, bank, file_pages)
+        statement['sha256'] = sha256
+        new = savings_store.save_statement(statement, transactions)
+        results[path] = {'bank': statement['bank'], 'account': statement['account'],
+                         'transactions': len(transactions), 'new': new,
+                         'closing_balance': statement['closing_balance']}
+        print(f"Imported {path}: {len(transactions)} transactions ({new} new), "
+              f"closing balance {statement['closing_balance']}")
+
+    return results
+
+def _page_result(get_result) -> Dict:
+    """Run/collect one page job, turning a failure into {'error'}."""
+    try:
+        return get_result()
+    except Exception as e:
+        return {'error': str(e)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Import savings account statement PDFs into the savings store')
+    parser.add_argument('--folder', help=f'Statement folder (default {SAVINGS_STATEMENTS_FOLDER})')
+    parser.add_argument('--force', action='store_true', help='Re-import statements that were already imported')
+
+    args = parser.parse_args()
+
+    try:
+        results = ingest_statements(args.folder, args.force)
+        if not results:
+            print("No new statements to import")
+    except Exception as e:
+        print(f"Failed to import statements: {str(e)}")
+        exit(1)
@@ -0,0 +1,213 @@
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+
+# Transactions parsed from savings account statements (see utils.savings_statements)
+SAVINGS_DB_FILE = os.path.join('assets', 'PersonalFiles', 'savings.db')
+
+# Overlapping statements of the same account hold the same transactions once.
+# Amounts that could not be recovered are NULL, and SQLite treats NULLs as
+# distinct in a unique index, so those rows are told apart by their narration.
+NATURAL_KEY_INDEX = """
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_natural_key
+    ON transactions (bank, account, date, balance, COALESCE(amount, description))
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    bank TEXT NOT NULL,
+    account TEXT NOT NULL,
+    first_date TEXT,
+    last_date TEXT,
+    opening_balance REAL,
+    closing_balance REAL,
+    transactions INTEGER NOT NULL,
+    imported_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    statement TEXT NOT NULL REFERENCES statements(sha256),
+    bank TEXT NOT NULL,
+    account TEXT NOT NULL,
+    date TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    description TEXT,
+    amount REAL,
+    balance REAL
+);
+CREATE INDEX IF NOT EXISTS transactions_by_account_date ON transactions (bank, account, date, seq);
+CREATE INDEX IF NOT EXISTS transactions_by_statement ON transactions (statement);
+"""
+
+# Short names hand-entered accounts use for the banks statements are imported from
+BANK_ALIASES = {'SBI': 'STATE BANK OF INDIA', 'HDFC': 'HDFC BANK', 'AXIS': 'AXIS BANK',
+                'IDFC': 'IDFC FIRST BANK', 'IDFC FIRST': 'IDFC FIRST BANK', 'IDFCFIRST': 'IDFC FIRST BANK'}
+
+# Account numbers shorter than this (e.g. masked to the last digits) are too short to match on
+MIN_ACCOUNT_DIGITS = 4
+
+# Indian bank account numbers have 9 to 18 digits; shorter numbers in a file name are dates
+FILE_NAME_ACCOUNT_DIGITS = 9
+
+def statement_account_key(path: str) -> str:
+    """Account of a statement whose text does not give it: the number in its file name, else the name.
+
+    Name statements like SBI_<account number>_<period>.pdf to keep every
+    statement of an account on the same key.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    numbers = re.findall(r'\d{%d,}' % FILE_NAME_ACCOUNT_DIGITS, stem)
+    return max(numbers, key=len) if numbers else stem
+
+def _bank_name(bank) -> str:
+    name = ' '.join(re.split(r'[^A-Z0-9]+', str(bank or '').upper())).strip()
+    return BANK_ALIASES.get(name, name)
+
+def _digits(account) -> str:
+    return re.sub(r'\D', '', str(account or ''))
+
+def match_account(accounts: pd.DataFrame, bank: str, account: str) -> Optional[int]:
+    """Index of the hand-entered account (Bank, AccountNumber rows) an imported account is, if any.
+
+    Banks match by name or short name (SBI, HDFC, ...). Account numbers match
+    when one ends with the other, so masked numbers (XXXX1234) match too.
+    Failing that, an account without a number on either side (e.g. a statement
+    keyed by its file name) matches when it is the only candidate at the bank.
+    """
+    if accounts.empty:
+        return None
+    same_bank = accounts.index[accounts['Bank'].map(_bank_name) == _bank_name(bank)]
+    entered = {index: _digits(accounts.at[index, 'AccountNumber']) for index in same_bank}
+    number = _digits(account)
+    if len(number) >= MIN_ACCOUNT_DIGITS:
+        for index, digits in entered.items():
+            if len(digits) >= MIN_ACCOUNT_DIGITS and (number.endswith(digits) or digits.endswith(number)):
+                return index
+        candidates = [index for index, digits in entered.items() if len(digits) < MIN_ACCOUNT_DIGITS]
+    else:
+        candidates = list(same_bank)
+    return candidates[0] if len(candidates) == 1 else None
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Bring a store created by an older version up to the current keys.
+
+    Statements stored without an account are keyed by their file name, and
+    transactions repeated under the old NULL-blind natural key are dropped.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' "
+                       "AND name = 'transactions_natural_key'").fetchone()
+    if row is not None and 'COALESCE' in row[0]:
+        return
+    with conn:
+        conn.execute("DROP INDEX IF EXISTS transactions_natural_key")
+        for sha256, path in conn.execute("SELECT sha256, path FROM statements WHERE account = ''").fetchall():
+            account = statement_account_key(path)
+            conn.execute("UPDATE statements SET account = ? WHERE sha256 = ?", (account, sha256))
+            conn.execute("UPDATE transactions SET account = ? WHERE statement = ?", (account, sha256))
+        conn.execute("DELETE FROM transactions WHERE id NOT IN (SELECT MIN(id) FROM transactions "
+                     "GROUP BY bank, account, date, balance, COALESCE(amount, description))")
+        conn.execute(NATURAL_KEY_INDEX)
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """Open the savings store, creating its tables on first use."""
+    path = path or SAVINGS_DB_FILE
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    return conn
+
+def imported_hashes(path: Optional[str] = None) -> set:
+    """Content hashes of every statement already in the store."""
+    conn = connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT sha256 FROM statements")}
+    finally:
+        conn.close()
+
+def save_statement(statement: Dict, transactions: List[Dict], path: Optional[str] = None) -> int:
+    """Store one parsed statement and its transactions in a single transaction.
+
+    Returns the number of transactions that were new to the store.
+    """
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO statements (sha256, path, bank, account, first_date, last_date, "
+                "opening_balance, closing_balance, transactions, imported_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (statement['sha256'], statement['path'], statement['bank'], statement['account'],
+                 statement['first_date'], statement['last_date'], statement['opening_balance'],
+                 statement['closing_balance'], len(transactions), time.time()))
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO transactions (statement, bank, account, date, seq, description, amount, balance) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(statement['sha256'], statement['bank'], statement['account'], txn['date'], seq,
+                  txn['description'], txn['amount'], txn['balance']) for seq, txn in enumerate(transactions)])
+            return conn.total_changes - before
+    finally:
+        conn.close()
+
+def changes_since(last_id: int = 0, path: Optional[str] = None) -> Tuple[int, Optional[str]]:
+    """Id of the newest stored transaction, and the earliest date among those stored after `last_id`."""
+    if not os.path.exists(path or SAVINGS_DB_FILE):
+        return 0, None
+
+    conn = connect(path)
+    try:
+        latest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+        earliest = conn.execute("SELECT MIN(date) FROM transactions WHERE id > ?", (last_id,)).fetchone()[0]
+        return latest, earliest
+    finally:
+        conn.close()
+
+def get_account_balances(path: Optional[str] = None) -> pd.DataFrame:
+    """Latest known balance of every account in the store.
+
+    Columns: Bank, AccountNumber, Balance, LastUpdated (date of the last transaction).
+    """
+    columns = ['Bank', 'AccountNumber', 'Balance', 'LastUpdated']
+    if not os.path.exists(path or SAVINGS_DB_FILE):
+        return pd.DataFrame(columns=columns)
+
+    conn = connect(path)
+    try:
+        rows = conn.execute("""
+            SELECT s.bank, s.account, s.closing_balance, s.last_date
+            FROM statements s
+            WHERE s.last_date = (SELECT MAX(last_date) FROM statements
+                                 WHERE bank = s.bank AND account = s.account)
+            GROUP BY s.bank, s.account
+        """).fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame(rows, columns=columns)
+
+def get_transactions(bank: Optional[str] = None, account: Optional[str] = None,
+                     path: Optional[str] = None) -> pd.DataFrame:
+    """Stored transactions, oldest first, optionally for one bank and/or account."""
+    columns = ['bank', 'account', 'date', 'description', 'amount', 'balance']
+    if not os.path.exists(path or SAVINGS_DB_FILE):
+        return pd.DataFrame(columns=columns)
+
+    query = f"SELECT {', '.join(columns)} FROM transactions WHERE 1 = 1"
+    params = []
+    if bank is not None:
+        query += " AND bank = ?"
+        params.append(bank)
+    if account is not None:
+        query += " AND account = ?"
+        params.append(account)
+    query += " ORDER BY date, statement, seq"
+
+    conn = connect(path)
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+from utils import http_client
+from utils.http_client import DEFAULT_TIMEOUT
+from utils import quote_cache
+from utils.single_flight import single_flight
+
+MFAPI_SCHEME_URL = "https://api.mfapi.in/mf/{scheme_code}"
+
+# Upper bound on the raw size of all cached documents, in bytes
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+_documents = OrderedDict()
+_total_bytes = 0
+_lock = threading.Lock()
+
+def parse_scheme_document(data: Dict) -> Dict:
+    """Turn an mfapi response into parsed meta plus an ascending NAV series."""
+    rows = data.get('data') or []
+    dates = []
+    navs = []
+    for row in rows:
+        try:
+            dates.append(datetime.strptime(row['date'], '%d-%m-%Y').date())
+            navs.append(float(row['nav']))
+        except (KeyError, ValueError):
+            continue
+
+    # mfapi lists the newest NAV first; store oldest first for range queries
+    order = np.argsort(np.array(dates, dtype='datetime64[D]'), kind='stable')
+    return {
+        'meta': data.get('meta') or {},
+        'dates': np.array(dates, dtype='datetime64[D]')[order],
+        'navs': np.array(navs, dtype=np.float64)[order]
+    }
+
+def _evict(max_bytes: int) -> None:
+    """Drop least recently used documents until the cache fits; caller holds the lock."""
+    global _total_bytes
+    while _documents and _total_bytes > max_bytes:
+        _, entry = _documents.popitem(last=False)
+        _total_bytes -= entry['size']
+
+def _store(scheme_code: str, entry: Dict) -> None:
+    """Insert or replace a document and enforce the size limit; caller holds the lock."""
+    global _total_bytes
+    old = _documents.pop(scheme_code, None)
+    if old is not None:
+        _total_bytes -= old['size']
+    _documents[scheme_code] = entry
+    _total_bytes += entry['size']
+    _evict(MAX_CACHE_BYTES)
+
+@single_flight
+def get_scheme_document(scheme_code) -> Optional[Dict]:
+    """Return the parsed mfapi document for a scheme, fetching it at most once per session.
+
+    Stale documents are revalidated with If-None-Match / If-Modified-Since so an
+    unchanged history costs a 304 instead of a full download. If the upstream call
+    fails, the stale copy (if any) is returned.
+    """
+    scheme_code = str(scheme_code).strip()
+    with _lock:
+        entry = _documents.get(scheme_code)
+        if entry is not None:
+            _documents.move_to_end(scheme_code)
+            if entry['expires_at'] > time.time():
+                return entry
+
+    headers = {}
+    if entry is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        response = http_client.get(MFAPI_SCHEME_URL.format(scheme_code=scheme_code),
+                                     headers=headers, timeout=DEFAULT_TIMEOUT)
+        expires_at = quote_cache.compute_expiry(quote_cache.MF_NAV_TTL)
+
+        if response.status_code == 304 and entry is not None:
+            with _lock:
+                entry['expires_at'] = expires_at
+            return entry
+
+        response.raise_for_status()
+        document = parse_scheme_document(response.json())
+        document.update({
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'expires_at': expires_at,
+            'size': len(response.content)
+        })
+        with _lock:
+            _store(scheme_code, document)
+        return document
+
+    except Exception as e:
+        print(f"Error fetching scheme document for {scheme_code}: {str(e)}")
+        return entry
+
+def fetch_scheme_history(scheme_code, start_date, end_date=None) -> Optional[Dict]:
+    """Fetch only the NAVs published between two dates (YYYY-MM-DD), bypassing the cache."""
+    params = {'startDate': str(start_date)}
+    if end_date is not None:
+        params['endDate'] = str(end_date)
+    try:
+        response = http_client.get(MFAPI_SCHEME_URL.format(scheme_code=str(scheme_code).strip()),
+                                     params=params, timeout=DEFAULT_TIMEOUT)
+        response.raise_for_status()
+        return parse_scheme_document(response.json())
+    except Exception as e:
+        print(f"Error fetching NAV history for {scheme_code}: {str(e)}")
+        return None
+
+def clear_scheme_documents() -> None:
+    """Empty the document cache."""
+    global _total_bytes
+    with _lock:
+        _documents.clear()
+        _total_bytes = 0
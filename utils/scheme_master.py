@@ -0,0 +1,171 @@
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from utils.amfi_nav import load_nav_index
+
+# Matches scoring below this Dice similarity are reported but not used as codes
+MIN_MATCH_CONFIDENCE = 0.6
+
+# Names scored together per numpy pass; bounds the (names x schemes) score block
+MATCH_BLOCK_SIZE = 64
+
+# Trigrams found in more than this share of schemes are scored with a dense
+# matrix product instead of by walking their (very long) posting lists
+COMMON_GRAM_FRACTION = 0.05
+
+# Filler words that statements and AMFI use inconsistently
+STOP_WORDS = {'plan', 'option', 'the', 'of', 'scheme'}
+
+# Abbreviations seen in CAS/broker statements
+TOKEN_ALIASES = {'reg': 'regular', 'dir': 'direct', 'gr': 'growth', 'div': 'idcw', 'dividend': 'idcw'}
+
+_master = None
+_master_source = None
+_lock = threading.Lock()
+
+def normalize_scheme_name(name) -> List[str]:
+    """Lower-case a scheme name and split it into comparable tokens.
+
+    Names that mention neither plan are regular plans (AMFI only spells out
+    "Direct"), so 'regular' is added to make the plan explicit on both sides.
+    """
+    text = str(name).lower().replace('&', ' and ')
+    tokens = [TOKEN_ALIASES.get(token, token) for token in re.split(r'[^a-z0-9]+', text)
+              if token and token not in STOP_WORDS]
+    if 'direct' not in tokens and 'regular' not in tokens:
+        tokens.append('regular')
+    return tokens
+
+def scheme_trigrams(name) -> List[str]:
+    """Distinct space-padded character trigrams of each token in a scheme name."""
+    grams = set()
+    for token in normalize_scheme_name(name):
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return sorted(grams)
+
+def build_scheme_master(index: Dict[str, Dict]) -> Dict:
+    """Build a trigram inverted index over the schemes of an AMFI NAV index.
+
+    Postings are stored CSR-style: the schemes containing trigram `g` are
+    `indices[indptr[g]:indptr[g + 1]]`. Common trigrams additionally get a row
+    in the dense (common trigram x scheme) `common_matrix`.
+    """
+    codes = sorted(index)
+    gram_ids = {}
+    postings = []
+    sizes = np.zeros(len(codes), dtype=np.int32)
+
+    for row, code in enumerate(codes):
+        grams = scheme_trigrams(index[code]['scheme_name'])
+        sizes[row] = len(grams)
+        for gram in grams:
+            gram_id = gram_ids.setdefault(gram, len(gram_ids))
+            if gram_id == len(postings):
+                postings.append([])
+            postings[gram_id].append(row)
+
+    lengths = np.array([len(p) for p in postings], dtype=np.int64)
+    indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.fromiter((row for p in postings for row in p), dtype=np.int32, count=int(indptr[-1]))
+
+    common = np.flatnonzero(lengths > COMMON_GRAM_FRACTION * len(codes))
+    common_rows = np.full(len(postings), -1, dtype=np.int64)
+    common_rows[common] = np.arange(len(common))
+    common_matrix = np.zeros((len(common), len(codes)), dtype=np.float32)
+    for row, gram_id in enumerate(common):
+        common_matrix[row, indices[indptr[gram_id]:indptr[gram_id + 1]]] = 1
+
+    return {
+        'codes': np.array(codes, dtype=object),
+        'names': [index[code]['scheme_name'] for code in codes],
+        'sizes': sizes,
+        'gram_ids': gram_ids,
+        'indptr': indptr,
+        'indices': indices,
+        'common_rows': common_rows,
+        'common_matrix': common_matrix
+    }
+
+def load_scheme_master(refresh: bool = False) -> Dict:
+    """Return the scheme master, rebuilt whenever the AMFI NAV index is reloaded."""
+    global _master, _master_source
+    index = load_nav_index(refresh=refresh)
+    with _lock:
+        if _master is None or _master_source is not index:
+            _master = build_scheme_master(index)
+            _master_source = index
+        return _master
+
+def _score_block(names: List[str], master: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Best scheme row and its Dice score for each name in one block."""
+    gram_ids = master['gram_ids']
+    n_schemes = len(master['codes'])
+
+    query_rows, query_grams, query_sizes = [], [], np.zeros(len(names), dtype=np.int32)
+    for row, name in enumerate(names):
+        grams = scheme_trigrams(name)
+        query_sizes[row] = len(grams)
+        for gram in grams:
+            if gram in gram_ids:
+                query_rows.append(row)
+                query_grams.append(gram_ids[gram])
+
+    if not query_grams or n_schemes == 0:
+        return np.zeros(len(names), dtype=np.int64), np.zeros(len(names))
+
+    query_rows = np.array(query_rows, dtype=np.int64)
+    query_grams = np.array(query_grams, dtype=np.int64)
+    common_rows = master['common_rows'][query_grams]
+    is_common = common_rows >= 0
+
+    # Common trigrams: one (names x common) @ (common x schemes) product
+    query_common = np.zeros((len(names), len(master['common_matrix'])), dtype=np.float32)
+    query_common[query_rows[is_common], common_rows[is_common]] = 1
+    shared = query_common @ master['common_matrix']
+
+    # Rare trigrams: gather their posting lists in one shot and count per (name, scheme)
+    rare_rows, rare_grams = query_rows[~is_common], query_grams[~is_common]
+    starts = master['indptr'][rare_grams]
+    lengths = master['indptr'][rare_grams + 1] - starts
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    schemes = master['indices'][offsets + np.arange(lengths.sum())]
+    rows = np.repeat(rare_rows, lengths)
+    shared += np.bincount(rows * n_schemes + schemes,
+                          minlength=len(names) * n_schemes).reshape(len(names), n_schemes)
+
+    # Dice similarity of every (name, scheme) pair
+    totals = query_sizes[:, None] + master['sizes'][None, :]
+    scores = np.divide(2.0 * shared, totals, out=np.zeros(shared.shape), where=totals > 0)
+
+    best = scores.argmax(axis=1)
+    return best, scores[np.arange(len(names)), best]
+
+def match_scheme_names(names: Iterable, master: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Resolve scheme names to AMFI scheme codes.
+
+    Returns (codes, confidence) arrays aligned with `names`. Confidence is the
+    trigram Dice similarity of the best match; codes scoring below
+    MIN_MATCH_CONFIDENCE are returned as ''.
+    """
+    names = [str(name) for name in names]
+    master = master if master is not None else load_scheme_master()
+    codes = np.full(len(names), '', dtype=object)
+    confidence = np.zeros(len(names))
+
+    for start in range(0, len(names), MATCH_BLOCK_SIZE):
+        block = names[start:start + MATCH_BLOCK_SIZE]
+        best, scores = _score_block(block, master)
+        matched = scores >= MIN_MATCH_CONFIDENCE
+        if len(master['codes']):
+            codes[start:start + len(block)][matched] = master['codes'][best[matched]]
+        confidence[start:start + len(block)] = scores
+
+    return codes, confidence
+
+def resolve_scheme_code(name) -> str:
+    """Best AMFI scheme code for a single scheme name, or '' if nothing matches well."""
+    codes, _ = match_scheme_names([name])
+    return codes[0]
@@ -0,0 +1,102 @@
+import copy
+import functools
+import threading
+from collections.abc import Iterator
+from typing import Callable, Dict
+
+# In-flight computations keyed by (function name, arguments). The first caller for
+# a key runs the function; concurrent callers with the same key wait for it and
+# receive a deep copy of its result (or the same exception), so none of them can
+# change what another one sees. Nothing is cached once the call returns.
+
+_in_flight = {}
+_stats = {}
+_lock = threading.Lock()
+
+def _freeze(value):
+    """Make an argument usable in a dict key (lists, arrays and sets become tuples).
+
+    Raises TypeError for arguments that cannot be keyed, e.g. DataFrames.
+    """
+    if isinstance(value, (str, bytes)):
+        return value
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    # Lists and tuples, plus numpy arrays and pandas Series/Index
+    if isinstance(value, (list, tuple)) or hasattr(value, 'tolist'):
+        return tuple(_freeze(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        raise TypeError(f"single_flight cannot key on a {type(value).__name__} argument") from None
+    return value
+
+def _materialize(value):
+    """Turn an iterator or generator argument into a list, so keying it does not consume it."""
+    return list(value) if isinstance(value, Iterator) else value
+
+def do(name: str, key, fn: Callable, *args, **kwargs):
+    """Run fn(*args, **kwargs) once for concurrent callers sharing (name, key).
+
+    The caller that runs fn gets its result; every waiter gets its own deep copy.
+    """
+    flight_key = (name, key)
+    with _lock:
+        counters = _stats.setdefault(name, {'calls': 0, 'executions': 0, 'coalesced': 0})
+        counters['calls'] += 1
+        call = _in_flight.get(flight_key)
+        if call is not None:
+            counters['coalesced'] += 1
+            call['waiters'] += 1
+            leader = False
+        else:
+            counters['executions'] += 1
+            call = {'done': threading.Event(), 'copies': [], 'error': None, 'waiters': 0}
+            _in_flight[flight_key] = call
+            leader = True
+
+    if not leader:
+        call['done'].wait()
+        if call['error'] is not None:
+            raise call['error']
+        return call['copies'].pop()
+
+    result = None
+    try:
+        result = fn(*args, **kwargs)
+        return result
+    except BaseException as e:
+        call['error'] = e
+        raise
+    finally:
+        # No caller can join once the call is unlisted, so the waiter count is final
+        with _lock:
+            _in_flight.pop(flight_key, None)
+        if call['error'] is None:
+            try:
+                call['copies'] = [copy.deepcopy(result) for _ in range(call['waiters'])]
+            except Exception as e:
+                call['error'] = e
+        call['done'].set()
+
+def single_flight(fn: Callable) -> Callable:
+    """Decorator: coalesce concurrent calls to `fn` that have the same arguments.
+
+    Iterator arguments are passed to `fn` as lists.
+    """
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        args = tuple(_materialize(arg) for arg in args)
+        kwargs = {key: _materialize(value) for key, value in kwargs.items()}
+        return do(name, _freeze((args, kwargs)), fn, *args, **kwargs)
+
+    return wrapper
+
+def get_single_flight_stats() -> Dict[str, Dict[str, int]]:
+    """Return per-function counters: calls, executions and coalesced calls."""
+    with _lock:
+        return {name: dict(counters) for name, counters in _stats.items()}
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import os
+import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from openpyxl import load_workbook
+from utils import quote_cache
+from utils.mf_excel_converter import open_holdings_rows, iter_holdings_rows, resolve_scheme_codes
+from utils.stock_excel_converter import read_stock_holdings, report_unresolved
+from utils.holdings_store import combine_duplicates, replace_holdings
+
+# Statement folders scanned by the batch importer and the holdings (and CSV mirror) each one feeds
+STATEMENT_SOURCES = {
+    'mutual_funds': {
+        'folder': os.path.join('assets', 'MutualFunds'),
+        'output': os.path.join('assets', 'PersonalFiles', 'myMFPortfolio.csv'),
+        'columns': ['Scheme', 'UnitsOwned', 'AverageNAV', 'SchemeCode', 'MatchConfidence'],
+        'key': ('SchemeCode', 'Scheme')
+    },
+    'stocks': {
+        'folder': os.path.join('assets', 'Stocks'),
+        'output': os.path.join('assets', 'PersonalFiles', 'myPortfolio.csv'),
+        'columns': ['Stock', 'SharesOwned', 'AveragePrice', 'NSE_Symbol'],
+        'key': ('NSE_Symbol', 'Stock')
+    }
+}
+STATEMENT_EXTENSIONS = ('.xlsx', '.xlsm')
+
+# Path, size, mtime and content hash of every imported statement, so unchanged
+# statements are never re-read. Their parsed rows are kept next to it, one
+# <sha256>.csv per statement.
+IMPORT_MANIFEST_FILE = 'import_manifest.json'
+STATEMENT_RESULTS_DIR = 'statements'
+MANIFEST_VERSION = 1
+
+# Worker processes used to parse new or changed statements
+MAX_IMPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Statement dates in file names, e.g. Holdings_Statement_2025-04-30 or ..._03-05-2025
+DATE_PATTERNS = [(re.compile(r'(\d{4}-\d{2}-\d{2})'), '%Y-%m-%d'),
+                 (re.compile(r'(\d{2}-\d{2}-\d{4})'), '%d-%m-%Y')]
+
+def _manifest_path() -> str:
+    return os.path.join(quote_cache.CACHE_DIR, IMPORT_MANIFEST_FILE)
+
+def load_manifest() -> Dict:
+    """Load the import manifest; a missing or outdated one starts empty."""
+    try:
+        with open(_manifest_path(), 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'files': {}, 'merged': {}}
+
+def save_manifest(manifest: Dict) -> None:
+    """Atomically write the import manifest."""
+    try:
+        os.makedirs(quote_cache.CACHE_DIR, exist_ok=True)
+        tmp_path = _manifest_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, _manifest_path())
+    except OSError as e:
+        print(f"Error saving import manifest: {str(e)}")
+
+def file_sha256(path: str) -> str:
+    """Content hash of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def statement_date(path: str) -> str:
+    """Statement date (YYYY-MM-DD) from the file name, else the file's modification date."""
+    name = os.path.basename(path)
+    for pattern, date_format in DATE_PATTERNS:
+        match = pattern.search(name)
+        if match:
+            try:
+                return datetime.strptime(match.group(1), date_format).strftime('%Y-%m-%d')
+            except ValueError:
+                pass
+    return datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d')
+
+def scan_statements(kinds: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    """List (kind, path) for every statement workbook in the statement folders."""
+    found = []
+    for kind in kinds or STATEMENT_SOURCES:
+        folder = STATEMENT_SOURCES[kind]['folder']
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(STATEMENT_EXTENSIONS) and not name.startswith('~$'):
+                found.append((kind, os.path.join(folder, name)))
+    return found
+
+def parse_statement(kind: str, path: str) -> List[List]:
+    """Parse one statement into plain rows (runs in a worker process).
+
+    Mutual fund rows are (scheme, units, average NAV); their scheme codes are
+    resolved afterwards in the parent, in one pass over all new rows. Stock
+    rows already carry their NSE symbol; stocks without one are reported and
+    left out.
+    """
+    if kind == 'stocks':
+        holdings, unresolved = read_stock_holdings(path)
+        report_unresolved(unresolved, len(holdings) + len(unresolved))
+        return holdings.values.tolist()
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet_name, layout, rows = open_holdings_rows(workbook)
+        return [list(row) for row in iter_holdings_rows(rows, layout)]
+    finally:
+        workbook.close()
+
+def _parse_all(pending: List[Tuple[str, str]]) -> List[Tuple[Optional[List], Optional[str]]]:
+    """Parse statements, in worker processes when there is more than one; returns (rows, error) per file."""
+    if len(pending) == 1 or MAX_IMPORT_WORKERS == 1:
+        futures = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(MAX_IMPORT_WORKERS, len(pending)))
+        futures = [executor.submit(parse_statement, kind, path) for kind, path in pending]
+
+    results = []
+    try:
+        for i, (kind, path) in enumerate(pending):
+            try:
+                rows = futures[i].result() if futures else parse_statement(kind, path)
+                results.append((rows, None))
+            except Exception as e:
+                print(f"Error parsing statement {path}: {str(e)}")
+                results.append((None, str(e)))
+    finally:
+        if futures:
+            executor.shutdown()
+    return results
+
+def _result_path(sha256: str) -> str:
+    return os.path.join(quote_cache.CACHE_DIR, STATEMENT_RESULTS_DIR, sha256 + '.csv')
+
+def _store_results(entries: List[Dict]) -> None:
+    """Resolve scheme codes for freshly parsed rows and save each file's rows under its hash.
+
+    All new mutual fund rows go through the scheme matcher in a single call.
+    """
+    frames = {}
+    for kind in STATEMENT_SOURCES:
+        parsed = [entry for entry in entries if entry['kind'] == kind and entry['rows'] is not None]
+        if not parsed:
+            continue
+        if kind == 'mutual_funds':
+            df = pd.DataFrame([row for entry in parsed for row in entry['rows']],
+                              columns=['Scheme', 'UnitsOwned', 'AverageNAV'])
+            df = resolve_scheme_codes(df)
+        else:
+            df = pd.DataFrame([row for entry in parsed for row in entry['rows']],
+                              columns=STATEMENT_SOURCES[kind]['columns'])
+        df = df[STATEMENT_SOURCES[kind]['columns']]
+        start = 0
+        for entry in parsed:
+            frames[entry['path']] = df.iloc[start:start + len(entry['rows'])]
+            start += len(entry['rows'])
+
+    os.makedirs(os.path.join(quote_cache.CACHE_DIR, STATEMENT_RESULTS_DIR), exist_ok=True)
+    for entry in entries:
+        rows = frames.get(entry['path'])
+        entry.pop('rows', None)
+        if rows is None:
+            continue
+        path = _result_path(entry['sha256'])
+        rows.to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        entry['holdings'] = len(rows)
+
+def load_statement_rows(entry: Dict) -> pd.DataFrame:
+    """Read back the stored rows of an imported statement."""
+    code_col = STATEMENT_SOURCES[entry['kind']]['key'][0]
+    df = pd.read_csv(_result_path(entry['sha256']), dtype={code_col: str})
+    return df.fillna({code_col: ''})
+
+def merge_holdings(kind: str, statements: List[pd.DataFrame]) -> pd.DataFrame:
+    """Holdings table of the most recent statement.
+
+    `statements` are ordered oldest first. A statement lists everything held at
+    its date, so the latest one with rows is the whole position: holdings sold
+    since an older statement are gone. Rows of one holding (e.g. a scheme held
+    in two folios) are added together, keyed by scheme code / NSE symbol and
+    falling back to the name when that is blank.
+    """
+    source = STATEMENT_SOURCES[kind]
+    latest = next((df for df in reversed(statements) if not df.empty), None)
+    if latest is None:
+        return pd.DataFrame(columns=source['columns'])
+    return combine_duplicates(kind, latest)[source['columns']]
+
+def import_statements(kinds: Optional[List[str]] = None, force: bool = False) -> Dict[str, Dict]:
+    """Import every statement in the statement folders into the holdings store.
+
+    A file whose size and modification time are unchanged is trusted without
+    rehashing; otherwise its SHA-256 is compared with the manifest. Only new or
+    changed files are parsed (in a process pool), and each asset class is
+    replaced by its latest statement's holdings in one store transaction
+    (which also re-exports its CSV) only when the set of statements feeding
+    it changed.
+
+    Returns per kind {'files', 'new', 'failed', 'holdings', 'written'}.
+    """
+    scanned_kinds = list(kinds or STATEMENT_SOURCES)
+    manifest = load_manifest()
+    known = manifest['files']
+    if force:
+        known = {path: entry for path, entry in known.items() if entry['kind'] not in scanned_kinds}
+        for kind in scanned_kinds:
+            manifest['merged'].pop(kind, None)
+
+    current, pending = {}, []
+    for kind, path in scan_statements(scanned_kinds):
+        stat = os.stat(path)
+        entry = known.get(path)
+        # Failed files are retried on every run
+        reusable = (entry is not None and entry['kind'] == kind and not entry['error']
+                    and os.path.exists(_result_path(entry['sha256'])))
+        if reusable and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            current[path] = entry
+            continue
+        sha256 = file_sha256(path)
+        if reusable and entry['sha256'] == sha256:
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            current[path] = entry
+            continue
+        current[path] = {'kind': kind, 'path': path, 'sha256': sha256, 'size': stat.st_size,
+                         'mtime_ns': stat.st_mtime_ns, 'statement_date': statement_date(path),
+                         'holdings': 0, 'error': None}
+        # A renamed or re-downloaded copy of an imported statement reuses its rows
+        if force or not os.path.exists(_result_path(sha256)):
+            pending.append((kind, path))
+
+    # Identical files are parsed once
+    unique = list({current[path]['sha256']: (kind, path) for kind, path in pending}.values())
+    if unique:
+        print(f"Parsing {len(unique)} new or changed statement(s)")
+        for (kind, path), (rows, error) in zip(unique, _parse_all(unique)):
+            current[path].update(rows=rows, error=error)
+        _store_results([current[path] for kind, path in unique])
+        for kind, path in pending:
+            original = next(current[p] for k, p in unique if current[p]['sha256'] == current[path]['sha256'])
+            current[path].update(holdings=original['holdings'], error=original['error'])
+
+    # Files that dropped out of the folders are forgotten; other kinds are left as they were
+    manifest['files'] = {path: entry for path, entry in known.items() if entry['kind'] not in scanned_kinds}
+    manifest['files'].update(current)
+
+    summary = {}
+    for kind in scanned_kinds:
+        entries = sorted((entry for entry in current.values() if entry['kind'] == kind and not entry['error']),
+                         key=lambda entry: (entry['statement_date'], entry['path']))
+        fingerprint = hashlib.sha256(' '.join(entry['sha256'] for entry in entries).encode()).hexdigest()
+        output = STATEMENT_SOURCES[kind]['output']
+        result = {'files': sum(1 for entry in current.values() if entry['kind'] == kind),
+                  'new': sum(1 for k, path in pending if k == kind and not current[path]['error']),
+                  'failed': sum(1 for entry in current.values() if entry['kind'] == kind and entry['error']),
+                  'holdings': None, 'written': False}
+        summary[kind] = result
+
+        if not entries or (manifest['merged'].get(kind) == fingerprint and os.path.exists(output)):
+            continue
+
+        try:
+            merged = merge_holdings(kind, [load_statement_rows(entry) for entry in entries])
+            replace_holdings(kind, merged)
+        except Exception as e:
+            print(f"Error merging {kind} statements: {str(e)}")
+            continue
+
+        manifest['merged'][kind] = fingerprint
+        result.update(holdings=len(merged), written=True)
+        print(f"Merged {len(entries)} statement(s) into {output} ({len(merged)} holdings)")
+
+    save_manifest(manifest)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Import every statement in assets/MutualFunds and assets/Stocks')
+    parser.add_argument('--kind', choices=sorted(STATEMENT_SOURCES), action='append',
+                        help='Only import this kind of statement (repeatable)')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and re-read every statement')
+
+    args = parser.parse_args()
+
+    try:
+        for kind, result in import_statements(args.kind, args.force).items():
+            status = f"{result['holdings']} holdings written" if result['written'] else 'unchanged'
+            print(f"{kind}: {result['files']} file(s), {result['new']} new, "
+                  f"{result['failed']} failed, {status}")
+    except Exception as e:
+        print(f"Failed to import statements: {str(e)}")
+        exit(1)
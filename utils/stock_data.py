@@ -1,31 +1,109 @@
-import yfinance as yf
 import pandas as pd
 from typing import Dict, List
+import contextvars
 import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import quote_cache
+from utils.quote_engine import fetch_ticker_info
+
+# Sector/industry metadata is persisted next to the quote cache. It almost never
+# changes, so it is kept for a long time; failed lookups are retried much sooner.
+METADATA_FILE = 'stock_metadata.json'
+METADATA_TTL = 30 * 24 * 60 * 60
+FAILURE_RETRY_INTERVAL = 6 * 60 * 60
+
+# yfinance is paced by its own rate limiter, so a few workers are enough
+MAX_METADATA_WORKERS = 4
+
+DEFAULT_STOCK_INFO = {
+    'sector': 'Others',
+    'marketCap': 0,
+    'industry': 'Others'
+}
+
+_metadata_lock = threading.Lock()
+
+def _metadata_path() -> str:
+    return os.path.join(quote_cache.CACHE_DIR, METADATA_FILE)
+
+def _load_metadata() -> Dict:
+    try:
+        with open(_metadata_path(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_metadata(entries: Dict) -> None:
+    """Atomically write the metadata cache file."""
+    try:
+        os.makedirs(quote_cache.CACHE_DIR, exist_ok=True)
+        tmp_path = _metadata_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, _metadata_path())
+    except OSError as e:
+        print(f"Error saving stock metadata cache: {str(e)}")
+
+def fetch_stock_metadata(symbol: str) -> Dict:
+    """Fetch sector, industry and market cap for one symbol from yfinance."""
+    info = fetch_ticker_info(symbol)
+    return {
+        'sector': info.get('sector', 'Others'),
+        'marketCap': info.get('marketCap', 0),
+        'industry': info.get('industry', 'Others')
+    }
 
 def get_stock_info(symbols: List[str]) -> Dict:
-    """Fetch detailed information for given stock symbols."""
-    stock_info = {}
+    """Fetch detailed information for given stock symbols.
+
+    Served from the persisted metadata cache; only missing or expired symbols are
+    fetched, in parallel. A failed lookup keeps any older data for the symbol
+    (or the 'Others' defaults) and is retried after FAILURE_RETRY_INTERVAL.
+    """
+    symbols = list(dict.fromkeys(symbols))
     
-    for symbol in symbols:
-        try:
-            # Append .NS for NSE symbols
-            ticker = yf.Ticker(f"{symbol}.NS")
-            info = ticker.info
+    with _metadata_lock:
+        entries = _load_metadata()
+        now = time.time()
+        stale = [symbol for symbol in symbols
+                 if symbol not in entries or entries[symbol]['expires_at'] <= now]
+        
+        if stale:
+            workers = max(1, min(MAX_METADATA_WORKERS, len(stale)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {symbol: executor.submit(contextvars.copy_context().run, fetch_stock_metadata, symbol)
+                           for symbol in stale}
             
-            stock_info[symbol] = {
-                'sector': info.get('sector', 'Others'),
-                'marketCap': info.get('marketCap', 0),
-                'industry': info.get('industry', 'Others')
-            }
-        except:
-            stock_info[symbol] = {
-                'sector': 'Others',
-                'marketCap': 0,
-                'industry': 'Others'
-            }
+            fetched_at = time.time()
+            for symbol, future in futures.items():
+                try:
+                    info = future.result()
+                    entries[symbol] = dict(info, fetched_at=fetched_at,
+                                           expires_at=fetched_at + METADATA_TTL, failed=False)
+                except Exception as e:
+                    print(f"Error fetching stock info for {symbol}: {str(e)}")
+                    previous = entries.get(symbol, DEFAULT_STOCK_INFO)
+                    entries[symbol] = {
+                        'sector': previous['sector'],
+                        'marketCap': previous['marketCap'],
+                        'industry': previous['industry'],
+                        'fetched_at': previous.get('fetched_at', 0),
+                        'expires_at': fetched_at + FAILURE_RETRY_INTERVAL,
+                        'failed': True
+                    }
+            _save_metadata(entries)
     
-    return stock_info
+    return {
+        symbol: {
+            'sector': entries[symbol]['sector'],
+            'marketCap': entries[symbol]['marketCap'],
+            'industry': entries[symbol]['industry']
+        }
+        for symbol in symbols
+    }
 
 def calculate_portfolio_metrics(df: pd.DataFrame) -> Dict:
     """Calculate portfolio metrics including sector distribution."""
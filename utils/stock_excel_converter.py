@@ -0,0 +1,173 @@
+import pandas as pd
+import os
+import argparse
+from typing import Dict, Iterator, List, Optional, Tuple
+from openpyxl import load_workbook
+from utils.header_detection import detect_layout, STOCK_HOLDINGS_FIELDS, STOCK_HOLDINGS_REQUIRED
+from utils.http_client import request_deadline
+from utils.mf_excel_converter import find_excel_file, open_holdings_rows, to_number
+from utils.quote_engine import search_nse_symbols
+from utils.symbol_master import (SYMBOL_MASTER_FILE, ETF_MASTER_FILE, get_company_name,
+                                 get_symbol_for_isin, get_symbol_for_name)
+
+OUTPUT_COLUMNS = ['Stock', 'SharesOwned', 'AveragePrice', 'NSE_Symbol']
+
+# Where the NSE equity and ETF lists behind utils.symbol_master can be downloaded
+SYMBOL_MASTER_URL = 'https://archives.nseindia.com/content/equities/EQUITY_L.csv'
+ETF_MASTER_URL = 'https://archives.nseindia.com/content/equities/eq_etfseclist.csv'
+
+# Upper bound (seconds) on the Yahoo searches for stocks missing from the local index
+SYMBOL_SEARCH_DEADLINE = 10
+
+def find_stock_header(rows: List[Tuple]) -> Optional[Dict]:
+    """Find the header row and field columns among the first rows of a demat statement."""
+    return detect_layout(rows, STOCK_HOLDINGS_FIELDS, STOCK_HOLDINGS_REQUIRED)
+
+def resolve_nse_symbol(name: str, isin: str = '', symbol: str = '') -> str:
+    """Map a statement row to its NSE symbol through the local index ('' if unknown).
+
+    A listed symbol column wins, then the ISIN and the company name in the local
+    symbol master (and the known common securities), then the symbol column as
+    it is.
+    """
+    if symbol and get_company_name(symbol):
+        return symbol.strip().upper()
+    if isin:
+        resolved = get_symbol_for_isin(isin)
+        if resolved:
+            return resolved
+    resolved = get_symbol_for_name(name)
+    if resolved:
+        return resolved
+    return symbol.strip().upper()
+
+def search_unresolved(rows: List[Tuple[str, str]]) -> List[str]:
+    """Look up (name, ISIN) rows the local index missed with Yahoo searches.
+
+    All ISINs are searched in one concurrent batch, then the names of rows whose
+    ISIN found nothing. Returns the NSE symbol of each row ('' if still unknown).
+    """
+    with request_deadline(SYMBOL_SEARCH_DEADLINE):
+        by_isin = search_nse_symbols(isin for name, isin in rows if isin)
+        by_name = search_nse_symbols(name for name, isin in rows if not by_isin.get(isin))
+    return [by_isin.get(isin) or by_name.get(name) or '' for name, isin in rows]
+
+def iter_stock_rows(rows: Iterator[Tuple], layout: Dict) -> Iterator[Tuple[str, float, object, str, str]]:
+    """Yield (stock, shares, average price, NSE symbol, ISIN) for every data row.
+
+    Rows without a name or a numeric quantity (blank lines, totals) are skipped.
+    The average price comes from an average-price column, else invested value /
+    quantity, else it is left blank.
+    """
+    columns = layout['columns']
+    name_col, quantity_col = columns['name'], columns['quantity']
+    price_col, invested_col = columns.get('average_price'), columns.get('invested')
+    isin_col, symbol_col = columns.get('isin'), columns.get('symbol')
+
+    def cell(row, col):
+        return row[col] if col is not None and col < len(row) else None
+
+    for row in rows:
+        name = cell(row, name_col)
+        quantity = to_number(cell(row, quantity_col))
+        if name is None or quantity is None or not str(name).strip():
+            continue
+
+        average_price = to_number(cell(row, price_col))
+        if average_price is None and quantity:
+            invested = to_number(cell(row, invested_col))
+            average_price = round(invested / quantity, 4) if invested is not None else None
+
+        isin = str(cell(row, isin_col) or '').strip()
+        symbol = str(cell(row, symbol_col) or '').strip()
+        yield (str(name).strip(), quantity, average_price if average_price is not None else '',
+               resolve_nse_symbol(str(name), isin, symbol), isin)
+
+def read_stock_holdings(excel_file: str, search: bool = True) -> Tuple[pd.DataFrame, List[str]]:
+    """Read a demat holdings workbook into a DataFrame with the OUTPUT_COLUMNS.
+
+    The workbook is opened once in read-only mode and streamed row by row,
+    resolving symbols through the local index. Rows it misses are searched on
+    Yahoo afterwards, in one batch (unless `search` is False). Returns the rows
+    that have an NSE symbol and the names of the stocks that still have none,
+    which could never be priced.
+    """
+    workbook = load_workbook(find_excel_file(excel_file, 'Stocks'), read_only=True, data_only=True)
+    try:
+        sheet_name, layout, rows = open_holdings_rows(workbook, find_stock_header)
+        holdings = pd.DataFrame(list(iter_stock_rows(rows, layout)), columns=OUTPUT_COLUMNS + ['ISIN'])
+    finally:
+        workbook.close()
+
+    missing = holdings['NSE_Symbol'] == ''
+    if search and missing.any():
+        holdings.loc[missing, 'NSE_Symbol'] = search_unresolved(
+            list(zip(holdings.loc[missing, 'Stock'], holdings.loc[missing, 'ISIN'])))
+        missing = holdings['NSE_Symbol'] == ''
+
+    unresolved = list(dict.fromkeys(holdings.loc[missing, 'Stock']))
+    return holdings.loc[~missing, OUTPUT_COLUMNS].reset_index(drop=True), unresolved
+
+def report_unresolved(unresolved: List[str], total: int) -> None:
+    """Print the stocks left out of an import for lack of an NSE symbol, and how to fix it."""
+    if unresolved:
+        print(f"Skipped {len(unresolved)} of {total} stocks with no NSE symbol: {', '.join(unresolved)}. "
+              f"Download the NSE equity list ({SYMBOL_MASTER_URL}) to {SYMBOL_MASTER_FILE} and the ETF list "
+              f"({ETF_MASTER_URL}) to {ETF_MASTER_FILE}, or add a Symbol column to the statement, "
+              f"and import it again.")
+
+def convert_stock_holdings_to_csv(excel_file, output_csv=None):
+    """
+    Convert a stock holdings (demat) statement to the format needed for the StockPicker app.
+
+    Parameters:
+    -----------
+    excel_file : str
+        Path to the Excel file containing the stock holdings statement
+    output_csv : str, optional
+        Path where the CSV should be saved. If None, will save to default location.
+
+    Returns:
+    --------
+    str
+        Path to the saved CSV file
+    """
+    try:
+        print(f"Reading Excel file: {excel_file}")
+        holdings, unresolved = read_stock_holdings(excel_file)
+        if holdings.empty and not unresolved:
+            raise ValueError("Could not identify stock holdings in the Excel file")
+        report_unresolved(unresolved, len(holdings) + len(unresolved))
+
+        if output_csv is None:
+            output_dir = 'assets/PersonalFiles'
+            os.makedirs(output_dir, exist_ok=True)
+            output_csv = os.path.join(output_dir, 'myPortfolio.csv')
+
+        # One bulk write, swapped in atomically
+        tmp_csv = output_csv + '.tmp'
+        holdings.to_csv(tmp_csv, index=False)
+        os.replace(tmp_csv, output_csv)
+
+        print(f"Successfully converted stock holdings to: {output_csv}")
+        print(f"Wrote {len(holdings)} stocks mapped to NSE symbols")
+
+        return output_csv
+
+    except Exception as e:
+        print(f"Error converting Excel file: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a stock holdings statement to CSV format for StockPicker')
+    parser.add_argument('excel_file', help='Path to the stock holdings Excel file')
+    parser.add_argument('--output', '-o', help='Output CSV file path (optional)')
+
+    args = parser.parse_args()
+
+    try:
+        output_path = convert_stock_holdings_to_csv(args.excel_file, args.output)
+        print(f"Conversion completed. CSV saved to: {output_path}")
+    except Exception as e:
+        print(f"Failed to convert holdings: {str(e)}")
+        exit(1)
@@ -0,0 +1,234 @@
+import csv
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# NSE's list of equity securities (EQUITY_L.csv from nseindia.com), dropped into assets/
+SYMBOL_MASTER_FILE = os.path.join('assets', 'EQUITY_L.csv')
+
+# NSE's list of ETFs (eq_etfseclist.csv), which EQUITY_L.csv does not include
+ETF_MASTER_FILE = os.path.join('assets', 'eq_etfseclist.csv')
+
+# Completions kept per trie node, i.e. the most suggestions a prefix can return
+MAX_SUGGESTIONS = 10
+
+# Common Indian stocks, known without the master file (HDFC Bank trades as
+# HDFCBANK since HDFC Ltd merged into it)
+KNOWN_COMPANY_NAMES = {
+    'SBIN': 'State Bank Of India',
+    'HDFCBANK': 'HDFC Bank Ltd',
+    'ICICIBANK': 'ICICI Bank Ltd',
+    'INFY': 'Infosys Ltd',
+    'TATAMOTORS': 'Tata Motors Ltd',
+    'IREDA': 'Indian Renewable Energy Development Agency',
+    'IEX': 'Indian Energy Exchange',
+    'NHPC': 'NHPC Ltd',
+    'NTPC': 'NTPC Ltd',
+    'BEL': 'Bharat Electronics Ltd',
+    'GAIL': 'GAIL (India) Ltd',
+    'LTF': 'L&T Finance Ltd',
+    'ITC': 'ITC Ltd',
+    'PNB': 'Punjab National Bank',
+    'IDBI': 'IDBI Bank Ltd',
+    'MON100': 'Motilal Oswal NASDAQ 100 ETF',
+    'MONQ50': 'Motilal Oswal Nasdaq Q50 ETF',
+}
+
+# ISINs of commonly held securities (ETFs included), known without the master files
+KNOWN_ISINS = {
+    'INE364U01010': 'ADANIGREEN',
+    'INE814H01011': 'ADANIPOWER',
+    'INE438A01022': 'APOLLOTYRE',
+    'INE208A01029': 'ASHOKLEY',
+    'INE238A01034': 'AXISBANK',
+    'INE545U01014': 'BANDHANBNK',
+    'INE084A01016': 'BANKINDIA',
+    'INE263A01024': 'BEL',
+    'INE153T01027': 'BLS',
+    'INE172A01027': 'CASTROLIND',
+    'INE271C01023': 'DLF',
+    'INE758T01015': 'ETERNAL',
+    'INE129A01019': 'GAIL',
+    'INE040A01034': 'HDFCBANK',
+    'INE090A01021': 'ICICIBANK',
+    'INE008A01015': 'IDBI',
+    'INE092T01019': 'IDFCFIRSTB',
+    'INE022Q01020': 'IEX',
+    'INE009A01021': 'INFY',
+    'INE202E01016': 'IREDA',
+    'INE154A01025': 'ITC',
+    'INE758E01017': 'JIOFIN',
+    'INE573A01042': 'JKTYRE',
+    'INE197A01024': 'JYOTISTRUC',
+    'INE498L01015': 'LTF',
+    'INE813A01018': 'MAHLIFE',
+    'INE775A01035': 'MOTHERSON',
+    'INF247L01AP3': 'MON100',
+    'INF247L01AU3': 'MONQ50',
+    'INE868B01028': 'NCC',
+    'INE848E01016': 'NHPC',
+    'INE584A01023': 'NMDC',
+    'INE733E01010': 'NTPC',
+    'INE0ONG01011': 'NTPCGREEN',
+    'INE093I01010': 'OBEROIRLTY',
+    'INE160A01022': 'PNB',
+    'INE891D01026': 'REDINGTON',
+    'INE614G01033': 'RPOWER',
+    'INE062A01020': 'SBIN',
+    'INE217L01019': 'SHRIRAMPPS',
+    'INE040H01021': 'SUZLON',
+    'INE155A01022': 'TATAMOTORS',
+    'INE245A01021': 'TATAPOWER',
+    'INE081A01020': 'TATASTEEL',
+    'INE806A01020': 'VIKASECO',
+}
+
+# Company-name suffixes that statements and the NSE list spell differently
+NAME_SUFFIXES = {'LTD', 'LIMITED', 'CO', 'COMPANY', 'CORP', 'CORPORATION', 'THE', 'AND'}
+
+_master = None
+_master_source = None
+_lock = threading.Lock()
+
+def parse_symbol_master(lines: Iterable[str]) -> Dict[str, Dict]:
+    """Parse NSE's EQUITY_L.csv (or its ETF list) into a dict keyed by symbol.
+
+    EQUITY_L.csv's header looks like `SYMBOL,NAME OF COMPANY, SERIES, DATE OF
+    LISTING, ..., ISIN NUMBER, FACE VALUE` (note the stray spaces); the ETF list
+    has `Symbol,Underlying,SecurityName,...,ISINNumber,FaceValue`. Column names
+    are compared without case or spaces.
+    """
+    entries = {}
+    reader = csv.reader(lines)
+    header = [re.sub(r'[^A-Z]', '', column.upper()) for column in next(reader, [])]
+    name_col = next((header.index(column) for column in ('NAMEOFCOMPANY', 'SECURITYNAME') if column in header), None)
+    if 'SYMBOL' not in header or name_col is None:
+        return entries
+
+    symbol_col = header.index('SYMBOL')
+    isin_col = header.index('ISINNUMBER') if 'ISINNUMBER' in header else None
+    series_col = header.index('SERIES') if 'SERIES' in header else None
+
+    for row in reader:
+        if len(row) <= max(symbol_col, name_col):
+            continue
+        symbol = row[symbol_col].strip().upper()
+        if not symbol:
+            continue
+        entries[symbol] = {
+            'symbol': symbol,
+            'name': row[name_col].strip(),
+            'isin': row[isin_col].strip().upper() if isin_col is not None and len(row) > isin_col else '',
+            'series': row[series_col].strip() if series_col is not None and len(row) > series_col else ''
+        }
+
+    return entries
+
+def normalize_company_name(name: str) -> str:
+    """Comparable form of a company name: upper-case words without punctuation or suffixes."""
+    words = re.split(r'[^A-Z0-9]+', str(name).upper().replace('&', ' AND '))
+    return ' '.join(word for word in words if word and word not in NAME_SUFFIXES)
+
+def _insert(trie: Dict, key: str, symbol: str) -> None:
+    """Add `symbol` as a completion of every prefix of `key`."""
+    node = trie
+    for char in key:
+        node = node['next'].setdefault(char, {'next': {}, 'symbols': []})
+        if len(node['symbols']) < MAX_SUGGESTIONS and symbol not in node['symbols']:
+            node['symbols'].append(symbol)
+
+def build_trie(entries: Dict[str, Dict]) -> Dict:
+    """Build a prefix trie over symbols and company names.
+
+    Each node stores its first MAX_SUGGESTIONS completions, so a lookup costs one
+    step per typed character. Symbol matches rank before company-name matches.
+    """
+    trie = {'next': {}, 'symbols': []}
+    for symbol in sorted(entries):
+        _insert(trie, symbol, symbol)
+    for symbol in sorted(entries, key=lambda s: entries[s]['name'].upper()):
+        _insert(trie, entries[symbol]['name'].upper(), symbol)
+    return trie
+
+def load_symbol_master(path: Optional[str] = None, refresh: bool = False) -> Dict:
+    """Return the symbol master index, rebuilding it when a master CSV changes on disk.
+
+    The index holds `symbols` (symbol -> entry), `isins` (ISIN -> symbol),
+    `names` (normalized company name -> symbol) and the prefix `trie`, built
+    from the equity list at `path` and the ETF list. `isins` also holds
+    KNOWN_ISINS; everything else is empty until a master file has been added.
+    """
+    global _master, _master_source
+
+    paths = (path or SYMBOL_MASTER_FILE, ETF_MASTER_FILE)
+    source = []
+    for master_path in paths:
+        try:
+            source.append((master_path, os.path.getmtime(master_path)))
+        except OSError:
+            source.append((master_path, None))
+    source = tuple(source)
+
+    with _lock:
+        if _master is not None and not refresh and _master_source == source:
+            return _master
+
+        entries = {}
+        for master_path, mtime in source:
+            if mtime is None:
+                continue
+            try:
+                with open(master_path, 'r', encoding='utf-8-sig', newline='') as f:
+                    # A security in both lists keeps its equity-list entry
+                    for symbol, entry in parse_symbol_master(f).items():
+                        entries.setdefault(symbol, entry)
+            except (OSError, csv.Error) as e:
+                print(f"Error loading NSE symbol master {master_path}: {str(e)}")
+
+        isins = dict(KNOWN_ISINS)
+        isins.update({entry['isin']: symbol for symbol, entry in entries.items() if entry['isin']})
+        _master = {
+            'symbols': entries,
+            'isins': isins,
+            'names': {normalize_company_name(entry['name']): symbol for symbol, entry in entries.items()},
+            'trie': build_trie(entries)
+        }
+        _master_source = source
+        return _master
+
+def get_company_name(symbol: str) -> Optional[str]:
+    """Exact symbol -> company name lookup, or None if the symbol is not listed."""
+    entry = load_symbol_master()['symbols'].get(str(symbol).strip().upper())
+    return entry['name'] if entry else None
+
+def get_symbol_for_isin(isin: str) -> Optional[str]:
+    """Exact ISIN -> NSE symbol lookup, or None if the ISIN is not listed."""
+    return load_symbol_master()['isins'].get(str(isin).strip().upper())
+
+def get_symbol_for_name(name: str) -> Optional[str]:
+    """Company name -> NSE symbol, ignoring case, punctuation and Ltd/Limited-style suffixes.
+
+    Falls back to KNOWN_COMPANY_NAMES for names the master file does not list.
+    """
+    normalized = normalize_company_name(name)
+    symbol = load_symbol_master()['names'].get(normalized)
+    if symbol:
+        return symbol
+    return next((symbol for symbol, company in KNOWN_COMPANY_NAMES.items()
+                 if normalize_company_name(company) == normalized), None)
+
+def suggest_symbols(prefix: str, limit: int = MAX_SUGGESTIONS) -> List[Dict]:
+    """Return up to `limit` listed securities whose symbol or name starts with `prefix`."""
+    prefix = str(prefix or '').strip().upper()
+    if not prefix:
+        return []
+
+    master = load_symbol_master()
+    node = master['trie']
+    for char in prefix:
+        node = node['next'].get(char)
+        if node is None:
+            return []
+
+    return [master['symbols'][symbol] for symbol in node['symbols'][:limit]]
@@ -0,0 +1,42 @@
+import os
+import pytest
+from utils import amfi_nav
+from utils.amfi_nav import get_index_navs, load_nav_index
+
+NAV_FIXTURE = os.path.join(os.path.dirname(__file__), 'testdata', 'NAVAll.txt')
+
+@pytest.fixture
+def index():
+    return load_nav_index(NAV_FIXTURE)
+
+def test_every_scheme_line_is_parsed(index):
+    assert sorted(index) == ['100001', '119551', '119552', '119598', '122639']
+
+def test_scheme_fields(index):
+    scheme = index['122639']
+    assert scheme['scheme_name'] == 'Parag Parikh Flexi Cap Fund - Direct Plan - Growth'
+    assert scheme['nav'] == 90.6421
+    assert scheme['date'] == '14-Oct-2025'
+    assert scheme['isin_growth'] == 'INF879O01027'
+    # "-" marks a missing ISIN
+    assert scheme['isin_reinvestment'] == ''
+
+def test_category_and_fund_house_headers_apply_to_the_lines_below(index):
+    assert index['119551']['scheme_category'] == 'Open Ended Schemes(Debt Scheme - Banking and PSU Fund)'
+    assert index['119551']['fund_house'] == 'Aditya Birla Sun Life Mutual Fund'
+    assert index['122639']['scheme_category'] == 'Open Ended Schemes ( Equity Scheme - Flexi Cap Fund )'
+    assert index['122639']['fund_house'] == 'PPFAS Mutual Fund'
+    assert index['119598']['fund_house'] == 'SBI Mutual Fund'
+
+def test_suspended_scheme_has_no_nav(index):
+    assert index['100001']['nav'] == 0.0
+
+def test_lookups_leave_out_unlisted_and_suspended_schemes(index, monkeypatch):
+    monkeypatch.setattr(amfi_nav, 'load_nav_index', lambda: index)
+    assert get_index_navs(['122639', 119598, '100001', '999999']) == {'122639': 90.6421, 119598: 98.12}
+
+def test_windows_line_endings(index):
+    # AMFI serves the file with CRLF line endings
+    with open(NAV_FIXTURE, 'r', encoding='utf-8') as f:
+        text = f.read()
+    assert amfi_nav.parse_nav_file(text.replace('\n', '\r\n')) == index
@@ -0,0 +1,112 @@
+import pytest
+import requests
+from utils import circuit_breaker, http_client, rate_limiter
+from utils.circuit_breaker import CLOSED, OPEN, HALF_OPEN, CircuitOpenError
+
+HOST = 'circuit.test'
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, 'time', fake.time)
+    monkeypatch.setattr(circuit_breaker, '_circuits', {})
+    return fake
+
+def trip(host=HOST):
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+        circuit_breaker.record_failure(host)
+
+def test_trips_after_consecutive_failures(clock):
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD - 1):
+        circuit_breaker.record_failure(HOST)
+    assert circuit_breaker.get_state(HOST) == CLOSED
+
+    circuit_breaker.record_failure(HOST)
+    assert circuit_breaker.get_state(HOST) == OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.check(HOST)
+
+def test_success_resets_the_failure_count(clock):
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD - 1):
+        circuit_breaker.record_failure(HOST)
+    circuit_breaker.record_success(HOST)
+    circuit_breaker.record_failure(HOST)
+    assert circuit_breaker.get_state(HOST) == CLOSED
+
+def test_one_trial_after_the_reset_timeout(clock):
+    trip()
+    clock.now += circuit_breaker.RESET_TIMEOUT
+
+    circuit_breaker.check(HOST)
+    assert circuit_breaker.get_state(HOST) == HALF_OPEN
+    # Only one trial at a time
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.check(HOST)
+
+def test_trial_outcome_closes_or_reopens(clock):
+    trip()
+    clock.now += circuit_breaker.RESET_TIMEOUT
+    circuit_breaker.check(HOST)
+    circuit_breaker.record_success(HOST)
+    assert circuit_breaker.get_state(HOST) == CLOSED
+
+    trip()
+    clock.now += circuit_breaker.RESET_TIMEOUT
+    circuit_breaker.check(HOST)
+    circuit_breaker.record_failure(HOST)
+    assert circuit_breaker.get_state(HOST) == OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.check(HOST)
+
+def test_unreported_trial_times_out(clock):
+    trip()
+    clock.now += circuit_breaker.RESET_TIMEOUT
+    circuit_breaker.check(HOST)
+
+    clock.now += circuit_breaker.RESET_TIMEOUT - 1
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.check(HOST)
+    clock.now += 1
+    circuit_breaker.check(HOST)
+    assert circuit_breaker.get_state(HOST) == HALF_OPEN
+
+def test_deadline_before_the_request_gives_the_trial_back(clock, monkeypatch):
+    def out_of_time(host, deadline=None):
+        raise TimeoutError("Deadline reached waiting for a request slot")
+
+    def unreachable(*args, **kwargs):
+        raise AssertionError("the host must not be called")
+
+    monkeypatch.setattr(rate_limiter, 'acquire', out_of_time)
+    monkeypatch.setattr(http_client.get_session(), 'get', unreachable)
+    trip()
+    clock.now += circuit_breaker.RESET_TIMEOUT
+
+    with pytest.raises(TimeoutError):
+        http_client.get(f'https://{HOST}/quote')
+    assert circuit_breaker.get_state(HOST) == OPEN
+    # The next call gets the trial right away instead of being blocked for good
+    circuit_breaker.check(HOST)
+    assert circuit_breaker.get_state(HOST) == HALF_OPEN
+
+def test_connection_error_on_the_trial_reopens(clock, monkeypatch):
+    def refused(*args, **kwargs):
+        raise requests.ConnectionError("refused")
+
+    monkeypatch.setattr(rate_limiter, 'acquire', lambda host, deadline=None: None)
+    monkeypatch.setattr(http_client.get_session(), 'get', refused)
+    trip()
+    clock.now += circuit_breaker.RESET_TIMEOUT
+
+    with pytest.raises(requests.ConnectionError):
+        http_client.get(f'https://{HOST}/quote')
+    assert circuit_breaker.get_state(HOST) == OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.check(HOST)
@@ -0,0 +1,72 @@
+import os
+import pytest
+from utils import holdings_store, ledger
+from utils.ledger import apply_event
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Holdings store and its CSV mirror in a temp dir."""
+    monkeypatch.setattr(holdings_store, 'HOLDINGS_DB_FILE', str(tmp_path / 'holdings.db'))
+    monkeypatch.setattr(holdings_store, 'PERSONAL_FILES_DIR', str(tmp_path))
+    return tmp_path
+
+def test_buys_average_their_cost():
+    state = apply_event((0.0, 0.0, 0.0), 'buy', 10, 100)
+    state = apply_event(state, 'buy', 30, 140)
+    assert state == (40, 5200, 0)
+
+def test_sells_realize_against_the_average_cost():
+    state = apply_event((40.0, 5200.0, 0.0), 'sell', 10, 150)
+    # Average cost is 130: 10 * (150 - 130) is realized, the average stays 130
+    assert state == pytest.approx((30, 3900, 200))
+    assert apply_event(state, 'sell', 30, 120) == pytest.approx((0, 0, 200 - 300))
+
+def test_opening_sets_the_position_and_keeps_realized():
+    assert apply_event((5.0, 50.0, 12.0), 'opening', 8, 20) == (8, 160, 12)
+
+def test_oversell_and_bad_quantities_raise():
+    with pytest.raises(ValueError, match='only 10 held'):
+        apply_event((10.0, 1000.0, 0.0), 'sell', 11, 100)
+    with pytest.raises(ValueError):
+        apply_event((10.0, 1000.0, 0.0), 'buy', 0, 100)
+
+def test_record_event_updates_holdings_and_realized_pnl(store):
+    ledger.record_event('stocks', 'buy', 'sbin', 'State Bank Of India', 10, 700, date='2025-01-02')
+    ledger.record_event('stocks', 'buy', 'SBIN', '', 10, 800, date='2025-02-03')
+    position = ledger.record_event('stocks', 'sell', 'SBIN', '', 5, 900, date='2025-03-04')
+
+    assert position['quantity'] == 15
+    assert position['average_price'] == pytest.approx(750)
+    assert position['realized_pnl'] == pytest.approx(750)
+
+    holdings = ledger.load_positions('stocks')
+    assert holdings[['NSE_Symbol', 'SharesOwned', 'AveragePrice', 'RealizedPnL']].values.tolist() == \
+        [['SBIN', 15, 750, 750]]
+    assert os.path.exists(holdings_store.csv_path('stocks'))
+    assert ledger.get_ledger('stocks')['event'].tolist() == ['buy', 'buy', 'sell']
+
+def test_oversell_writes_nothing(store):
+    ledger.record_event('stocks', 'buy', 'ITC', 'ITC Ltd', 10, 400, date='2025-01-02')
+
+    with pytest.raises(ValueError):
+        ledger.record_event('stocks', 'sell', 'ITC', '', 11, 420, date='2025-01-03')
+
+    assert len(ledger.get_ledger('stocks')) == 1
+    assert ledger.load_positions('stocks')['SharesOwned'].tolist() == [10]
+    assert ledger.get_realized_pnl('stocks') == 0
+
+def test_selling_everything_closes_the_position(store):
+    ledger.record_event('stocks', 'buy', 'ITC', 'ITC Ltd', 10, 400, date='2025-01-02')
+    ledger.record_event('stocks', 'sell', 'ITC', '', 10, 450, date='2025-01-03')
+
+    assert ledger.load_positions('stocks').empty
+    assert ledger.get_realized_pnl('stocks') == pytest.approx(500)
+
+def test_changes_since_reports_backdated_events(store):
+    ledger.record_event('stocks', 'buy', 'ITC', 'ITC Ltd', 10, 400, date='2025-03-01')
+    latest, earliest = ledger.changes_since()
+    assert (latest, earliest) == (1, '2025-03-01')
+
+    ledger.record_event('stocks', 'buy', 'ITC', '', 5, 380, date='2025-02-01')
+    assert ledger.changes_since(latest) == (2, '2025-02-01')
+    assert ledger.changes_since(2) == (2, None)
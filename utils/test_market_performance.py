@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from utils import market_performance
+from utils.market_performance import NIFTY_SYMBOL, get_performance_figure, performance_series
+
+TODAY = np.datetime64('2025-01-10')
+
+HISTORY = {
+    NIFTY_SYMBOL: (['2025-01-06', '2025-01-07', '2025-01-08', '2025-01-09', '2025-01-10'],
+                   [100.0, 101.0, 102.0, 103.0, 104.0]),
+    'OLD': (['2024-12-31', '2025-01-06', '2025-01-07', '2025-01-08', '2025-01-09', '2025-01-10'],
+            [10.0, 10.0, 11.0, 12.0, 13.0, 14.0]),
+    # Listed on the 8th
+    'NEW': (['2025-01-08', '2025-01-10'], [20.0, 22.0])
+}
+
+@pytest.fixture
+def history(monkeypatch):
+    def closes(symbol, start, end):
+        dates, values = HISTORY.get(symbol, ([], []))
+        dates = np.array(dates, dtype='datetime64[D]')
+        keep = (dates >= start) & (dates <= end)
+        return dates[keep], np.array(values, dtype=np.float64)[keep]
+
+    monkeypatch.setattr(market_performance, '_closes', closes)
+
+def test_series_starts_when_every_stock_has_a_close(history):
+    series = performance_series('1M', {'OLD': 1, 'NEW': 1}, TODAY)
+
+    assert series['dates'][0] == np.datetime64('2025-01-08')
+    # 12 + 20 on the 8th, 13 + 20 (NEW forward-filled) on the 9th, 14 + 22 on the 10th
+    assert series['portfolio'] == pytest.approx([100.0, 100 * 33 / 32, 100 * 36 / 32])
+    assert series['nifty'] == pytest.approx([100.0, 100 * 103 / 102, 100 * 104 / 102])
+
+def test_stocks_without_history_are_left_out(history):
+    series = performance_series('1M', {'OLD': 2, 'MISSING': 5}, TODAY)
+    assert series['dates'][0] == np.datetime64('2025-01-06')
+    assert series['portfolio'][-1] == pytest.approx(140.0)
+
+def test_figures_of_old_holdings_are_dropped(monkeypatch):
+    holdings = {'quantities': {'OLD': 1}}
+    monkeypatch.setattr(market_performance, '_figures', {})
+    monkeypatch.setattr(market_performance, '_stock_quantities', lambda: dict(holdings['quantities']))
+    monkeypatch.setattr(market_performance, 'history_version', lambda quantities: 'v1')
+    monkeypatch.setattr(market_performance, 'performance_series', lambda range_key, quantities: range_key)
+
+    get_performance_figure('1M', lambda series: series)
+    get_performance_figure('1Y', lambda series: series)
+    assert len(market_performance._figures) == 2
+
+    holdings['quantities'] = {'OLD': 2}
+    get_performance_figure('1M', lambda series: series)
+    assert list(market_performance._figures) == [(market_performance.holdings_hash({'OLD': 2}), '1M')]
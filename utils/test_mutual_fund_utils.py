@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils import last_known_good, mutual_fund_utils, quote_cache
+
+@pytest.fixture
+def positions(tmp_path, monkeypatch):
+    """Two ledger positions, the second one a scheme the converter could not match."""
+    monkeypatch.setattr(quote_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(last_known_good, '_entries', None)
+    df = pd.DataFrame({
+        'Scheme': ['SBI Blue Chip Fund-Direct Plan-Growth', 'Some Unmatched Scheme'],
+        'UnitsOwned': [10.0, 5.0],
+        'AverageNAV': [40.0, 20.0],
+        'SchemeCode': ['119598', ''],
+        'RealizedPnL': [0.0, 0.0],
+    })
+    monkeypatch.setattr(mutual_fund_utils, 'load_positions', lambda asset: df.copy())
+    monkeypatch.setattr(mutual_fund_utils, 'get_index_navs', lambda codes: {'119598': 50.0})
+    monkeypatch.setattr(mutual_fund_utils, 'holding_returns',
+                        lambda asset, keys, values, prices: pd.DataFrame({'xirr': np.full(len(keys), np.nan),
+                                                                          'twr': np.full(len(keys), np.nan)}))
+    looked_up = []
+    monkeypatch.setattr(mutual_fund_utils, 'fetch_mf_nav', lambda code: looked_up.append(code) or 0)
+    return looked_up
+
+def test_blank_scheme_code_shows_as_unavailable(positions):
+    df = mutual_fund_utils.load_mf_portfolio_data()
+
+    assert positions == []
+    priced, unmatched = df.iloc[0], df.iloc[1]
+    assert priced['Current NAV'] == 50.0
+    assert priced['Current Value'] == 500.0
+    assert priced['NAV Source'] == 'Live'
+    assert unmatched['Current NAV'] == 0
+    assert unmatched['Current Value'] == 0
+    assert unmatched['NAV Source'] == 'Unavailable'
+    assert unmatched['TotalInvestment'] == 100.0
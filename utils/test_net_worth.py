@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from utils import net_worth, quote_cache
+
+TODAY = np.datetime64('2025-05-10', 'D')
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A net worth store with no held codes, stubbed inputs and a record of valued grids."""
+    monkeypatch.setattr(quote_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(net_worth, '_loaded', {})
+    monkeypatch.setattr(net_worth, 'NET_WORTH_HISTORY_DAYS', 30)
+    monkeypatch.setattr(net_worth, '_today', lambda: TODAY)
+    monkeypatch.setattr(net_worth, '_held_codes', lambda: {'stocks': [], 'mutual_funds': []})
+
+    state = {'ledger': (0, None), 'savings': (0, None), 'grids': [], 'saves': 0}
+    monkeypatch.setattr(net_worth.ledger, 'changes_since', lambda last_id=0: state['ledger'])
+    monkeypatch.setattr(net_worth.savings_store, 'changes_since', lambda last_id=0: state['savings'])
+
+    def value_days(grid, today):
+        state['grids'].append(grid)
+        values = (grid - np.datetime64('2025-01-01', 'D')).astype(np.float64)
+        return {'stocks': values, 'net_worth': values}
+
+    save = net_worth._save
+
+    def counting_save(series):
+        state['saves'] += 1
+        save(series)
+
+    monkeypatch.setattr(net_worth, 'value_days', value_days)
+    monkeypatch.setattr(net_worth, '_save', counting_save)
+    return state
+
+def test_first_update_builds_the_history(store):
+    assert net_worth.update_net_worth() == 31
+    series = net_worth.load_net_worth()
+    assert series['dates'][0] == TODAY - 30
+    assert series['dates'][-1] == TODAY
+
+def test_later_updates_revalue_only_the_newest_rows(store):
+    net_worth.update_net_worth()
+
+    # Only today is provisional; it values the same, so nothing is written
+    assert net_worth.update_net_worth() == 0
+    assert store['grids'][-1].tolist() == [TODAY]
+    assert store['saves'] == 1
+
+def test_backdated_event_revalues_from_its_date(store):
+    net_worth.update_net_worth()
+    store['ledger'] = (7, '2025-05-01')
+
+    net_worth.update_net_worth()
+
+    assert store['grids'][-1][0] == np.datetime64('2025-05-01', 'D')
+    series = net_worth.load_net_worth()
+    assert int(series['ledger_through']) == 7
+    assert len(series['dates']) == 31
+
+    # Seen events are not revalued again
+    store['ledger'] = (7, None)
+    net_worth.update_net_worth()
+    assert store['grids'][-1].tolist() == [TODAY]
@@ -0,0 +1,88 @@
+from urllib.parse import urlparse
+import pytest
+from utils import circuit_breaker, http_client, rate_limiter
+from utils.quote_engine import YAHOO_SPARK_URL, get_live_prices
+
+class StubResponse:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self.headers = {}
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise http_client.requests.HTTPError(f"{self.status_code} error")
+
+class StubSession:
+    """Answers Yahoo's spark and chart endpoints from a price table, recording every call."""
+
+    def __init__(self, prices, spark_status=200):
+        self.prices = prices
+        self.spark_status = spark_status
+        self.calls = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        if url == YAHOO_SPARK_URL:
+            symbols = params['symbols'].split(',')
+            self.calls.append(('spark', symbols))
+            if self.spark_status != 200:
+                return StubResponse(self.spark_status)
+            # Symbols Yahoo has no data for are missing from the batch response
+            result = [{'symbol': symbol, 'response': [{'meta': {'regularMarketPrice': self.prices[symbol[:-3]]}}]}
+                      for symbol in symbols if symbol[:-3] in self.prices and not symbol.startswith('SLOW')]
+            return StubResponse(payload={'spark': {'result': result}})
+
+        symbol = urlparse(url).path.rsplit('/', 1)[-1][:-3]
+        self.calls.append(('chart', symbol))
+        meta = {'regularMarketPrice': self.prices[symbol]} if symbol in self.prices else {}
+        return StubResponse(payload={'chart': {'result': [{'meta': meta}]}})
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(prices, spark_status=200):
+        stub = StubSession(prices, spark_status)
+        monkeypatch.setattr(http_client, '_session', stub)
+        return stub
+
+    monkeypatch.setattr(circuit_breaker, '_circuits', {})
+    monkeypatch.setattr(rate_limiter, 'acquire', lambda host, deadline=None: None)
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt: 0.0)
+    return install
+
+def test_batches_pack_symbols(session):
+    stub = session({f'S{i}': float(i + 1) for i in range(5)})
+
+    prices = get_live_prices([f'S{i}' for i in range(5)], batch_size=2)
+
+    assert prices == {f'S{i}': float(i + 1) for i in range(5)}
+    assert sorted(len(symbols) for kind, symbols in stub.calls) == [1, 2, 2]
+    assert all(kind == 'spark' for kind, symbols in stub.calls)
+
+def test_symbols_missing_from_a_batch_fall_back_to_the_chart_endpoint(session):
+    stub = session({'SBIN': 800.0, 'SLOWCO': 12.5, 'ITC': 430.0})
+
+    prices = get_live_prices(['SBIN', 'SLOWCO', 'ITC', 'UNLISTED'])
+
+    assert prices == {'SBIN': 800.0, 'SLOWCO': 12.5, 'ITC': 430.0}
+    assert sorted(symbol for kind, symbol in stub.calls if kind == 'chart') == ['SLOWCO', 'UNLISTED']
+
+def test_a_failed_batch_falls_back_symbol_by_symbol(session):
+    stub = session({'SBIN': 800.0, 'ITC': 430.0}, spark_status=500)
+
+    prices = get_live_prices(['SBIN', 'ITC', 'SBIN'])
+
+    assert prices == {'SBIN': 800.0, 'ITC': 430.0}
+    assert sorted(symbol for kind, symbol in stub.calls if kind == 'chart') == ['ITC', 'SBIN']
+
+def test_no_fallback_once_the_circuit_is_open(session):
+    stub = session({'SBIN': 800.0}, spark_status=500)
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+        circuit_breaker.record_failure('query1.finance.yahoo.com')
+
+    with pytest.raises(circuit_breaker.CircuitOpenError):
+        http_client.get(YAHOO_SPARK_URL)
+    assert get_live_prices(['SBIN']) == {}
+    assert stub.calls == []
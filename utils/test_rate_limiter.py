@@ -0,0 +1,107 @@
+import pytest
+from utils import circuit_breaker, http_client, rate_limiter
+from utils.rate_limiter import DEFAULT_LIMITS, RATE_DECREASE_FACTOR, RATE_INCREASE
+
+HOST = 'limiter.test'
+
+class FakeClock:
+    """time.time/time.sleep stand-ins: sleeping advances the clock instantly."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'time', fake.time)
+    monkeypatch.setattr(rate_limiter.time, 'sleep', fake.sleep)
+    monkeypatch.setattr(rate_limiter, '_buckets', {})
+    monkeypatch.setattr(circuit_breaker, '_circuits', {})
+    return fake
+
+class StubResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class StubSession:
+    """Replies with the queued status codes, then 200."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.calls += 1
+        return self.replies.pop(0) if self.replies else StubResponse(200)
+
+def test_throttling_halves_the_rate_down_to_the_floor(clock):
+    rate_limiter.record_throttle(HOST, retry_after=0)
+    assert rate_limiter.get_rate(HOST) == DEFAULT_LIMITS['rate'] * RATE_DECREASE_FACTOR
+    for _ in range(20):
+        rate_limiter.record_throttle(HOST, retry_after=0)
+    assert rate_limiter.get_rate(HOST) == DEFAULT_LIMITS['min_rate']
+
+def test_successes_recover_the_rate_up_to_the_ceiling(clock):
+    rate_limiter.record_throttle(HOST, retry_after=0)
+    rate_limiter.record_success(HOST)
+    assert rate_limiter.get_rate(HOST) == DEFAULT_LIMITS['rate'] * RATE_DECREASE_FACTOR + RATE_INCREASE
+    for _ in range(100):
+        rate_limiter.record_success(HOST)
+    assert rate_limiter.get_rate(HOST) == DEFAULT_LIMITS['max_rate']
+
+def test_requests_are_paced_at_the_rate(clock):
+    for _ in range(5):
+        rate_limiter.acquire(HOST)
+    # One token to start with, then one every 1/rate seconds
+    assert clock.slept == pytest.approx(4 / DEFAULT_LIMITS['rate'])
+
+def test_backoff_pauses_the_host_until_retry_after(clock):
+    rate_limiter.acquire(HOST)
+    rate_limiter.record_throttle(HOST, retry_after=3)
+    start = clock.now
+    rate_limiter.acquire(HOST)
+    assert clock.now - start >= 3
+
+def test_deadline_inside_the_backoff_raises(clock):
+    rate_limiter.record_throttle(HOST, retry_after=30)
+    with pytest.raises(TimeoutError):
+        rate_limiter.acquire(HOST, deadline=clock.now + 5)
+    assert clock.slept == 0
+
+def test_get_retries_a_429_after_the_backoff_and_recovers(clock, monkeypatch):
+    session = StubSession([StubResponse(429, {'Retry-After': '2'}), StubResponse(503)])
+    monkeypatch.setattr(http_client, '_session', session)
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt: 1.0)
+
+    response = http_client.get(f'https://{HOST}/nav')
+
+    assert response.status_code == 200
+    assert session.calls == 3
+    # Retry-After, then the backoff for the 503, were waited out
+    assert clock.slept >= 3
+    throttled = DEFAULT_LIMITS['rate'] * RATE_DECREASE_FACTOR ** 2
+    assert rate_limiter.get_rate(HOST) == throttled + RATE_INCREASE
+
+    for _ in range(10):
+        http_client.get(f'https://{HOST}/nav')
+    assert rate_limiter.get_rate(HOST) > DEFAULT_LIMITS['rate']
+    assert circuit_breaker.get_state(HOST) == circuit_breaker.CLOSED
+
+def test_get_gives_up_after_max_retries(clock, monkeypatch):
+    session = StubSession([StubResponse(429)] * 10)
+    monkeypatch.setattr(http_client, '_session', session)
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt: 0.5)
+
+    response = http_client.get(f'https://{HOST}/nav', max_retries=2)
+
+    assert response.status_code == 429
+    assert session.calls == 3
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils import returns
+from utils.returns import annualize, holding_returns, twr, xirr
+
+def test_xirr_matches_excel():
+    # The example from Excel's XIRR documentation, which gives 0.373362535 (Excel stops
+    # iterating at a looser tolerance, hence the 1e-8)
+    amounts = [-10000, 2750, 4250, 3250, 2750]
+    dates = ['2008-01-01', '2008-03-01', '2008-10-30', '2009-02-15', '2009-04-01']
+    assert xirr(amounts, dates)[0] == pytest.approx(0.373362535, abs=1e-8)
+
+def test_xirr_solves_groups_independently():
+    amounts = [-10000, 2750, 4250, 3250, 2750, -100, 110, -100]
+    dates = ['2008-01-01', '2008-03-01', '2008-10-30', '2009-02-15', '2009-04-01',
+             '2020-01-01', '2021-01-01', '2020-01-01']
+    rates = xirr(amounts, dates, [0, 0, 0, 0, 0, 1, 1, 2], 3)
+    assert rates[0] == pytest.approx(0.373362535, abs=1e-8)
+    assert rates[1] == pytest.approx(110 ** (365 / 366) / 100 ** (365 / 366) - 1, rel=1e-6)
+    # Only an outflow: no rate
+    assert np.isnan(rates[2])
+
+def test_twr_ignores_flows():
+    # 100 grows 10%, 50 more is put in, then everything grows 10%
+    assert twr([100, 110, 160, 176], [0, 0, 50, 0]) == pytest.approx(1.1 * 1.1 - 1)
+
+def test_annualize_leaves_short_periods():
+    assert annualize(0.05, 100) == pytest.approx(0.05)
+    assert annualize(0.21, 730) == pytest.approx(0.1)
+
+def ledger(rows):
+    return pd.DataFrame(rows, columns=['id', 'asset', 'holding_key', 'event', 'date', 'quantity', 'price',
+                                       'name', 'code'])
+
+def test_unpriced_holding_has_no_returns(monkeypatch):
+    events = ledger([[1, 'stocks', 'AAA', 'buy', '2024-01-01', 10, 100.0, 'A', 'AAA'],
+                     [2, 'stocks', 'BBB', 'buy', '2024-01-01', 10, 100.0, 'B', 'BBB'],
+                     [3, 'stocks', 'BBB', 'sell', '2024-06-01', 5, 120.0, 'B', 'BBB']])
+    monkeypatch.setattr(returns, 'get_ledger', lambda asset: events)
+
+    result = holding_returns('stocks', ['AAA', 'BBB'], [1100.0, 0.0], [110.0, 0.0],
+                             today=np.datetime64('2024-07-01'))
+
+    assert result.loc[0, 'twr'] == pytest.approx(0.1)
+    assert np.isfinite(result.loc[0, 'xirr'])
+    assert np.isnan(result.loc[1, 'twr'])
+    assert np.isnan(result.loc[1, 'xirr'])
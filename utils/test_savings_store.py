@@ -0,0 +1,56 @@
+import sqlite3
+import pandas as pd
+from utils import savings_store
+from utils.savings_store import match_account, save_statement, statement_account_key
+
+def statement(sha256, path, account):
+    return {'sha256': sha256, 'path': path, 'bank': 'State Bank of India', 'account': account,
+            'first_date': '2025-03-30', 'last_date': '2025-03-31', 'opening_balance': None,
+            'closing_balance': 90.0}
+
+UNCHAINED = [{'date': '2025-03-30', 'description': 'TRANSFER TO 4897690162095', 'amount': None, 'balance': 100.0},
+             {'date': '2025-03-31', 'description': 'UPI/DR/NETFLIX', 'amount': -10.0, 'balance': 90.0}]
+
+def test_statement_account_key():
+    assert statement_account_key('assets/SavingsAccounts/SBI_Statement.pdf') == 'SBI_Statement'
+    assert statement_account_key('SBI_38829428588_03-05-2025.pdf') == '38829428588'
+    # Dates are not account numbers
+    assert statement_account_key('SBI_20250430.pdf') == 'SBI_20250430'
+
+def test_overlapping_statements_store_unknown_amounts_once(tmp_path):
+    path = str(tmp_path / 'savings.db')
+    assert save_statement(statement('a', 'SBI_Statement.pdf', 'SBI_Statement'), UNCHAINED, path) == 2
+    assert save_statement(statement('b', 'SBI_Statement (1).pdf', 'SBI_Statement'), UNCHAINED, path) == 0
+    assert len(savings_store.get_transactions(path=path)) == 2
+
+def test_accounts_are_not_deduplicated_against_each_other(tmp_path):
+    path = str(tmp_path / 'savings.db')
+    save_statement(statement('a', 'SBI_11111111111.pdf', '11111111111'), UNCHAINED, path)
+    assert save_statement(statement('b', 'SBI_22222222222.pdf', '22222222222'), UNCHAINED, path) == 2
+
+def test_old_store_is_rekeyed_and_deduplicated(tmp_path):
+    path = str(tmp_path / 'savings.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(savings_store.SCHEMA + "CREATE UNIQUE INDEX transactions_natural_key "
+                                              "ON transactions (bank, account, date, balance, amount);")
+    conn.execute("INSERT INTO statements VALUES ('a', 'x/SBI_Statement.pdf', 'State Bank of India', '', "
+                 "NULL, NULL, NULL, NULL, 2, 0)")
+    for seq in range(2):
+        conn.execute("INSERT INTO transactions (statement, bank, account, date, seq, description, amount, balance) "
+                     "VALUES ('a', 'State Bank of India', '', '2025-03-30', ?, 'X', NULL, 100.0)", (seq,))
+    conn.commit()
+    conn.close()
+
+    transactions = savings_store.get_transactions(path=path)
+    assert transactions['account'].tolist() == ['SBI_Statement']
+
+def test_match_account():
+    entered = pd.DataFrame({'Bank': ['SBI', 'HDFC Bank', 'Axis Bank', 'Axis Bank'],
+                            'AccountNumber': ['', 'XXXX1234', '917010001111', '917010002222']})
+    # A statement keyed by its file name is the bank's only hand-entered account
+    assert match_account(entered, 'State Bank of India', 'SBI_Statement') == 0
+    # Masked numbers match on their last digits
+    assert match_account(entered, 'HDFC Bank', '50100001234') == 1
+    assert match_account(entered, 'Axis Bank', '917010002222') == 3
+    assert match_account(entered, 'Axis Bank', '917010009999') is None
+    assert match_account(entered, 'IDFC FIRST Bank', '10012345678') is None
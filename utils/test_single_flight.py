@@ -0,0 +1,94 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from utils import single_flight as sf
+from utils.single_flight import single_flight
+
+def run_together(fn, callers):
+    """Call fn from `callers` threads while its first execution is held open; returns their results."""
+    release = threading.Event()
+    started = threading.Event()
+    results = [None] * callers
+
+    def call(i):
+        results[i] = fn(release, started)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Wait until every other caller has joined the flight before letting it finish
+    while sum(counters['coalesced'] for counters in sf.get_single_flight_stats().values()) < callers - 1:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(sf, '_stats', {})
+    monkeypatch.setattr(sf, '_in_flight', {})
+
+def test_concurrent_callers_share_one_execution_but_not_the_result():
+    executions = []
+
+    @single_flight
+    def load(release, started):
+        executions.append(1)
+        started.set()
+        release.wait(5)
+        return pd.DataFrame({'price': [1.0, 2.0]})
+
+    results = run_together(load, 3)
+
+    assert len(executions) == 1
+    assert all(result.equals(results[0]) for result in results)
+    results[1].loc[0, 'price'] = 99.0
+    assert results[0].loc[0, 'price'] == 1.0
+    assert results[2].loc[0, 'price'] == 1.0
+    assert len({id(result) for result in results}) == 3
+
+def test_waiters_receive_the_error():
+    @single_flight
+    def fail(release, started):
+        started.set()
+        release.wait(5)
+        raise ValueError('upstream down')
+
+    errors = []
+
+    def call():
+        try:
+            fail(release, started)
+        except ValueError as e:
+            errors.append(e)
+
+    release, started = threading.Event(), threading.Event()
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    threads[0].start()
+    started.wait(5)
+    threads[1].start()
+    while sf.get_single_flight_stats()[fail.__module__ + '.' + fail.__qualname__]['coalesced'] < 1:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 2
+
+def test_generator_arguments_reach_the_function_intact():
+    @single_flight
+    def total(values):
+        return sum(values)
+
+    assert total(x for x in [1, 2, 3]) == 6
+    assert total(iter([4, 5])) == 9
+
+def test_sequence_arguments_key_by_value():
+    assert sf._freeze(['A', 'B']) == sf._freeze(('A', 'B')) == sf._freeze(np.array(['A', 'B']))
+    assert sf._freeze(pd.Series(['A', 'B'])) == ('A', 'B')
+    assert sf._freeze({'B', 'A'}) == frozenset({'A', 'B'})
+    with pytest.raises(TypeError):
+        sf._freeze(pd.DataFrame({'a': [1]}))
@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+from utils.statement_importer import merge_holdings
+
+def mf_statement(rows):
+    return pd.DataFrame(rows, columns=['Scheme', 'UnitsOwned', 'AverageNAV', 'SchemeCode', 'MatchConfidence'])
+
+def test_duplicate_folios_are_added_together():
+    statement = mf_statement([
+        ['SBI Retirement Benefit Fund', 366.532, 10.0, '', 0.0],
+        ['Parag Parikh Flexi Cap Fund', 10.0, 50.0, '122639', 0.95],
+        ['SBI Retirement Benefit Fund', 374.23, 12.0, '', 0.0]
+    ])
+
+    merged = merge_holdings('mutual_funds', [statement])
+
+    assert len(merged) == 2
+    assert merged['UnitsOwned'].sum() == pytest.approx(366.532 + 374.23 + 10.0)
+    retirement = merged[merged['Scheme'] == 'SBI Retirement Benefit Fund'].iloc[0]
+    assert retirement['UnitsOwned'] == pytest.approx(740.762)
+    # The invested value of both folios is kept
+    assert retirement['UnitsOwned'] * retirement['AverageNAV'] == pytest.approx(366.532 * 10.0 + 374.23 * 12.0)
+
+def test_latest_statement_replaces_older_ones():
+    older = mf_statement([['Sold Fund', 5.0, 20.0, '100001', 0.9], ['Kept Fund', 1.0, 30.0, '100002', 0.9]])
+    newer = mf_statement([['Kept Fund', 2.0, 35.0, '100002', 0.9]])
+
+    merged = merge_holdings('mutual_funds', [older, newer])
+
+    assert merged['SchemeCode'].tolist() == ['100002']
+    assert merged['UnitsOwned'].tolist() == [2.0]
+
+def test_no_statements_gives_an_empty_table():
+    merged = merge_holdings('stocks', [])
+    assert merged.empty
+    assert list(merged.columns) == ['Stock', 'SharesOwned', 'AveragePrice', 'NSE_Symbol']
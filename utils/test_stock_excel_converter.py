@@ -0,0 +1,58 @@
+import pytest
+from utils import stock_excel_converter, symbol_master
+
+STATEMENT = 'assets/Stocks/Stocks_Holdings_Statement_6399040068_03-05-2025.xlsx'
+UNKNOWN_OFFLINE = ['ASHIMA LTD', 'GLOBAL EDUCATION LIMITED', 'MADHAV COPPER LIMITED']
+
+@pytest.fixture
+def master(tmp_path, monkeypatch):
+    """Point the symbol master at (initially missing) files in a temp dir."""
+    monkeypatch.setattr(symbol_master, 'SYMBOL_MASTER_FILE', str(tmp_path / 'EQUITY_L.csv'))
+    monkeypatch.setattr(symbol_master, 'ETF_MASTER_FILE', str(tmp_path / 'eq_etfseclist.csv'))
+    monkeypatch.setattr(symbol_master, '_master', None)
+    return tmp_path
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Record each Yahoo search batch; only Ashima is found."""
+    batches = []
+
+    def search(queries, *args, **kwargs):
+        queries = list(queries)
+        batches.append(queries)
+        return {query: 'ASHIMASYN' if query == 'INE440A01010' else '' for query in queries}
+
+    monkeypatch.setattr(stock_excel_converter, 'search_nse_symbols', search)
+    return batches
+
+def test_master_files_cover_equities_and_etfs(master):
+    (master / 'EQUITY_L.csv').write_text(
+        'SYMBOL,NAME OF COMPANY, SERIES, DATE OF LISTING, PAID UP VALUE, MARKET LOT, ISIN NUMBER, FACE VALUE\n'
+        'GLOBAL,Global Education Limited,EQ,01-01-2020,10,1,INE291W01037,10\n')
+    (master / 'eq_etfseclist.csv').write_text(
+        'Symbol,Underlying,SecurityName,DateofListing,MarketLot,ISINNumber,FaceValue\n'
+        'NIFTYBEES,NIFTY 50,Nippon India ETF Nifty BeES,08-01-2002,1,INF204KB14I2,1\n')
+
+    assert stock_excel_converter.resolve_nse_symbol('Global Education Ltd') == 'GLOBAL'
+    assert stock_excel_converter.resolve_nse_symbol('NIPPON INDIA ETF NIFTY BEES', 'INF204KB14I2') == 'NIFTYBEES'
+    # Known ISINs need no master file
+    assert stock_excel_converter.resolve_nse_symbol('MOTILALAMC - MONQ50', 'INF247L01AU3') == 'MONQ50'
+    assert stock_excel_converter.resolve_nse_symbol('Unknown Co', '', 'abc') == 'ABC'
+
+def test_unresolved_rows_are_reported_not_fatal(master, searches):
+    holdings, unresolved = stock_excel_converter.read_stock_holdings(STATEMENT, search=False)
+
+    assert searches == []
+    assert len(holdings) == 42
+    assert (holdings['NSE_Symbol'] != '').all()
+    assert unresolved == UNKNOWN_OFFLINE
+    etfs = holdings.set_index('Stock').loc[['MOTILAL OS NASDAQ100 ETF', 'MOTILALAMC - MONQ50'], 'NSE_Symbol']
+    assert etfs.tolist() == ['MON100', 'MONQ50']
+
+def test_misses_are_searched_in_one_batch_per_key(master, searches):
+    holdings, unresolved = stock_excel_converter.read_stock_holdings(STATEMENT)
+
+    assert searches == [['INE440A01010', 'INE291W01037', 'INE813V01022'],
+                        ['GLOBAL EDUCATION LIMITED', 'MADHAV COPPER LIMITED']]
+    assert holdings.set_index('Stock').loc['ASHIMA LTD', 'NSE_Symbol'] == 'ASHIMASYN'
+    assert unresolved == UNKNOWN_OFFLINE[1:]
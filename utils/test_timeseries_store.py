@@ -0,0 +1,37 @@
+import json
+import os
+import numpy as np
+import pytest
+from utils import timeseries_store as store
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, '_indexes', {})
+    return str(tmp_path)
+
+def test_appends_only_newer_days(directory):
+    assert store.append_series(directory, 'SBIN', ['2025-01-02', '2025-01-01'], [2.0, 1.0]) == 2
+    assert store.append_series(directory, 'SBIN', ['2025-01-02', '2025-01-03'], [9.0, 3.0]) == 1
+
+    dates, values = store.read_series(directory, 'SBIN', start='2025-01-02')
+    assert dates.astype(str).tolist() == ['2025-01-02', '2025-01-03']
+    assert values.tolist() == [2.0, 3.0]
+    assert store.get_series_info(directory, 'SBIN') == {'first': '2025-01-01', 'last': '2025-01-03', 'count': 3}
+
+def test_index_written_by_another_process_is_reread(directory):
+    store.append_series(directory, 'SBIN', ['2025-01-01'], [1.0])
+    assert store.get_last_date(directory, 'SBIN') == np.datetime64('2025-01-01')
+
+    # Another process appends a day and rewrites the index
+    with open(os.path.join(directory, 'SBIN.bin'), 'ab') as f:
+        records = np.empty(1, dtype=store.RECORD_DTYPE)
+        records['date'], records['value'] = np.datetime64('2025-01-02'), 2.0
+        records.tofile(f)
+    with open(os.path.join(directory, store.INDEX_FILE), 'w') as f:
+        json.dump({'SBIN': {'first': '2025-01-01', 'last': '2025-01-02', 'count': 2, 'checked_at': 5}}, f)
+
+    assert store.get_last_date(directory, 'SBIN') == np.datetime64('2025-01-02')
+    assert store.get_series_info(directory, 'SBIN')['checked_at'] == 5
+    # Appends continue from the other process's last day
+    assert store.append_series(directory, 'SBIN', ['2025-01-02', '2025-01-03'], [0.0, 3.0]) == 1
+    assert store.get_series_info(directory, 'SBIN')['count'] == 3
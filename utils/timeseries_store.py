@@ -0,0 +1,138 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# One fixed-size binary record per observation
+RECORD_DTYPE = np.dtype([('date', '<M8[D]'), ('value', '<f8')])
+INDEX_FILE = 'index.json'
+
+# Parsed index.json per store directory, with the file's (mtime, size) it was read at
+_indexes = {}
+_lock = threading.RLock()
+
+# A store is a directory holding one append-only binary file per key, with packed
+# RECORD_DTYPE records in ascending date order, plus an index.json that records the
+# first/last date and row count of every key. A whole series loads with a single
+# np.fromfile and new days are appended to the end of the file in place.
+
+def _series_path(directory: str, key: str) -> str:
+    safe_key = re.sub(r'[^A-Za-z0-9_.-]', '_', str(key))
+    return os.path.join(directory, f"{safe_key}.bin")
+
+def _index_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _load_index(directory: str) -> Dict:
+    """Load a store's index, re-reading it whenever index.json changed on disk; caller must hold the lock.
+
+    Another process (a second worker, or the CLI updater) may have written it.
+    """
+    path = os.path.join(directory, INDEX_FILE)
+    stamp = _index_stamp(path)
+    cached = _indexes.get(directory)
+    if cached is None or cached[0] != stamp:
+        try:
+            with open(path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        cached = _indexes[directory] = (stamp, index)
+    return cached[1]
+
+def _save_index(directory: str) -> None:
+    """Atomically write a store's index; caller must hold the lock."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, INDEX_FILE)
+    index = _indexes[directory][1]
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(path + '.tmp', path)
+    _indexes[directory] = (_index_stamp(path), index)
+
+def _new_entry() -> Dict:
+    return {'first': None, 'last': None, 'count': 0}
+
+def get_series_info(directory: str, key: str) -> Optional[Dict]:
+    """Return the index entry (first, last, count and any extra fields) for a key."""
+    with _lock:
+        entry = _load_index(directory).get(str(key))
+        return dict(entry) if entry else None
+
+def get_last_date(directory: str, key: str) -> Optional[np.datetime64]:
+    """Return the most recent stored date for a key, or None if it has no data."""
+    entry = get_series_info(directory, key)
+    if not entry or not entry.get('last'):
+        return None
+    return np.datetime64(entry['last'], 'D')
+
+def set_series_fields(directory: str, key: str, **fields) -> None:
+    """Attach bookkeeping fields (e.g. when the series was last checked) to a key."""
+    with _lock:
+        index = _load_index(directory)
+        index.setdefault(str(key), _new_entry()).update(fields)
+        _save_index(directory)
+
+def append_series(directory: str, key: str, dates, values) -> int:
+    """Append observations newer than the last stored date. Returns rows written."""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    values = np.asarray(values, dtype=np.float64)
+    if len(dates) == 0:
+        return 0
+
+    order = np.argsort(dates, kind='stable')
+    dates, values = dates[order], values[order]
+
+    with _lock:
+        last = get_last_date(directory, key)
+        if last is not None:
+            newer = dates > last
+            dates, values = dates[newer], values[newer]
+
+        # Keep one value per day (the last one given)
+        if len(dates) > 1:
+            keep = np.append(dates[1:] != dates[:-1], True)
+            dates, values = dates[keep], values[keep]
+
+        if len(dates) == 0:
+            return 0
+
+        records = np.empty(len(dates), dtype=RECORD_DTYPE)
+        records['date'] = dates
+        records['value'] = values
+
+        os.makedirs(directory, exist_ok=True)
+        with open(_series_path(directory, key), 'ab') as f:
+            records.tofile(f)
+
+        entry = _load_index(directory).setdefault(str(key), _new_entry())
+        if entry['first'] is None:
+            entry['first'] = str(dates[0])
+        entry['last'] = str(dates[-1])
+        entry['count'] += len(records)
+        _save_index(directory)
+        return len(records)
+
+def read_series(directory: str, key: str, start=None, end=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (dates, values) with start <= date <= end, located by binary search."""
+    path = _series_path(directory, key)
+    with _lock:
+        if not os.path.exists(path):
+            return np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64)
+        records = np.fromfile(path, dtype=RECORD_DTYPE)
+
+    dates = records['date']
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, 'D'), side='left')
+    hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(end, 'D'), side='right')
+    return dates[lo:hi], records['value'][lo:hi]
+
+def list_series(directory: str) -> List[str]:
+    """Return every key that has an index entry in a store."""
+    with _lock:
+        return list(_load_index(directory).keys())